@@ -0,0 +1,154 @@
+"""
+Benchmark for visual pattern matching strategies
+
+Compares latency and accuracy of the exhaustive full-resolution search with
+the coarse-to-fine pyramid mode (with and without the full-scan fallback for
+misses) and the region-prior search on a synthetic 1920x1080 UI screenshot.
+
+Usage:
+    python benchmark_pattern_matching.py [--templates 40] [--repeat 3] [--levels 1] [--radius 4] [--candidates 16]
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+import cv2
+import numpy as np
+
+from pattern_image_processor import PatternImageProcessor
+
+def make_synthetic_screenshot(width: int = 1920, height: int = 1080, seed: int = 0) -> Tuple[np.ndarray, List[List[int]]]:
+    """Draw a UI-like screenshot made of labelled buttons; returns the image and button regions"""
+    rng = np.random.default_rng(seed)
+    screenshot = np.full((height, width, 3), 245, dtype=np.uint8)
+    regions = []
+
+    for row in range(12):
+        for col in range(8):
+            w, h = int(rng.integers(90, 200)), int(rng.integers(28, 50))
+            x = col * 235 + int(rng.integers(5, 30))
+            y = row * 88 + int(rng.integers(5, 30))
+            if x + w >= width or y + h >= height:
+                continue
+            color = tuple(int(c) for c in rng.integers(40, 220, size=3))
+            cv2.rectangle(screenshot, (x, y), (x + w, y + h), color, -1)
+            cv2.rectangle(screenshot, (x, y), (x + w, y + h), (30, 30, 30), 1)
+            label = "".join(chr(int(c)) for c in rng.integers(65, 91, size=int(rng.integers(4, 9))))
+            cv2.putText(screenshot, label, (x + 8, y + h - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            regions.append([x, y, w + 1, h + 1])
+
+    return screenshot, regions
+
+def build_templates(test_dir: Path, count: int) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """Crop templates from the synthetic screenshot; a quarter come from a different screen"""
+    screenshot, regions = make_synthetic_screenshot(seed=0)
+    other_screenshot, other_regions = make_synthetic_screenshot(seed=1)
+    rng = np.random.default_rng(2)
+
+    patterns = []
+    for i in range(count):
+        present = i % 4 != 3
+        source, source_regions = (screenshot, regions) if present else (other_screenshot, other_regions)
+        x, y, w, h = source_regions[int(rng.integers(0, len(source_regions)))]
+        path = test_dir / f"bench_template_{i}.png"
+        cv2.imwrite(str(path), source[y:y + h, x:x + w])
+        # Stored regions drift a few pixels from where the element is now, as after small layout shifts
+        dx, dy = (int(v) for v in rng.integers(-10, 11, size=2))
+        patterns.append({
+            "id": f"bench_{i}",
+            "image_path": str(path),
+            "region": [x + dx, y + dy, w, h],
+            "expected_region": [x, y, w, h] if present else None
+        })
+
+    return screenshot, patterns
+
+def run_mode(image_processor: PatternImageProcessor, screenshot: np.ndarray,
+             patterns: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    """Time one matching mode and score it against the known template locations"""
+    # Warm the template cache so both modes measure matching, not PNG decoding
+    for pattern in patterns:
+        image_processor.load_template(pattern["image_path"])
+
+    timings = []
+    results = {}
+    for _ in range(repeat):
+        prepared = image_processor.prepare_screenshot(screenshot)
+        start = time.perf_counter()
+        for pattern in patterns:
+            results[pattern["id"]] = image_processor.match_prepared(prepared, pattern["image_path"],
+                                                                    pattern["region"], pattern["id"])
+        timings.append(time.perf_counter() - start)
+
+    correct = 0
+    confidences = {}
+    for pattern in patterns:
+        match = results[pattern["id"]]
+        expected = pattern["expected_region"]
+        if match:
+            confidences[pattern["id"]] = match["confidence"]
+        if expected is None:
+            correct += match is None
+        elif match is not None:
+            correct += abs(match["region"][0] - expected[0]) <= 2 and abs(match["region"][1] - expected[1]) <= 2
+
+    return {
+        "best_ms": min(timings) * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "accuracy": correct / len(patterns),
+        "confidences": confidences
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark exhaustive vs pyramid template matching")
+    parser.add_argument("--templates", type=int, default=40, help="Number of templates to match")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per mode")
+    parser.add_argument("--levels", type=int, help="Pyramid levels (processor default if omitted)")
+    parser.add_argument("--radius", type=int, help="Pyramid refinement radius in pixels (processor default if omitted)")
+    parser.add_argument("--candidates", type=int, help="Coarse candidates refined per template (processor default if omitted)")
+    args = parser.parse_args()
+
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    screenshot, patterns = build_templates(test_dir, args.templates)
+
+    exhaustive_processor = PatternImageProcessor()
+    exhaustive_processor.search_strategy = "full"
+    exhaustive = run_mode(exhaustive_processor, screenshot, patterns, args.repeat)
+
+    pyramid_processor = PatternImageProcessor()
+    pyramid_processor.match_mode = "pyramid"
+    pyramid_processor.search_strategy = "full"
+    if args.levels is not None:
+        pyramid_processor.pyramid_levels = args.levels
+    if args.radius is not None:
+        pyramid_processor.pyramid_refine_radius = args.radius
+    if args.candidates is not None:
+        pyramid_processor.pyramid_candidates = args.candidates
+    pyramid = run_mode(pyramid_processor, screenshot, patterns, args.repeat)
+    pyramid_processor.pyramid_fallback = False
+    pyramid_lossy = run_mode(pyramid_processor, screenshot, patterns, args.repeat)
+
+    region_processor = PatternImageProcessor()
+    region_processor.search_strategy = "region_prior"
+    region_prior = run_mode(region_processor, screenshot, patterns, args.repeat)
+
+    shared = set(exhaustive["confidences"]) & set(pyramid["confidences"])
+    max_delta = max((abs(exhaustive["confidences"][k] - pyramid["confidences"][k]) for k in shared), default=0.0)
+
+    print(f"Templates: {len(patterns)} on a {screenshot.shape[1]}x{screenshot.shape[0]} screenshot")
+    print(f"Pyramid: levels={pyramid_processor.pyramid_levels} radius={pyramid_processor.pyramid_refine_radius} "
+          f"candidates={pyramid_processor.pyramid_candidates}")
+    print(f"{'mode':<12}{'best ms':>10}{'mean ms':>10}{'accuracy':>10}{'speedup':>10}")
+    for name, stats in (("exhaustive", exhaustive), ("pyramid", pyramid), ("no-fallback", pyramid_lossy),
+                        ("region", region_prior)):
+        print(f"{name:<12}{stats['best_ms']:>10.1f}{stats['mean_ms']:>10.1f}{stats['accuracy']:>10.0%}"
+              f"{exhaustive['best_ms'] / stats['best_ms']:>9.1f}x")
+    print(f"Max confidence difference on shared matches (pyramid): {max_delta:.4f}")
+    local_hits = sum(stats["local_hits"] for stats in region_processor.get_region_stats().values())
+    print(f"Region-prior local window sufficed for {local_hits // args.repeat}/{len(patterns)} templates")
+
+if __name__ == "__main__":
+    main()
@@ -4,56 +4,89 @@
 """
 
 import asyncio
+import copy
 import logging
 from pathlib import Path
 import os
+from typing import Dict, List, Optional, Union
+import cv2
+import numpy as np
 from playwright.async_api import async_playwright, Browser, Page, BrowserContext
 
+from browser_launch_profile import LaunchProfile, resolve_launch_profile
+from browser_page_pool import PagePool
+from browser_navigation import (NavigationPolicy, ResourceBlocker, NavigationTimings,
+                                navigation_policies, navigate)
+from browser_response_cache import ResponseCache, response_cache_from_env
+from browser_element_cache import ElementHandleCache
+
 logger = logging.getLogger("EirosShell")
 
 class BrowserController:
-    def __init__(self):
+    def __init__(self, profile: Optional[LaunchProfile] = None, debug_mode: bool = False):
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
+        self.profile = profile or resolve_launch_profile()
+        self.debug_mode = debug_mode
+        self.page_pool = PagePool(self, max_pages=self.profile.max_pages)  # Pages for concurrent chains
+        self.resource_blocker = ResourceBlocker()  # Shared by all pages of the browser
+        self.navigation_timings = NavigationTimings()
+        self.last_navigation = None  # Report of the most recent navigate_to
+        self.response_cache: Optional[ResponseCache] = None  # Set before launch or enabled by RESPONSE_CACHE
+        self.element_cache = ElementHandleCache()  # Handles reused until the page navigates or its DOM changes
         self.user_data_dir = Path(os.path.expanduser("~")) / "EirosShell" / "browser_data"
         self.user_data_dir.mkdir(parents=True, exist_ok=True)
+    
+    @property
+    def headless(self) -> bool:
+        """Запущен ли браузер без окна"""
+        return self.profile.headless
+    
+    def for_page(self, page):
+        """
+        Копия контроллера, работающая с другой страницей того же браузера
+        (например, со страницей из пула); обработчики команд используют ее как обычно
+        """
+        view = copy.copy(self)
+        view.page = page
+        return view
         
     async def launch_browser(self):
-        """Запускает браузер Chrome/Edge (не headless)"""
+        """Запускает браузер по профилю запуска (Chrome/Edge/Chromium, с окном или headless)"""
         try:
-            logger.info("Запуск браузера...")
+            logger.info(f"Запуск браузера (профиль {self.profile.name}, "
+                        f"{'headless' if self.profile.headless else 'с окном'})...")
+            if self.debug_mode:
+                logger.debug(f"Параметры запуска браузера: {self.profile.to_dict()}")
+            navigation_policies.load()
             self.playwright = await async_playwright().start()
             
-            # Пробуем сначала Chrome, затем Edge
-            try:
-                self.browser = await self.playwright.chromium.launch_persistent_context(
-                    user_data_dir=str(self.user_data_dir),
-                    channel="chrome",
-                    headless=False,
-                    args=["--start-maximized"]
-                )
-                logger.info("Запущен браузер Chrome")
-            except Exception as chrome_error:
-                logger.warning(f"Не удалось запустить Chrome: {chrome_error}")
+            # Пробуем каналы профиля по очереди, например Chrome, затем Edge, затем Chromium
+            options = self.profile.launch_options()
+            last_error = None
+            for channel in self.profile.channels:
+                browser_name = channel or "chromium"
                 try:
+                    channel_options = dict(options, channel=channel) if channel else options
                     self.browser = await self.playwright.chromium.launch_persistent_context(
                         user_data_dir=str(self.user_data_dir),
-                        channel="msedge",
-                        headless=False,
-                        args=["--start-maximized"]
+                        **channel_options
                     )
-                    logger.info("Запущен браузер Edge")
-                except Exception as edge_error:
-                    logger.warning(f"Не удалось запустить Edge: {edge_error}")
-                    # Пробуем запустить дефолтный Chromium
-                    self.browser = await self.playwright.chromium.launch_persistent_context(
-                        user_data_dir=str(self.user_data_dir),
-                        headless=False,
-                        args=["--start-maximized"]
-                    )
-                    logger.info("Запущен браузер Chromium")
+                    logger.info(f"Запущен браузер {browser_name}")
+                    break
+                except Exception as launch_error:
+                    logger.warning(f"Не удалось запустить {browser_name}: {launch_error}")
+                    last_error = launch_error
+            if self.browser is None:
+                raise last_error or RuntimeError("Не задан ни один канал браузера")
+            
+            # Кэш статических ресурсов на диске, общий для всех страниц контекста
+            self.response_cache = self.response_cache or response_cache_from_env()
+            if self.response_cache:
+                await self.browser.route("**/*", self.response_cache.handle)
+                logger.info(f"Кэш ответов включен: {self.response_cache.cache_dir}")
             
             # Получаем или создаем страницу
             if len(self.browser.pages) > 0:
@@ -69,42 +102,88 @@ class BrowserController:
                 await self.playwright.stop()
             return None
     
-    async def navigate_to(self, url):
-        """Переходит по указанному URL"""
+    async def navigate_to(self, url, policy: Optional[NavigationPolicy] = None):
+        """
+        Переходит по указанному URL. Готовность страницы и блокируемые запросы
+        задает политика навигации (по умолчанию политика домена); отчет о
+        времени перехода сохраняется в last_navigation
+        """
         try:
             logger.info(f"Переход по URL: {url}")
             if not self.page:
                 logger.error("Страница не инициализирована")
                 return False
             
-            await self.page.goto(url, wait_until="networkidle")
+            policy = policy or navigation_policies.policy_for(url)
+            self.last_navigation = await navigate(self.page, url, policy,
+                                                  self.resource_blocker, self.navigation_timings)
+            if self.debug_mode:
+                logger.debug(f"Навигация: {self.last_navigation}")
             return True
             
         except Exception as e:
             logger.error(f"Ошибка при переходе на {url}: {str(e)}")
             return False
     
+    async def query_selector(self, selector):
+        """Находит элемент без ожидания (через кэш элементов страницы)"""
+        try:
+            return await self.element_cache.get(self.page, selector)
+        except Exception as e:
+            logger.error(f"Ошибка при поиске элемента {selector}: {str(e)}")
+            return None
+    
     async def wait_for_selector(self, selector, timeout=30000):
-        """Ожидает появления элемента на странице"""
+        """Ожидает появления элемента на странице (через кэш элементов страницы)"""
         try:
-            return await self.page.wait_for_selector(selector, timeout=timeout)
+            return await self.element_cache.get(self.page, selector, timeout=timeout)
         except Exception as e:
             logger.error(f"Элемент не найден: {selector}. Ошибка: {str(e)}")
             return None
     
+    async def _with_element(self, selector, action):
+        """
+        Выполняет действие над закэшированным элементом; если элемента нет в
+        кэше или он устарел, действие выполняется по селектору
+        """
+        handle = self.element_cache.peek(self.page, selector)
+        if handle is not None:
+            try:
+                return await action(handle)
+            except Exception as e:
+                logger.debug(f"Закэшированный элемент {selector} недоступен, повтор по селектору: {str(e)}")
+                self.element_cache.invalidate(self.page, selector)
+        return await action(None)
+    
     async def click(self, selector):
         """Кликает по элементу"""
         try:
-            await self.page.click(selector)
+            await self._with_element(
+                selector, lambda handle: handle.click() if handle else self.page.click(selector))
             return True
         except Exception as e:
             logger.error(f"Не удалось кликнуть на элемент {selector}: {str(e)}")
             return False
     
+    async def click_at(self, x, y):
+        """
+        Кликает по точке скриншота страницы. Работает и в headless-режиме,
+        так как клик идет через страницу, а не через системную мышь.
+        """
+        try:
+            # Скриншот снимается в пикселях устройства, мышь страницы работает в CSS-пикселях
+            ratio = await self.page.evaluate("window.devicePixelRatio") or 1
+            await self.page.mouse.click(x / ratio, y / ratio)
+            return True
+        except Exception as e:
+            logger.error(f"Не удалось кликнуть в точку ({x}, {y}): {str(e)}")
+            return False
+    
     async def type_text(self, selector, text):
         """Вводит текст в поле ввода"""
         try:
-            await self.page.fill(selector, text)
+            await self._with_element(
+                selector, lambda handle: handle.fill(text) if handle else self.page.fill(selector, text))
             return True
         except Exception as e:
             logger.error(f"Не удалось ввести текст в поле {selector}: {str(e)}")
@@ -136,9 +215,59 @@ class BrowserController:
             logger.error(f"Ошибка при создании скриншота: {str(e)}")
             return None
     
+    async def capture_screenshot(self, clip: Optional[Union[Dict[str, float], List[float]]] = None,
+                                 format: str = "raw", quality: Optional[int] = None,
+                                 full_page: bool = False) -> Optional[Union[bytes, np.ndarray]]:
+        """
+        Делает скриншот в память, без записи на диск.
+        format: "png" или "jpeg" возвращают закодированные байты,
+        "raw" возвращает декодированный BGR-массив numpy (снимается в PNG, без потерь).
+        clip: область {"x", "y", "width", "height"} или [x, y, w, h].
+        """
+        try:
+            if not self.page:
+                logger.error("Страница не инициализирована")
+                return None
+            
+            options = {"full_page": full_page}
+            if clip is not None:
+                if not isinstance(clip, dict):
+                    x, y, w, h = clip
+                    clip = {"x": x, "y": y, "width": w, "height": h}
+                options["clip"] = clip
+            if format == "jpeg":
+                options["type"] = "jpeg"
+                options["quality"] = quality if quality is not None else 80
+            else:
+                options["type"] = "png"
+            
+            data = await self.page.screenshot(**options)
+            if format != "raw":
+                return data
+            
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                logger.error("Не удалось декодировать скриншот")
+            return image
+        except Exception as e:
+            logger.error(f"Ошибка при создании скриншота в память: {str(e)}")
+            return None
+    
+    def get_network_stats(self) -> Dict[str, Dict]:
+        """Статистика кэша ответов, блокировки запросов, пула страниц и кэша элементов"""
+        stats = {"blocking": self.resource_blocker.stats(), "page_pool": self.page_pool.stats(),
+                 "element_cache": self.element_cache.stats()}
+        if self.response_cache:
+            stats["response_cache"] = self.response_cache.stats()
+        return stats
+    
     async def close_browser(self):
         """Закрывает браузер"""
         try:
+            if self.response_cache:
+                logger.info(f"Статистика кэша ответов: {self.response_cache.stats()}")
+                self.response_cache.close()
+            await self.page_pool.close()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
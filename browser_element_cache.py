@@ -0,0 +1,176 @@
+"""
+Element handle cache scoped to the navigation generation of a page
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Set
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+logger = logging.getLogger("EirosShell")
+
+BINDING_NAME = "__eirosDomMutated"
+
+# Reports the first DOM change after the cache was armed, then stays quiet
+# until Python arms it again, so a busy page does not stream binding calls
+MUTATION_OBSERVER_SCRIPT = """
+(() => {
+    if (window.__eirosDomObserver || typeof window.%(binding)s !== "function") return;
+    window.__eirosCacheArmed = false;
+    const start = () => {
+        window.__eirosDomObserver = new MutationObserver(() => {
+            if (!window.__eirosCacheArmed) return;
+            window.__eirosCacheArmed = false;
+            window.%(binding)s();
+        });
+        window.__eirosDomObserver.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    };
+    if (document.documentElement) start();
+    else document.addEventListener("DOMContentLoaded", start, {once: true});
+})();
+""" % {"binding": BINDING_NAME}
+
+ARM_SCRIPT = "() => { window.__eirosCacheArmed = true; }"
+
+class PageElementCache:
+    """
+    Resolved element handles of one page keyed by selector. All entries
+    belong to the current generation, which ends on a main frame navigation,
+    a frame detaching or a DOM mutation reported by the page. The page only
+    reports a mutation while armed, which the cache does when it starts
+    filling a generation.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.generation = 0
+        self.handles: Dict[str, Any] = {}
+        self.visible: Set[str] = set()  # Selectors whose handle passed a visibility wait this generation
+        self.observing = False
+        self.armed = False  # Whether the page will report the next mutation
+
+    def invalidate(self, reason: str = "", disarmed: bool = False) -> None:
+        if self.handles:
+            logger.debug(f"Element cache invalidated ({reason}), {len(self.handles)} handles dropped")
+        self.handles.clear()
+        self.visible.clear()
+        self.generation += 1
+        if disarmed:
+            self.armed = False
+
+    def _on_navigated(self, frame) -> None:
+        if frame == self.page.main_frame:
+            # The new document starts unarmed
+            self.invalidate("navigation", disarmed=True)
+
+    async def observe(self) -> None:
+        """Subscribe to navigation and frame events and install the DOM mutation observer"""
+        self.page.on("framenavigated", self._on_navigated)
+        self.page.on("framedetached", lambda frame: self.invalidate("frame detached"))
+        try:
+            await self.page.expose_binding(BINDING_NAME, lambda source: self.invalidate("DOM mutation", disarmed=True))
+            await self.page.add_init_script(MUTATION_OBSERVER_SCRIPT)
+            await self.page.evaluate(MUTATION_OBSERVER_SCRIPT)
+            self.observing = True
+        except Exception as e:
+            # Without mutation reports handles only live until the next lookup miss or failed action
+            logger.warning(f"DOM mutation observer not installed, element cache limited to single lookups: {str(e)}")
+
+class ElementHandleCache:
+    """
+    Lets one resolved element handle serve recognition, waiting and the
+    action of a command instead of resolving the selector for each step.
+    Pages are tracked separately; handles are only reused while the page's
+    DOM is known to be unchanged.
+    """
+
+    def __init__(self):
+        self._pages: Dict[int, PageElementCache] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _page_cache(self, page) -> PageElementCache:
+        key = id(page)
+        cache = self._pages.get(key)
+        if cache is None:
+            cache = self._pages[key] = PageElementCache(page)
+            page.once("close", lambda *_: self._pages.pop(key, None))
+            await cache.observe()
+        return cache
+
+    async def get(self, page, selector: str, timeout: Optional[float] = None):
+        """
+        Handle for a selector: the cached one, or a new one from
+        query_selector (timeout None) or wait_for_selector (timeout in ms).
+        With a timeout the handle is visible, as with wait_for_selector; a
+        cached handle that has not been seen visible yet is waited for.
+        """
+        cache = await self._page_cache(page)
+        handle = cache.handles.get(selector)
+        if handle is not None:
+            if timeout is None or selector in cache.visible:
+                self.hits += 1
+                return handle
+            try:
+                await handle.wait_for_element_state("visible", timeout=timeout)
+                cache.visible.add(selector)
+                self.hits += 1
+                return handle
+            except PlaywrightTimeoutError:
+                raise
+            except Exception:
+                # Detached since it was cached; resolve it again
+                cache.handles.pop(selector, None)
+
+        self.misses += 1
+        generation = cache.generation
+        if timeout is None:
+            resolve = page.query_selector(selector)
+        else:
+            resolve = page.wait_for_selector(selector, timeout=timeout)
+        arming = cache.observing and not cache.armed
+        if arming:
+            # Arm before the lookup (sent first, run concurrently) so no mutation after it goes unreported
+            _, handle = await asyncio.gather(page.evaluate(ARM_SCRIPT), resolve)
+        else:
+            handle = await resolve
+        # A mutation reported meanwhile means the handle may already be stale and the page is disarmed
+        if cache.generation != generation:
+            return handle
+        if arming:
+            cache.armed = True
+        if handle is not None and cache.observing:
+            cache.handles[selector] = handle
+            if timeout is not None:
+                cache.visible.add(selector)
+        return handle
+
+    def peek(self, page, selector: str):
+        """Cached handle for a selector, or None without resolving it"""
+        cache = self._pages.get(id(page))
+        handle = cache.handles.get(selector) if cache else None
+        if handle is not None:
+            self.hits += 1
+        return handle
+
+    def invalidate(self, page, selector: Optional[str] = None) -> None:
+        """Drop one selector (e.g. after a failed action) or every handle of the page"""
+        cache = self._pages.get(id(page))
+        if cache is None:
+            return
+        if selector is None:
+            cache.invalidate("requested")
+        else:
+            cache.handles.pop(selector, None)
+            cache.visible.discard(selector)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "pages": len(self._pages),
+            "handles": sum(len(cache.handles) for cache in self._pages.values())
+        }
@@ -0,0 +1,141 @@
+"""
+Launch profiles for the browser: headed desktop use or headless servers
+"""
+
+import os
+import sys
+import shlex
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger("EirosShell")
+
+# Chromium flags that cut memory use and startup time on servers
+SERVER_ARGS = [
+    "--disable-dev-shm-usage",  # /dev/shm is small in containers
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-default-browser-check",
+    "--no-first-run",
+    "--renderer-process-limit=2",
+]
+
+class LaunchProfile:
+    """
+    How the browser is started: headless or headed, viewport, device scale
+    factor, browser channels to try and extra Chromium flags
+    """
+
+    def __init__(self, name: str = "desktop", headless: bool = False,
+                 viewport: Optional[Tuple[int, int]] = None, device_scale_factor: float = 1.0,
+                 args: Optional[List[str]] = None, disable_gpu: bool = False,
+                 disable_extensions: bool = False, channels: Tuple[Optional[str], ...] = ("chrome", "msedge", None),
+                 max_pages: int = 4):
+        self.name = name
+        self.headless = headless
+        self.viewport = viewport  # (width, height); None keeps the window size (maximized when headed)
+        self.device_scale_factor = device_scale_factor  # Only applied together with a viewport
+        self.args = list(args or [])
+        self.disable_gpu = disable_gpu
+        self.disable_extensions = disable_extensions
+        self.channels = channels  # Tried in order; None is the bundled Chromium
+        self.max_pages = max_pages  # Pages the page pool may open for concurrent chains
+
+    def browser_args(self) -> List[str]:
+        """Command line flags passed to the browser"""
+        args = list(self.args)
+        if not self.headless and self.viewport is None:
+            args.insert(0, "--start-maximized")
+        if self.disable_gpu:
+            args.append("--disable-gpu")
+        if self.disable_extensions:
+            args.append("--disable-extensions")
+        return args
+
+    def launch_options(self) -> Dict[str, Any]:
+        """Keyword arguments for launch_persistent_context (without the channel)"""
+        options = {"headless": self.headless, "args": self.browser_args()}
+        if self.viewport is not None:
+            options["viewport"] = {"width": self.viewport[0], "height": self.viewport[1]}
+            options["device_scale_factor"] = self.device_scale_factor
+        return options
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "headless": self.headless,
+            "viewport": list(self.viewport) if self.viewport else None,
+            "device_scale_factor": self.device_scale_factor,
+            "args": self.browser_args(),
+            "channels": [channel or "chromium" for channel in self.channels],
+            "max_pages": self.max_pages
+        }
+
+def _desktop_profile() -> LaunchProfile:
+    return LaunchProfile("desktop")
+
+def _server_profile() -> LaunchProfile:
+    # The bundled Chromium starts fastest and needs no system browser
+    return LaunchProfile("server", headless=True, viewport=(1280, 800), args=SERVER_ARGS,
+                         disable_gpu=True, disable_extensions=True, channels=(None,), max_pages=2)
+
+LAUNCH_PROFILES = {
+    "desktop": _desktop_profile,
+    "server": _server_profile,
+}
+
+def display_available() -> bool:
+    """Whether a graphical display is available (always true outside Linux)"""
+    if not sys.platform.startswith("linux"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+def parse_viewport(value: str) -> Tuple[int, int]:
+    """Parse a viewport given as WIDTHxHEIGHT"""
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+def _env_bool(name: str) -> Optional[bool]:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def resolve_launch_profile(name: Optional[str] = None, headless: Optional[bool] = None,
+                           viewport: Optional[str] = None, device_scale_factor: Optional[float] = None,
+                           extra_args: Optional[List[str]] = None) -> LaunchProfile:
+    """
+    Build the launch profile from command line values, falling back to the
+    BROWSER_PROFILE, HEADLESS, VIEWPORT, DEVICE_SCALE_FACTOR and BROWSER_ARGS
+    settings. Without a display the server profile is the default.
+    """
+    name = name or os.environ.get("BROWSER_PROFILE") or ("desktop" if display_available() else "server")
+    if name not in LAUNCH_PROFILES:
+        logger.warning(f"Unknown browser profile '{name}', using desktop")
+        name = "desktop"
+    profile = LAUNCH_PROFILES[name]()
+
+    headless = headless if headless is not None else _env_bool("HEADLESS")
+    if headless is not None:
+        profile.headless = headless
+    viewport = viewport or os.environ.get("VIEWPORT")
+    if viewport:
+        profile.viewport = parse_viewport(viewport)
+    if device_scale_factor is None and os.environ.get("DEVICE_SCALE_FACTOR"):
+        device_scale_factor = float(os.environ["DEVICE_SCALE_FACTOR"])
+    if device_scale_factor is not None:
+        profile.device_scale_factor = device_scale_factor
+    profile.args.extend(shlex.split(os.environ.get("BROWSER_ARGS", "")))
+    profile.args.extend(extra_args or [])
+
+    if not profile.headless and not display_available():
+        logger.warning("No display available, switching the browser to headless mode")
+        profile.headless = True
+    return profile
@@ -0,0 +1,277 @@
+"""
+Navigation readiness policies and request blocking for the browser
+"""
+
+import os
+import json
+import time
+import asyncio
+import fnmatch
+import logging
+from pathlib import Path
+from urllib.parse import urlparse
+from typing import Dict, List, Any, Optional, Iterable
+
+logger = logging.getLogger("EirosShell")
+
+WAIT_STATES = ("commit", "domcontentloaded", "load", "networkidle")
+SELECTOR = "selector"  # Wait until a selector appears instead of a load state
+
+# Resource categories that can be blocked, mapped to Playwright resource types
+RESOURCE_TYPES = {
+    "images": {"image"},
+    "media": {"media"},
+    "fonts": {"font"},
+    "stylesheets": {"stylesheet"},
+}
+
+# Third-party analytics and advertising hosts blocked by the "trackers" category
+TRACKER_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*googlesyndication.com*",
+    "*doubleclick.net*",
+    "*connect.facebook.net*",
+    "*hotjar.com*",
+    "*segment.io*",
+    "*cdn.segment.com*",
+    "*mixpanel.com*",
+    "*amplitude.com*",
+    "*clarity.ms*",
+    "*mc.yandex.ru*",
+    "*sentry.io*",
+    "*intercom.io*",
+]
+
+def domain_of(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+def _same_site(host: str, page_host: str) -> bool:
+    """Whether a request host belongs to the page's site (same host or a subdomain of either)"""
+    return host == page_host or host.endswith("." + page_host) or page_host.endswith("." + host)
+
+class NavigationPolicy:
+    """
+    When a navigation counts as done (a load state or a selector appearing)
+    and which requests are blocked while it loads. block holds categories
+    (images, media, fonts, stylesheets, trackers) or URL glob patterns.
+    """
+
+    def __init__(self, wait_until: str = "networkidle", selector: Optional[str] = None,
+                 timeout: float = 30000, block: Iterable[str] = ()):
+        if selector:
+            wait_until = SELECTOR
+        if wait_until not in WAIT_STATES and wait_until != SELECTOR:
+            raise ValueError(f"Unknown navigation wait state: {wait_until}")
+        if wait_until == SELECTOR and not selector:
+            raise ValueError("Waiting for a selector needs a selector")
+        self.wait_until = wait_until
+        self.selector = selector
+        self.timeout = timeout  # Milliseconds
+        self.block = list(block)
+
+    def merged(self, overrides: Dict[str, Any]) -> "NavigationPolicy":
+        """Copy of the policy with values from a command or domain entry applied"""
+        selector = overrides.get("wait_for", overrides.get("selector"))
+        wait_until = overrides.get("wait_until")
+        if wait_until is None:
+            wait_until = SELECTOR if selector else self.wait_until
+        if wait_until == SELECTOR and not selector:
+            selector = self.selector
+        if wait_until != SELECTOR:
+            selector = None
+        block = overrides.get("block", self.block)
+        if isinstance(block, str):
+            block = [item.strip() for item in block.split(",") if item.strip()]
+        return NavigationPolicy(wait_until, selector, overrides.get("timeout", self.timeout), block)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"wait_until": self.wait_until, "selector": self.selector, "timeout": self.timeout, "block": self.block}
+
+class NavigationPolicies:
+    """
+    Default navigation policy plus per-domain policies. A domain entry also
+    applies to its subdomains; the most specific domain wins. Commands can
+    override both.
+    """
+
+    def __init__(self, default: Optional[NavigationPolicy] = None):
+        self.default = default or self._env_default()
+        self.domains: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _env_default() -> NavigationPolicy:
+        """Default policy from the NAVIGATION_WAIT_UNTIL and NAVIGATION_BLOCK settings"""
+        return NavigationPolicy(
+            os.environ.get("NAVIGATION_WAIT_UNTIL") or "networkidle",
+            block=[item.strip() for item in os.environ.get("NAVIGATION_BLOCK", "").split(",") if item.strip()]
+        )
+
+    def set_domain_policy(self, domain: str, **settings) -> None:
+        """Set the policy for a domain, e.g. set_domain_policy("example.com", wait_until="load", block=["images"])"""
+        self.default.merged(settings)  # Validate now rather than on navigation
+        self.domains[domain.lower()] = settings
+
+    def load(self, path: Optional[Path] = None) -> None:
+        """
+        Read policies from JSON: {"default": {...}, "domains": {"example.com": {...}}},
+        by default from ~/EirosShell/navigation_policies.json if it exists
+        """
+        path = Path(path) if path else Path(os.path.expanduser("~")) / "EirosShell" / "navigation_policies.json"
+        try:
+            self.default = self._env_default()
+            if not path.exists():
+                return
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            if config.get("default"):
+                self.default = self.default.merged(config["default"])
+            for domain, settings in config.get("domains", {}).items():
+                self.set_domain_policy(domain, **settings)
+            logger.info(f"Loaded navigation policies for {len(self.domains)} domains from {path}")
+        except Exception as e:
+            logger.error(f"Error loading navigation policies from {path}: {str(e)}")
+
+    def policy_for(self, url: str, overrides: Optional[Dict[str, Any]] = None) -> NavigationPolicy:
+        """Policy for a URL, with command overrides applied last"""
+        policy = self.default
+        host = domain_of(url)
+        matches = [domain for domain in self.domains if host == domain or host.endswith("." + domain)]
+        if matches:
+            policy = policy.merged(self.domains[max(matches, key=len)])
+        if overrides:
+            policy = policy.merged(overrides)
+        return policy
+
+class ResourceBlocker:
+    """
+    Routes the requests of a page through a filter that aborts blocked
+    resource types and URL patterns. The route is installed on a page the
+    first time blocking is asked for; afterwards every navigation sets the
+    active block list of that page.
+    """
+
+    def __init__(self):
+        self._pages = {}  # id(page) -> block list of the current navigation
+        self.blocked = 0
+        self.allowed = 0
+
+    async def apply(self, page, block: List[str]) -> None:
+        """Set what is blocked on a page from now on"""
+        key = id(page)
+        if key not in self._pages:
+            if not block:
+                return
+            await page.route("**/*", lambda route, request: self._handle(page, route, request))
+            page.once("close", lambda *_: self._pages.pop(key, None))
+        self._pages[key] = list(block)
+
+    def should_block(self, block: List[str], resource_type: str, url: str, page_url: str) -> bool:
+        """Whether a request is blocked by a block list"""
+        for item in block:
+            if item in RESOURCE_TYPES:
+                if resource_type in RESOURCE_TYPES[item]:
+                    return True
+            elif item == "trackers":
+                host = domain_of(url)
+                if not _same_site(host, domain_of(page_url)) and any(fnmatch.fnmatch(url, p) for p in TRACKER_PATTERNS):
+                    return True
+            elif fnmatch.fnmatch(url, item):
+                return True
+        return False
+
+    async def _handle(self, page, route, request) -> None:
+        block = self._pages.get(id(page))
+        if block and request.resource_type != "document" and self.should_block(
+                block, request.resource_type, request.url, page.url):
+            self.blocked += 1
+            await route.abort("blockedbyclient")
+            return
+        self.allowed += 1
+        # Let other routes (e.g. a response cache) see the request
+        await route.fallback()
+
+    def stats(self) -> Dict[str, int]:
+        return {"blocked": self.blocked, "allowed": self.allowed}
+
+class NavigationTimings:
+    """
+    Per-domain moving average of how long navigations take to reach network
+    idle without blocking, used to estimate the time a faster policy saves
+    """
+
+    def __init__(self, smoothing: float = 0.3):
+        self.smoothing = smoothing
+        self._baselines: Dict[str, float] = {}
+        self._observers: Dict[int, asyncio.Task] = {}  # id(page) -> background network idle wait
+
+    def observe(self, page, task: asyncio.Task) -> None:
+        """Track the background network idle wait of a page's current navigation"""
+        key = id(page)
+        self._observers[key] = task
+
+        def forget(done: asyncio.Task) -> None:
+            if self._observers.get(key) is done:
+                del self._observers[key]
+        task.add_done_callback(forget)
+
+    def cancel_observer(self, page) -> None:
+        """Stop waiting for network idle of the page's previous navigation"""
+        task = self._observers.pop(id(page), None)
+        if task is not None:
+            task.cancel()
+
+    def baseline(self, url: str) -> Optional[float]:
+        return self._baselines.get(domain_of(url))
+
+    def record_baseline(self, url: str, seconds: float) -> None:
+        domain = domain_of(url)
+        previous = self._baselines.get(domain)
+        self._baselines[domain] = seconds if previous is None else previous + self.smoothing * (seconds - previous)
+
+async def navigate(page, url: str, policy: NavigationPolicy, blocker: ResourceBlocker,
+                   timings: NavigationTimings) -> Dict[str, Any]:
+    """
+    Navigate a page according to a policy. Returns a report with the time
+    taken, the number of blocked requests and the time saved compared with
+    the domain's network-idle baseline (None until a baseline is known).
+    When the policy finishes before network idle and nothing is blocked,
+    network idle is still observed in the background to learn the baseline.
+    """
+    # The next document's idle time must not count for the previous URL
+    timings.cancel_observer(page)
+    await blocker.apply(page, policy.block)
+    blocked_before = blocker.blocked
+    started = time.monotonic()
+
+    if policy.wait_until == SELECTOR:
+        await page.goto(url, wait_until="commit", timeout=policy.timeout)
+        await page.wait_for_selector(policy.selector, timeout=policy.timeout)
+    else:
+        await page.goto(url, wait_until=policy.wait_until, timeout=policy.timeout)
+    elapsed = time.monotonic() - started
+
+    if not policy.block:
+        if policy.wait_until == "networkidle":
+            timings.record_baseline(url, elapsed)
+        else:
+            async def observe_network_idle():
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=policy.timeout)
+                    timings.record_baseline(url, time.monotonic() - started)
+                except Exception:
+                    pass
+            timings.observe(page, asyncio.create_task(observe_network_idle()))
+
+    baseline = timings.baseline(url)
+    return {
+        "url": url,
+        "policy": policy.to_dict(),
+        "elapsed": elapsed,
+        "blocked_requests": blocker.blocked - blocked_before,
+        "baseline": baseline,
+        "time_saved": max(0.0, baseline - elapsed) if baseline is not None else None
+    }
+
+# Global navigation policies, loaded when the browser is launched
+navigation_policies = NavigationPolicies()
@@ -0,0 +1,167 @@
+"""
+Pool of browser pages leased to command chains, so independent chains can
+run concurrently inside one browser process
+"""
+
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger("EirosShell")
+
+class PooledPage:
+    """
+    A page owned by the pool, with the counters used to decide when it is recycled
+    """
+
+    def __init__(self, page, context, own_context: bool):
+        self.page = page
+        self.context = context
+        self.own_context = own_context  # The context was created for this page and is closed with it
+        self.navigations = 0
+        self.leases = 0
+        self.created_at = time.time()
+        page.on("framenavigated", self._on_navigated)
+
+    def _on_navigated(self, frame) -> None:
+        if frame == self.page.main_frame:
+            self.navigations += 1
+
+    async def memory_bytes(self) -> Optional[int]:
+        """JavaScript heap in use by the page (Chromium only), or None if unknown"""
+        try:
+            return await self.page.evaluate("performance.memory ? performance.memory.usedJSHeapSize : null")
+        except Exception:
+            return None
+
+    async def close(self) -> None:
+        try:
+            if self.own_context:
+                await self.context.close()
+            else:
+                await self.page.close()
+        except Exception as e:
+            logger.error(f"Error closing pooled page: {str(e)}")
+
+class PagePool:
+    """
+    Hands out pages with acquire/release, at most max_pages at a time.
+    Released pages are reused, unless they reached max_navigations or
+    max_memory_bytes of JavaScript heap, in which case they are closed and
+    replaced on demand. With isolate=True every page gets its own browser
+    context (separate cookies and storage) when the browser supports it;
+    a persistent profile has a single context, so its pages share it.
+    """
+
+    def __init__(self, browser_controller, max_pages: int = 4, max_navigations: int = 50,
+                 max_memory_bytes: Optional[int] = 512 * 1024 * 1024, isolate: bool = False):
+        self.browser_controller = browser_controller
+        self.max_pages = max_pages
+        self.max_navigations = max_navigations
+        self.max_memory_bytes = max_memory_bytes
+        self.isolate = isolate
+        self._idle: List[PooledPage] = []
+        self._leased: Dict[int, PooledPage] = {}
+        self._opening = 0  # Pages being created, counted against max_pages
+        self._condition = asyncio.Condition()
+        self.created = 0
+        self.recycled = 0
+        self.waits = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._leased) + self._opening
+
+    async def _open_page(self) -> PooledPage:
+        context = self.browser_controller.browser
+        browser = getattr(context, "browser", None)
+        if self.isolate and browser is not None:
+            context = await browser.new_context()
+            page = await context.new_page()
+            return PooledPage(page, context, own_context=True)
+        page = await context.new_page()
+        return PooledPage(page, context, own_context=False)
+
+    async def acquire(self, timeout: Optional[float] = None) -> PooledPage:
+        """Lease a page, opening one if the pool is not full and waiting otherwise"""
+        async with self._condition:
+            if not self._idle and self.size >= self.max_pages:
+                self.waits += 1
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self._idle or self.size < self.max_pages), timeout)
+            if self._idle:
+                pooled = self._idle.pop()
+                self._leased[id(pooled)] = pooled
+                pooled.leases += 1
+                return pooled
+            self._opening += 1
+
+        try:
+            pooled = await self._open_page()
+        except Exception:
+            async with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+        async with self._condition:
+            self._opening -= 1
+            self._leased[id(pooled)] = pooled
+        self.created += 1
+        pooled.leases += 1
+        logger.info(f"Opened pooled page ({self.size}/{self.max_pages})")
+        return pooled
+
+    async def _needs_recycling(self, pooled: PooledPage) -> Optional[str]:
+        if pooled.page.is_closed():
+            return "closed"
+        if self.max_navigations is not None and pooled.navigations >= self.max_navigations:
+            return f"{pooled.navigations} navigations"
+        if self.max_memory_bytes is not None:
+            memory = await pooled.memory_bytes()
+            if memory is not None and memory >= self.max_memory_bytes:
+                return f"{memory // (1024 * 1024)} MB heap"
+        return None
+
+    async def release(self, pooled: PooledPage) -> None:
+        """Return a leased page; pages over a limit are closed instead of reused"""
+        reason = await self._needs_recycling(pooled)
+        if reason:
+            logger.info(f"Recycling pooled page after {reason}")
+            await pooled.close()
+            self.recycled += 1
+        async with self._condition:
+            self._leased.pop(id(pooled), None)
+            if not reason:
+                self._idle.append(pooled)
+            self._condition.notify()
+
+    @asynccontextmanager
+    async def lease(self, timeout: Optional[float] = None):
+        """async with pool.lease() as pooled: ... uses pooled.page and releases it afterwards"""
+        pooled = await self.acquire(timeout)
+        try:
+            yield pooled
+        finally:
+            await self.release(pooled)
+
+    async def close(self) -> None:
+        """Close idle and leased pages"""
+        async with self._condition:
+            pages = self._idle + list(self._leased.values())
+            self._idle.clear()
+            self._leased.clear()
+        for pooled in pages:
+            await pooled.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool occupancy and recycling counters"""
+        return {
+            "idle": len(self._idle),
+            "leased": len(self._leased),
+            "max_pages": self.max_pages,
+            "created": self.created,
+            "recycled": self.recycled,
+            "waits": self.waits
+        }
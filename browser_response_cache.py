@@ -0,0 +1,369 @@
+"""
+On-disk HTTP response cache for static assets, served through request routing
+"""
+
+import os
+import re
+import json
+import time
+import fnmatch
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger("EirosShell")
+
+CACHED_RESOURCE_TYPES = ("script", "stylesheet", "font", "image")
+
+# Headers that describe the transfer rather than the content; bodies are stored decoded
+HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """Directives of a Cache-Control header, e.g. {"max-age": "600", "public": None}"""
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+def freshness_lifetime(headers: Dict[str, str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds a response may be served without revalidation according to its
+    headers, 0 if it must not be reused, or None if the headers do not say
+    """
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if {"no-store", "no-cache", "private"} & directives.keys():
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name) is not None:
+            try:
+                return max(0, int(directives[name]))
+            except ValueError:
+                return 0
+    if headers.get("expires"):
+        try:
+            expires = parsedate_to_datetime(headers["expires"]).timestamp()
+            return max(0, expires - (now or time.time()))
+        except (TypeError, ValueError):
+            return 0
+    return None
+
+class ResponseCache:
+    """
+    Stores GET responses for static resource types on disk and fulfills
+    repeated requests from there. Entries are keyed by URL plus the request
+    headers named in the response's Vary header and kept as long as their
+    Cache-Control/Expires freshness allows. URL patterns in overrides give a
+    fixed lifetime in seconds that replaces the headers. The cache holds at
+    most max_bytes and evicts the least recently used entries.
+
+    Playwright disables the browser's own HTTP cache once routes are
+    installed, so this cache is what keeps assets from being downloaded again.
+
+    The index lives in memory and is only touched on the event loop; body
+    and metadata files are read and written on a single I/O thread, which
+    also keeps writes and deletions of an entry in order.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = 256 * 1024 * 1024,
+                 overrides: Optional[Dict[str, float]] = None,
+                 resource_types: Tuple[str, ...] = CACHED_RESOURCE_TYPES):
+        self.cache_dir = Path(cache_dir) if cache_dir else Path(os.path.expanduser("~")) / "EirosShell" / "response_cache"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 8
+        self.overrides = dict(overrides or {})
+        self.resource_types = set(resource_types)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # key -> metadata, least recently used first
+        self._vary: Dict[str, List[str]] = {}  # URL -> request headers its responses vary on
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self.time_saved = 0.0
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+        self._load()
+
+    def _load(self) -> None:
+        """Rebuild the index from the entries on disk, oldest use first"""
+        entries = []
+        for meta_path in self.cache_dir.glob("*/*.json"):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                body_path = meta_path.with_suffix(".body")
+                entries.append((body_path.stat().st_mtime, meta_path.stem, meta))
+            except Exception as e:
+                logger.warning(f"Dropping unreadable response cache entry {meta_path.name}: {str(e)}")
+                self._remove_files(meta_path.stem)
+        for _, key, meta in sorted(entries, key=lambda entry: entry[0]):
+            self._entries[key] = meta
+            self._vary[meta["url"]] = meta["vary"]
+            self.size += meta["size"]
+        if entries:
+            logger.info(f"Response cache: {len(entries)} entries, {self.size // 1024} KB")
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        directory = self.cache_dir / key[:2]
+        return directory / f"{key}.json", directory / f"{key}.body"
+
+    def _remove_files(self, key: str) -> None:
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def make_key(method: str, url: str, vary: List[str], headers: Dict[str, str]) -> str:
+        """Entry key from the request line and the values of the vary headers"""
+        parts = [method.upper(), url] + [f"{name}:{headers.get(name, '')}" for name in vary]
+        return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()
+
+    def _override(self, url: str) -> Optional[float]:
+        for pattern, lifetime in self.overrides.items():
+            if fnmatch.fnmatch(url, pattern):
+                return lifetime
+        return None
+
+    def cacheable_request(self, method: str, resource_type: str, headers: Dict[str, str]) -> bool:
+        return (method.upper() == "GET" and resource_type in self.resource_types
+                and "range" not in headers and "authorization" not in headers)
+
+    def _find(self, url: str, headers: Dict[str, str], now: Optional[float],
+              background: bool) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Index entry of a fresh cached response; expired entries are discarded"""
+        vary = self._vary.get(url)
+        if vary is None:
+            return None
+        key = self.make_key("GET", url, vary, headers)
+        meta = self._entries.get(key)
+        if meta is None:
+            return None
+        if meta["expires"] <= (now or time.time()):
+            self._discard(key, background)
+            return None
+        return key, meta
+
+    def _read_body(self, key: str) -> Optional[bytes]:
+        """Read an entry's body (I/O thread); None if it is gone"""
+        _, body_path = self._paths(key)
+        try:
+            with open(body_path, 'rb') as f:
+                body = f.read()
+            os.utime(body_path)  # Keeps the recency across restarts
+            return body
+        except Exception as e:
+            logger.warning(f"Error reading response cache entry {key}: {str(e)}")
+            return None
+
+    def _hit(self, key: str, meta: Dict[str, Any], body: Optional[bytes], background: bool) -> Optional[Dict[str, Any]]:
+        if body is None:
+            if self._entries.get(key) is meta:
+                self._discard(key, background)
+            return None
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return {"status": meta["status"], "headers": meta["headers"], "body": body, "fetch_time": meta["fetch_time"]}
+
+    def lookup(self, url: str, headers: Dict[str, str], now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Fresh cached response for a GET request ({"status", "headers", "body", "fetch_time"}), or None"""
+        found = self._find(url, headers, now, background=False)
+        if found is None:
+            return None
+        key, meta = found
+        return self._hit(key, meta, self._read_body(key), background=False)
+
+    async def lookup_async(self, url: str, headers: Dict[str, str], now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """lookup() with the body read on the I/O thread"""
+        found = self._find(url, headers, now, background=True)
+        if found is None:
+            return None
+        key, meta = found
+        body = await asyncio.get_running_loop().run_in_executor(self._io, self._read_body, key)
+        return self._hit(key, meta, body, background=True)
+
+    def _admit(self, url: str, request_headers: Dict[str, str], status: int, headers: Dict[str, str],
+               body: bytes, fetch_time: float, now: Optional[float]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Key and metadata for a response its status, headers and size allow to be stored, or None"""
+        if status != 200 or len(body) > self.max_entry_bytes:
+            return None
+        lifetime = self._override(url)
+        if lifetime is None:
+            if "set-cookie" in headers:
+                return None
+            lifetime = freshness_lifetime(headers, now)
+        if not lifetime:
+            return None
+        vary = sorted({name.strip().lower() for name in headers.get("vary", "").split(",") if name.strip()})
+        if "*" in vary:
+            return None
+
+        key = self.make_key("GET", url, vary, request_headers)
+        meta = {
+            "url": url,
+            "vary": vary,
+            "status": status,
+            "headers": {name: value for name, value in headers.items() if name.lower() not in HOP_HEADERS},
+            "expires": (now or time.time()) + lifetime,
+            "fetch_time": fetch_time,
+            "size": len(body)
+        }
+        return key, meta
+
+    def _write_entry(self, key: str, meta: Dict[str, Any], body: bytes) -> bool:
+        """Write an entry's body and metadata atomically (I/O thread)"""
+        meta_path, body_path = self._paths(key)
+        try:
+            meta_path.parent.mkdir(exist_ok=True)
+            tmp_path = body_path.with_name(f".{key}.{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, body_path)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, meta_path)
+            return True
+        except Exception as e:
+            logger.error(f"Error storing response for {meta['url']}: {str(e)}")
+            self._remove_files(key)
+            return False
+
+    def _index(self, key: str, meta: Dict[str, Any], background: bool) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old["size"]
+        self._entries[key] = meta
+        self._vary[meta["url"]] = meta["vary"]
+        self.size += meta["size"]
+        self.stores += 1
+        self._evict(background)
+
+    def store(self, url: str, request_headers: Dict[str, str], status: int,
+              headers: Dict[str, str], body: bytes, fetch_time: float = 0.0,
+              now: Optional[float] = None) -> bool:
+        """Store a response if its status, headers and size allow it; returns whether it was stored"""
+        admitted = self._admit(url, request_headers, status, headers, body, fetch_time, now)
+        if admitted is None or not self._write_entry(*admitted, body):
+            return False
+        self._index(*admitted, background=False)
+        return True
+
+    async def store_async(self, url: str, request_headers: Dict[str, str], status: int,
+                          headers: Dict[str, str], body: bytes, fetch_time: float = 0.0) -> bool:
+        """store() with the files written on the I/O thread"""
+        admitted = self._admit(url, request_headers, status, headers, body, fetch_time, None)
+        if admitted is None:
+            return False
+        written = await asyncio.get_running_loop().run_in_executor(self._io, self._write_entry, *admitted, body)
+        if written:
+            self._index(*admitted, background=True)
+        return written
+
+    def _discard(self, key: str, background: bool = False) -> None:
+        meta = self._entries.pop(key, None)
+        if meta is not None:
+            self.size -= meta["size"]
+        if background:
+            self._io.submit(self._remove_files, key)
+        else:
+            self._remove_files(key)
+
+    def _evict(self, background: bool = False) -> None:
+        while self.size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._discard(key, background)
+            self.evictions += 1
+
+    async def handle(self, route, request) -> None:
+        """Route handler: fulfill from the cache, or fetch, fulfill and store"""
+        headers = request.headers
+        if not self.cacheable_request(request.method, request.resource_type, headers):
+            await route.fallback()
+            return
+
+        cached = await self.lookup_async(request.url, headers)
+        if cached:
+            self.hits += 1
+            self.bytes_saved += len(cached["body"])
+            self.time_saved += cached["fetch_time"]
+            await route.fulfill(status=cached["status"], headers=cached["headers"], body=cached["body"])
+            return
+
+        self.misses += 1
+        started = time.monotonic()
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logger.debug(f"Response cache fetch failed for {request.url}: {str(e)}")
+            await route.fallback()
+            return
+        fetch_time = time.monotonic() - started
+        response_headers = response.headers
+        await route.fulfill(
+            status=response.status,
+            headers={name: value for name, value in response_headers.items() if name.lower() not in HOP_HEADERS},
+            body=body
+        )
+        await self.store_async(request.url, headers, response.status, response_headers, body, fetch_time)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        for key in list(self._entries):
+            self._discard(key)
+        self._vary.clear()
+
+    def close(self) -> None:
+        """Finish pending file operations and stop the I/O thread"""
+        self._io.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate, bandwidth and fetch time saved, and occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "time_saved": self.time_saved,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_bytes": self.max_bytes
+        }
+
+def response_cache_from_env() -> Optional[ResponseCache]:
+    """
+    Response cache configured by RESPONSE_CACHE (true to enable),
+    RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_MB and RESPONSE_CACHE_OVERRIDES
+    (comma separated pattern=seconds), or None when it is disabled
+    """
+    if os.environ.get("RESPONSE_CACHE", "").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    overrides = {}
+    for item in os.environ.get("RESPONSE_CACHE_OVERRIDES", "").split(","):
+        pattern, _, seconds = item.strip().rpartition("=")
+        if pattern and re.fullmatch(r"\d+(\.\d+)?", seconds):
+            overrides[pattern] = float(seconds)
+        elif item.strip():
+            logger.warning(f"Ignoring response cache override '{item.strip()}' (expected pattern=seconds)")
+    cache_dir = os.environ.get("RESPONSE_CACHE_DIR")
+    try:
+        return ResponseCache(
+            Path(os.path.expanduser(cache_dir)) if cache_dir else None,
+            max_bytes=int(float(os.environ.get("RESPONSE_CACHE_MAX_MB") or 256) * 1024 * 1024),
+            overrides=overrides
+        )
+    except Exception as e:
+        logger.error(f"Error creating response cache: {str(e)}")
+        return None
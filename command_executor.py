@@ -4,7 +4,7 @@ Main command executor module for EirosShell
 
 import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 from parser.command_parser import CommandParser  # Updated import
 from command_types import CommandType
@@ -64,6 +64,36 @@ class CommandExecutor:
             return command_result
         return None
             
+    async def execute_chains_concurrently(self, chains: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Run independent command chains at the same time, each on its own page
+        leased from the browser's page pool (at most max_pages run at once) and
+        with its own variables. Only used for an explicit /parallel block;
+        leased pages start blank, so each chain navigates first, and its /set
+        values do not outlive it.
+        """
+        results = await asyncio.gather(
+            *(execute_command_chain(self.browser, chain, lease_page=True) for chain in chains),
+            return_exceptions=True
+        )
+        chain_results = []
+        for chain, result in zip(chains, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error executing command chain concurrently: {str(result)}")
+                result = None
+            elif result:
+                if self.debug_gui:
+                    self.debug_gui.log_command_result(
+                        result.get("command_id", "unknown"),
+                        "chain",
+                        result.get("status", "error"),
+                        result.get("message", "Unknown result")
+                    )
+                self.history_manager.save_command_to_history({"type": "chain", "id": result["command_id"]}, result)
+                await self.chat.send_message(result["formatted_message"])
+            chain_results.append(result)
+        return chain_results
+    
     async def _send_command_result(self, command: Dict[str, Any], result: Dict[str, Any]):
         """Sends the command execution result back to the chat"""
         # Format a brief message about the result according to the required format
@@ -11,14 +11,18 @@ from typing import Dict, Any, Optional, List
 
 from dsl_parser import parse_command_chain, is_command_chain
 from .dsl_executor import execute_dsl_command
-from .variable_handler import get_all_variables
+from .variable_handler import get_all_variables, variable_scope
 
 logger = logging.getLogger("EirosShell")
 
-async def execute_command_chain(browser_controller, dsl_string: str) -> Optional[Dict[str, Any]]:
+async def execute_command_chain(browser_controller, dsl_string: str, lease_page: bool = False) -> Optional[Dict[str, Any]]:
     """
     Execute a chain of DSL commands in sequence
     
+    With lease_page=True the chain runs on a page leased from the browser's
+    page pool instead of the main page, with its own variable scope, so
+    independent chains can run concurrently.
+    
     Example:
     /chain#cmd9[
       /navigate#cmd1{ "url": "https://example.com" },
@@ -38,6 +42,12 @@ async def execute_command_chain(browser_controller, dsl_string: str) -> Optional
     
     Returns a result dictionary with information about the chain execution
     """
+    if lease_page:
+        async with browser_controller.page_pool.lease() as pooled:
+            chain_browser = browser_controller.for_page(pooled.page)
+            with variable_scope():
+                return await execute_command_chain(chain_browser, dsl_string)
+    
     logger.info(f"Executing command chain: {dsl_string}")
     
     # Extract the chain ID
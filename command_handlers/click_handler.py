@@ -3,9 +3,8 @@ Handler for click commands
 """
 
 import logging
+import time
 from typing import Dict, Any
-import numpy as np
-import cv2
 
 from command_types import CommandType
 from .pattern_memory import pattern_memory
@@ -13,6 +12,13 @@ from pattern_matcher import pattern_matcher
 
 logger = logging.getLogger("EirosShell")
 
+async def find_visual_match(url, screenshot, element_id, index, frame_id):
+    """Best visual match, or the index-th occurrence in reading order when an index is given"""
+    if index is None:
+        return await pattern_matcher.find_best_match_async(url, screenshot, element_id, frame_id=frame_id)
+    matches = await pattern_matcher.find_all_matches_async(url, screenshot, element_id, frame_id=frame_id)
+    return pattern_matcher.select_occurrence(matches, index)
+
 async def handle_click_command(browser, params, command_id):
     """Обрабатывает команду клика по элементу"""
     result = {
@@ -25,6 +31,7 @@ async def handle_click_command(browser, params, command_id):
     selector = params.get("selector") or params.get("element")
     context = params.get("context", "default")
     force_visual = params.get("force_visual", False)
+    index = params.get("index")  # n-th visual occurrence (0-based, negative from the end)
     
     if selector:
         try:
@@ -64,36 +71,35 @@ async def handle_click_command(browser, params, command_id):
                 else:
                     # Try visual pattern matching as fallback
                     try:
-                        # Take a screenshot
-                        screenshot_path = await browser.take_screenshot()
-                        if screenshot_path:
-                            # Load screenshot for matching
-                            screenshot = cv2.imread(screenshot_path)
-                            if screenshot is not None:
-                                # Get current URL for context
-                                url = await browser.page.url
-                                
-                                # Try to find a visual match
-                                match = pattern_matcher.find_best_match(url, screenshot)
-                                
-                                if match:
-                                    # Click on the matched element using PyAutoGUI
-                                    if pattern_matcher.click_match(match):
-                                        result["status"] = "success"
-                                        result["message"] = f"Selector failed, visual pattern match used for: {selector}"
-                                        result["fallback_used"] = True
-                                        result["matched_pattern"] = match["id"]
-                                        
-                                        # Log success with special attributes
-                                        log_record = logger.makeLogRecord({
-                                            'msg': f"Selector failed, visual fallback used: {selector} -> matched '{match['id']}'",
-                                            'levelname': 'INFO',
-                                            'command_id': command_id,
-                                            'command_status': 'success',
-                                            'command_type': CommandType.CLICK
-                                        })
-                                        logger.handle(log_record)
-                                        return result
+                        # Capture the screenshot in memory, without a round trip through disk
+                        screenshot = await browser.capture_screenshot()
+                        if screenshot is not None:
+                            # Get current URL for context
+                            url = browser.page.url
+                            
+                            # Try to find a visual match
+                            match = await find_visual_match(url, screenshot, None, index, f"{command_id}-{time.monotonic_ns()}")
+                            
+                            if match:
+                                # Click on the matched element through the page (works headless)
+                                if await pattern_matcher.click_match_async(match, browser):
+                                    result["status"] = "success"
+                                    result["message"] = f"Selector failed, visual pattern match used for: {selector}"
+                                    result["fallback_used"] = True
+                                    result["matched_pattern"] = match["id"]
+                                    if index is not None:
+                                        result["occurrence"] = match["index"]
+                                    
+                                    # Log success with special attributes
+                                    log_record = logger.makeLogRecord({
+                                        'msg': f"Selector failed, visual fallback used: {selector} -> matched '{match['id']}'",
+                                        'levelname': 'INFO',
+                                        'command_id': command_id,
+                                        'command_status': 'success',
+                                        'command_type': CommandType.CLICK
+                                    })
+                                    logger.handle(log_record)
+                                    return result
                     except Exception as visual_error:
                         logger.error(f"Visual pattern matching error: {str(visual_error)}")
                     
@@ -138,47 +144,46 @@ async def handle_click_command(browser, params, command_id):
                 else:
                     # Try visual pattern matching as fallback or primary method if forced
                     try:
-                        # Take a screenshot
-                        screenshot_path = await browser.take_screenshot()
-                        if screenshot_path:
-                            # Load screenshot for matching
-                            screenshot = cv2.imread(screenshot_path)
-                            if screenshot is not None:
-                                # Get current URL for context
-                                url = await browser.page.url
-                                
-                                # Extract element ID from selector for more specific matching
-                                element_id = None
-                                if selector.startswith('#'):
-                                    element_id = selector[1:]
-                                
-                                # Try to find a visual match
-                                match = pattern_matcher.find_best_match(url, screenshot, element_id)
-                                
-                                if match:
-                                    # Click on the matched element using PyAutoGUI
-                                    if pattern_matcher.click_match(match):
-                                        result["status"] = "success"
-                                        context_msg = "visual pattern match used"
-                                        if force_visual:
-                                            context_msg = "forced visual pattern match used"
-                                        elif not element:
-                                            context_msg = "selector failed, visual pattern match used"
-                                            
-                                        result["message"] = f"{context_msg} for: {selector}"
-                                        result["fallback_used"] = True
-                                        result["matched_pattern"] = match["id"]
+                        # Capture the screenshot in memory, without a round trip through disk
+                        screenshot = await browser.capture_screenshot()
+                        if screenshot is not None:
+                            # Get current URL for context
+                            url = browser.page.url
+                            
+                            # Extract element ID from selector for more specific matching
+                            element_id = None
+                            if selector.startswith('#'):
+                                element_id = selector[1:]
+                            
+                            # Try to find a visual match
+                            match = await find_visual_match(url, screenshot, element_id, index, f"{command_id}-{time.monotonic_ns()}")
+                            
+                            if match:
+                                # Click on the matched element through the page (works headless)
+                                if await pattern_matcher.click_match_async(match, browser):
+                                    result["status"] = "success"
+                                    context_msg = "visual pattern match used"
+                                    if force_visual:
+                                        context_msg = "forced visual pattern match used"
+                                    elif not element:
+                                        context_msg = "selector failed, visual pattern match used"
                                         
-                                        # Log success with special attributes
-                                        log_record = logger.makeLogRecord({
-                                            'msg': f"{context_msg}: {selector} -> matched '{match['id']}'",
-                                            'levelname': 'INFO',
-                                            'command_id': command_id,
-                                            'command_status': 'success',
-                                            'command_type': CommandType.CLICK
-                                        })
-                                        logger.handle(log_record)
-                                        return result
+                                    result["message"] = f"{context_msg} for: {selector}"
+                                    result["fallback_used"] = True
+                                    result["matched_pattern"] = match["id"]
+                                    if index is not None:
+                                        result["occurrence"] = match["index"]
+                                    
+                                    # Log success with special attributes
+                                    log_record = logger.makeLogRecord({
+                                        'msg': f"{context_msg}: {selector} -> matched '{match['id']}'",
+                                        'levelname': 'INFO',
+                                        'command_id': command_id,
+                                        'command_status': 'success',
+                                        'command_type': CommandType.CLICK
+                                    })
+                                    logger.handle(log_record)
+                                    return result
                     except Exception as visual_error:
                         logger.error(f"Visual pattern matching error: {str(visual_error)}")
                     
@@ -8,6 +8,7 @@ import threading
 from typing import Dict, Any
 
 from command_types import CommandType
+from browser_launch_profile import display_available
 from manual_ui_annotator import manual_annotator, start_with_last_screenshot
 
 logger = logging.getLogger("EirosShell")
@@ -21,6 +22,13 @@ async def handle_annotate_command(browser, params, command_id):
         "message": "Starting manual annotation tool"
     }
     
+    if not display_available():
+        # The annotator is a desktop window; headless servers have nowhere to show it
+        result["status"] = "error"
+        result["message"] = "Manual annotation needs a display and is not available in headless mode"
+        logger.warning(f"Manual annotation skipped for command {command_id}: no display")
+        return result
+    
     try:
         screenshot_path = None
         url = None
@@ -57,7 +65,7 @@ async def handle_annotate_command(browser, params, command_id):
 
 async def handle_reference_command(browser, command_type, params, command_id):
     """Handle commands that reference manually annotated elements"""
-    from pattern_storage import PatternStorage
+    from pattern_repository import pattern_repository
     
     result = {
         "command_id": command_id,
@@ -67,8 +75,9 @@ async def handle_reference_command(browser, command_type, params, command_id):
     }
     
     try:
-        storage = PatternStorage()
-        patterns = storage.load_patterns()
+        # Annotations are served from memory; the store is read only once per process
+        pattern_repository.ensure_loaded()
+        patterns = pattern_repository.annotations
         
         # Get the element reference
         element_ref = params.get("element_ref")
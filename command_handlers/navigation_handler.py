@@ -7,6 +7,11 @@ import logging
 from typing import Dict, Any
 
 from command_types import CommandType
+from pattern_matcher import pattern_matcher
+from browser_navigation import navigation_policies
+
+# Command parameters that override the navigation policy of the domain
+POLICY_PARAMS = ("wait_until", "wait_for", "timeout", "block")
 
 logger = logging.getLogger("EirosShell")
 
@@ -21,10 +26,23 @@ async def handle_navigation_command(browser, params, command_id):
     
     url = params.get("url")
     if url:
-        success = await browser.navigate_to(url)
+        overrides = {name: params[name] for name in POLICY_PARAMS if name in params}
+        try:
+            policy = navigation_policies.policy_for(url, overrides)
+        except ValueError as e:
+            result["message"] = f"Неверная политика навигации: {str(e)}"
+            return result
+        success = await browser.navigate_to(url, policy)
+        # Visual match results from the previous page no longer apply
+        pattern_matcher.invalidate_match_cache()
         if success:
             result["status"] = "success"
             result["message"] = f"Успешно открыт URL: {url}"
+            report = getattr(browser, "last_navigation", None)
+            if report:
+                result["navigation"] = report
+                if report.get("time_saved"):
+                    result["message"] += f" (сэкономлено {report['time_saved']:.2f} с)"
         else:
             result["message"] = f"Ошибка при переходе на URL: {url}"
     else:
@@ -4,50 +4,53 @@ Pattern memory module for EirosShell
 Enables remembering and recognizing UI elements across sessions
 """
 
-import json
 import logging
-import os
-import base64
 from typing import Dict, Any, List, Optional
-from pathlib import Path
 import time
 
+from pattern_repository import PatternRepository, pattern_repository
+
 logger = logging.getLogger("EirosShell")
 
+async def _query_element(browser, selector: str):
+    """Resolve a selector through the browser's element cache, so the following wait and action reuse the handle"""
+    if hasattr(browser, "query_selector"):
+        return await browser.query_selector(selector)
+    # Controllers without an element cache
+    return await browser.page.query_selector(selector)
+
 class PatternMemory:
     """
     Stores and retrieves information about UI elements across sessions
     """
     
-    def __init__(self):
-        self.memory_file = Path(os.path.expanduser("~")) / "EirosShell" / "patterns" / "pattern_memory.json"
-        self.memory_dir = self.memory_file.parent
-        self.memory_dir.mkdir(parents=True, exist_ok=True)
-        self.patterns = {}
-        self.load_patterns()
+    def __init__(self, repository: Optional[PatternRepository] = None):
+        self.repository = repository or pattern_repository
+        self.patterns = self.repository.elements  # Loaded on first access
+    
+    @property
+    def storage(self):
+        """Storage backend of the pattern repository"""
+        return self.repository.storage
+    
+    @property
+    def blob_store(self):
+        """Blob store holding element screenshots"""
+        return self.repository.blob_store
     
     def load_patterns(self) -> None:
-        """Load patterns from disk"""
-        try:
-            if self.memory_file.exists():
-                with open(self.memory_file, 'r') as f:
-                    self.patterns = json.load(f)
-                logger.info(f"Loaded {len(self.patterns)} patterns from memory file")
-            else:
-                logger.info("No pattern memory file found, starting with empty patterns")
-                self.patterns = {}
-        except Exception as e:
-            logger.error(f"Error loading pattern memory: {str(e)}")
-            self.patterns = {}
+        """Reload patterns from storage"""
+        self.repository.load()
     
-    def save_patterns(self) -> None:
-        """Save patterns to disk"""
-        try:
-            with open(self.memory_file, 'w') as f:
-                json.dump(self.patterns, f, indent=2)
-            logger.info(f"Saved {len(self.patterns)} patterns to memory file")
-        except Exception as e:
-            logger.error(f"Error saving pattern memory: {str(e)}")
+    def save_patterns(self, changed_keys: Optional[List[str]] = None) -> None:
+        """Save patterns to storage; with changed_keys only those patterns are written"""
+        if not self.repository.save(changed_keys):
+            logger.error("Error saving pattern memory")
+    
+    def flush(self) -> None:
+        """Write pending access statistics now, e.g. at shutdown"""
+        if not self.repository.flush():
+            logger.error("Error flushing pattern memory")
     
     async def learn_element(self, browser, selector: str, context: str = "default") -> Dict[str, Any]:
         """
@@ -62,7 +65,7 @@ class PatternMemory:
                 return self.patterns[pattern_key]
             
             # Get element info using playwright
-            element = await browser.page.query_selector(selector)
+            element = await _query_element(browser, selector)
             if not element:
                 logger.warning(f"Element {selector} not found, cannot learn pattern")
                 return {}
@@ -79,11 +82,9 @@ class PatternMemory:
             
             location = [bbox["x"], bbox["y"], bbox["width"], bbox["height"]]
             
-            # Take screenshot of the element
+            # Take screenshot of the element and keep it in the blob store
             screenshot_data = await element.screenshot()
-            
-            # Convert screenshot to base64
-            screenshot_b64 = base64.b64encode(screenshot_data).decode('utf-8')
+            screenshot_blob = self.blob_store.put(screenshot_data)
             
             # Save additional identifiers that might help with recovery
             attributes = await element.evaluate("""el => {
@@ -101,7 +102,7 @@ class PatternMemory:
                 "type": tag_name,
                 "text": inner_text,
                 "location": location,
-                "screenshot": screenshot_b64,
+                "screenshot_blob": screenshot_blob,
                 "context": context,
                 "attributes": attributes,
                 "last_seen": timestamp,
@@ -111,7 +112,7 @@ class PatternMemory:
             
             # Store pattern
             self.patterns[pattern_key] = pattern_data
-            self.save_patterns()
+            self.save_patterns([pattern_key])
             
             logger.info(f"Learned pattern for element {selector} in context {context}")
             return pattern_data
@@ -132,13 +133,12 @@ class PatternMemory:
             pattern = self.patterns[pattern_key]
             
             # Try to find the element
-            element = await browser.page.query_selector(selector)
+            element = await _query_element(browser, selector)
             if element:
                 # Update last seen timestamp and counter
                 pattern["last_seen"] = time.time()
                 pattern["times_seen"] = pattern.get("times_seen", 0) + 1
-                self.patterns[pattern_key] = pattern
-                self.save_patterns()
+                self.repository.mark_dirty([pattern_key])
                 
                 logger.info(f"Recognized element {selector} in context {context}")
                 return pattern
@@ -155,10 +155,14 @@ class PatternMemory:
         pattern_key = f"{selector}:{context}"
         return self.patterns.get(pattern_key)
     
+    def get_screenshot(self, selector: str, context: str = "default") -> Optional[bytes]:
+        """Load the stored screenshot of an element on demand"""
+        pattern = self.get_pattern(selector, context)
+        return self.blob_store.load_screenshot(pattern) if pattern else None
+    
     def clear_patterns(self) -> None:
-        """Clear all patterns"""
-        self.patterns = {}
-        self.save_patterns()
+        """Clear all learned element patterns"""
+        self.repository.clear(self.patterns.kind)
 
 # Global pattern memory instance
 pattern_memory = PatternMemory()
@@ -4,6 +4,8 @@ Handler for variable operations in the DSL
 """
 import logging
 import re
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Dict, Any, Optional
 
 logger = logging.getLogger("EirosShell")
@@ -11,6 +13,25 @@ logger = logging.getLogger("EirosShell")
 # Global variable store
 _variables = {}
 
+# Variables of the chain running in the current task, when it has its own scope
+_scoped_variables: ContextVar[Optional[Dict[str, Any]]] = ContextVar("eiros_variables", default=None)
+
+def _store() -> Dict[str, Any]:
+    scoped = _scoped_variables.get()
+    return scoped if scoped is not None else _variables
+
+@contextmanager
+def variable_scope():
+    """
+    Give the current task its own variables, starting from a copy of the
+    visible ones, so chains running concurrently do not overwrite each other's /set values
+    """
+    token = _scoped_variables.set(dict(_store()))
+    try:
+        yield
+    finally:
+        _scoped_variables.reset(token)
+
 def handle_set_command(params: Dict[str, Any], command_id: str) -> Dict[str, Any]:
     """
     Handles the set command to store a variable
@@ -41,7 +62,7 @@ def handle_set_command(params: Dict[str, Any], command_id: str) -> Dict[str, Any
             }
             
         # Store the variable
-        _variables[var_name] = value
+        _store()[var_name] = value
         
         logger.info(f"Variable '{var_name}' set to '{value}'")
         
@@ -68,7 +89,7 @@ def get_variable(var_name: str) -> Any:
     """
     Retrieve a variable's value from the store
     """
-    return _variables.get(var_name)
+    return _store().get(var_name)
 
 def resolve_variables(text: str) -> str:
     """
@@ -118,7 +139,7 @@ def evaluate_condition(condition_str: str) -> bool:
             resolved_condition = resolved_condition.replace(f"${var_name}", str(var_value))
         
         # Also handle direct variable names without $ prefix
-        for var_name, var_value in _variables.items():
+        for var_name, var_value in _store().items():
             if re.search(r'\b' + var_name + r'\b', resolved_condition):
                 # For string values, wrap them in quotes
                 if isinstance(var_value, str):
@@ -137,7 +158,7 @@ def evaluate_condition(condition_str: str) -> bool:
 
 def clear_variables():
     """Clear all variables (useful for testing)"""
-    _variables.clear()
+    _store().clear()
 
 def process_params_with_variables(params):
     """
@@ -165,4 +186,4 @@ def process_params_with_variables(params):
 
 def get_all_variables() -> Dict[str, Any]:
     """Get all variables for export/debug purposes"""
-    return dict(_variables)
+    return dict(_store())
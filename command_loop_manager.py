@@ -6,7 +6,7 @@ import asyncio
 import logging
 from typing import Dict, Any, Optional
 
-from dsl_parser import is_dsl_command, is_command_chain  # Updated import 
+from dsl_parser import is_dsl_command, is_command_chain, is_parallel_block, parse_parallel_block  # Updated import 
 from command_handlers import execute_dsl_command, execute_command_chain
 
 logger = logging.getLogger("EirosShell")
@@ -37,7 +37,12 @@ class CommandLoopManager:
     
     async def _process_command_response(self, response):
         """Processes a command response from ChatGPT"""
-        if is_command_chain(response):
+        if is_parallel_block(response):
+            # Chains the sender marked as independent run concurrently, each on a leased page
+            chains = parse_parallel_block(response)
+            if chains:
+                await self.executor.execute_chains_concurrently(chains)
+        elif is_command_chain(response):
             # Execute a chain of DSL commands
             await self._execute_command_chain(response)
         elif is_dsl_command(response):
@@ -3,13 +3,16 @@
 DSL Parser package for parsing EirosShell command DSL
 """
 
-from .detector import is_dsl_command, is_command_chain
+from .detector import is_dsl_command, is_command_chain, is_parallel_block
 from .command_parser import parse_dsl_command
-from .chain_parser import parse_command_chain
+from .chain_parser import parse_command_chain, split_command_chains, parse_parallel_block
 
 __all__ = [
     'is_dsl_command',
     'is_command_chain',
+    'is_parallel_block',
     'parse_dsl_command',
-    'parse_command_chain'
+    'parse_command_chain',
+    'split_command_chains',
+    'parse_parallel_block'
 ]
@@ -96,3 +96,87 @@ def parse_command_chain(dsl_string: str) -> List[str]:
     except Exception as e:
         logger.error(f"Error parsing command chain: {str(e)}")
         return []
+
+def split_command_chains(message: str) -> List[str]:
+    """
+    Split text holding several command chains, separated by whitespace or
+    commas, into one string per chain.
+    
+    Example:
+    /chain#a[ /navigate#a1{ "url": "https://example.com" } ],
+    /chain#b[ /navigate#b1{ "url": "https://example.org" } ]
+    
+    Returns [message] when it is a single chain or has anything between chains.
+    """
+    text = message.strip()
+    chains = []
+    position = 0
+    while position < len(text):
+        if text[position] in " \t\r\n,":
+            position += 1
+            continue
+        if not re.match(r'/chain#[a-zA-Z0-9_-]+\[', text[position:]):
+            return [message]
+        
+        # Find the bracket closing this chain
+        bracket_count = 0
+        end = -1
+        for i in range(text.find("[", position), len(text)):
+            if text[i] == '[':
+                bracket_count += 1
+            elif text[i] == ']':
+                bracket_count -= 1
+                if bracket_count == 0:
+                    end = i
+                    break
+        if end < 0:
+            return [message]
+        chains.append(text[position:end + 1])
+        position = end + 1
+    return chains or [message]
+
+def parse_parallel_block(dsl_string: str) -> List[str]:
+    """
+    Parse a parallel block into the command chains it holds.
+    
+    Example:
+    /parallel#cmd9[
+      /chain#a[ /navigate#a1{ "url": "https://example.com" } ],
+      /chain#b[ /navigate#b1{ "url": "https://example.org" } ]
+    ]
+    
+    Returns a list of chain strings, or an empty list if the block is invalid.
+    """
+    try:
+        block_match = re.match(r'^/parallel#([a-zA-Z0-9_-]+)\[', dsl_string.strip())
+        if not block_match:
+            logger.error(f"Invalid parallel block format: {dsl_string}")
+            return []
+        
+        text = dsl_string.strip()
+        bracket_count = 0
+        content_end = -1
+        for i in range(block_match.end() - 1, len(text)):
+            if text[i] == '[':
+                bracket_count += 1
+            elif text[i] == ']':
+                bracket_count -= 1
+                if bracket_count == 0:
+                    content_end = i
+                    break
+        if content_end < 0:
+            logger.error(f"Unbalanced brackets in parallel block: {dsl_string}")
+            return []
+        
+        content = text[block_match.end():content_end]
+        chains = split_command_chains(content)
+        if not all(re.match(r'/chain#[a-zA-Z0-9_-]+\[', chain.strip()) for chain in chains):
+            logger.error(f"Parallel block #{block_match.group(1)} may only contain command chains")
+            return []
+        
+        logger.info(f"Parsed {len(chains)} chains from parallel block #{block_match.group(1)}")
+        return chains
+        
+    except Exception as e:
+        logger.error(f"Error parsing parallel block: {str(e)}")
+        return []
@@ -31,3 +31,15 @@ def is_command_chain(message: str) -> bool:
     """
     message = message.strip()
     return message.startswith("/chain#") and "[" in message and "]" in message
+
+def is_parallel_block(message: str) -> bool:
+    """
+    Check if a message is a block of chains to run concurrently.
+    Format: /parallel#command_id[chains...]
+    
+    Example: /parallel#cmd9[/chain#a[...], /chain#b[...]]
+    
+    Returns True if the message matches the parallel block pattern.
+    """
+    message = message.strip()
+    return message.startswith("/parallel#") and "[" in message and "]" in message
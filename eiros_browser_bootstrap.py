@@ -16,7 +16,10 @@ from openai_login_handler import OpenAILoginHandler
 from chat_connector import ChatConnector
 from command_executor import CommandExecutor
 from utils import internet_connection_available, setup_logging
-from pattern_matcher import pattern_matcher  # Import the pattern matcher
+from pattern_matcher import pattern_matcher, variant_backfill  # Import the pattern matcher
+from command_handlers.pattern_memory import pattern_memory
+from pattern_repository import pattern_repository
+from pattern_retention import retention_manager
 
 # Настройка логирования
 log_dir = Path(os.path.expanduser("~")) / "EirosShell" / "logs"
@@ -30,10 +33,11 @@ try:
 except ImportError:
     pass
 
-async def main(debug_mode=False):
+async def main(debug_mode=False, launch_profile=None):
     """Main entry point for EirosShell"""
     # Setup logging with appropriate level
     logger = setup_logging(log_file, level=logging.DEBUG if debug_mode else logging.INFO)
+    pattern_warm_up = None
     
     try:
         logger.info(f"Запуск EirosShell v0.7 {'в режиме отладки' if debug_mode else ''}...")
@@ -55,12 +59,12 @@ async def main(debug_mode=False):
         
         logger.info("Интернет-соединение доступно.")
         
-        # Initialize pattern matcher
+        # Load patterns on a worker thread while the browser starts
         logger.info("Initializing pattern matcher...")
-        pattern_matcher.load_patterns()
+        pattern_warm_up = asyncio.create_task(pattern_repository.warm_up())
         
         # Инициализация браузера
-        browser_controller = BrowserController(debug_mode=debug_mode)
+        browser_controller = BrowserController(profile=launch_profile, debug_mode=debug_mode)
         browser = await browser_controller.launch_browser()
         
         if not browser:
@@ -69,6 +73,12 @@ async def main(debug_mode=False):
                 debug_gui.update_status(False, "Browser launch failed")
             return
         
+        await pattern_warm_up
+        # Keep learned patterns within the retention limits while the shell runs
+        retention_manager.start()
+        # Precompute template variants for patterns stored without them
+        variant_backfill.start()
+        
         # Update debug GUI status
         if debug_gui:
             debug_gui.update_status(False, "Logging in to OpenAI...")
@@ -141,8 +151,18 @@ async def main(debug_mode=False):
             debug_gui.update_status(False, f"Critical error: {str(e)}")
     finally:
         logger.info("Завершение работы EirosShell...")
+        if pattern_warm_up is not None:
+            # The load cannot be interrupted on its worker thread; let it finish before flushing
+            try:
+                await pattern_warm_up
+            except Exception as e:
+                logger.warning(f"Pattern warm-up failed: {str(e)}")
         if 'browser_controller' in locals():
             await browser_controller.close_browser()
+        retention_manager.stop()
+        variant_backfill.stop()
+        pattern_matcher.close()
+        pattern_memory.flush()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -17,7 +17,7 @@ from typing import Dict, Any, List, Optional, Tuple
 import time
 import re
 
-from pattern_storage import PatternStorage
+from pattern_repository import pattern_repository
 
 logger = logging.getLogger("EirosShell")
 
@@ -27,7 +27,7 @@ class ManualAnnotator:
     """
     
     def __init__(self):
-        self.storage = PatternStorage()
+        self.repository = pattern_repository
         self.root = None
         self.canvas = None
         self.img = None
@@ -36,13 +36,18 @@ class ManualAnnotator:
         self.current_element = None
         self.elements = {}
         self.markers = {}
-        self.screenshot_data = None
+        self.screenshot_blob = None
         self.current_url = "unknown"
         self.annotation_active = False
         self.start_x, self.start_y = 0, 0
         self.rect_id = None
         self.context = "manual"
         
+    @property
+    def blob_store(self):
+        """Blob store holding annotated screenshots"""
+        return self.repository.blob_store
+        
     def start(self, screenshot_path: Optional[str] = None, url: Optional[str] = None):
         """Start the annotation tool with an optional screenshot"""
         if self.root:
@@ -206,9 +211,9 @@ class ManualAnnotator:
             self.canvas.config(scrollregion=(0, 0, self.img.width, self.img.height))
             self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
             
-            # Save screenshot data for pattern storage
+            # Store the screenshot once; saved elements only reference it
             with open(path, "rb") as img_file:
-                self.screenshot_data = base64.b64encode(img_file.read()).decode('utf-8')
+                self.screenshot_blob = self.blob_store.put(img_file.read())
                 
             # Clear existing elements and markers
             self.elements = {}
@@ -456,10 +461,12 @@ class ManualAnnotator:
             return
             
         try:
-            # Load existing patterns
-            patterns = self.storage.load_patterns()
+            # Annotations share the in-memory pattern repository
+            self.repository.ensure_loaded()
+            patterns = self.repository.annotations
             
             # Add/update each element
+            saved_keys = []
             for element_id, element in self.elements.items():
                 name = element.get("name", element_id)
                 context = element.get("context", "manual")
@@ -484,7 +491,7 @@ class ManualAnnotator:
                     "text": element.get("text", ""),
                     "location": element["region"],
                     "context": context,
-                    "screenshot": self.screenshot_data if self.screenshot_data else "",
+                    "screenshot_blob": self.screenshot_blob or "",
                     "learned_at": element.get("created_at", time.time()),
                     "last_seen": time.time(),
                     "times_seen": 1,
@@ -493,9 +500,10 @@ class ManualAnnotator:
                 
                 # Save to patterns
                 patterns[pattern_key] = pattern_data
+                saved_keys.append(pattern_key)
                 
-            # Save patterns to storage
-            if self.storage.save_patterns(patterns):
+            # Save the annotated patterns to storage
+            if self.repository.save(saved_keys):
                 self.status_var.set(f"Saved {len(self.elements)} elements to pattern storage")
                 logger.info(f"Manual annotation: Saved {len(self.elements)} elements to pattern storage")
             else:
@@ -521,10 +529,10 @@ class ManualAnnotator:
         self.root = None
         
     def load_command_image(self, screenshot_data):
-        """Load image from base64 data"""
+        """Load image from raw bytes or base64 data"""
         try:
             # Convert base64 string to image
-            img_data = base64.b64decode(screenshot_data)
+            img_data = base64.b64decode(screenshot_data) if isinstance(screenshot_data, str) else screenshot_data
             img = Image.open(io.BytesIO(img_data))
             
             # Save to temp file for loading
@@ -545,22 +553,26 @@ manual_annotator = ManualAnnotator()
 # Function to start annotator with last screenshot from memory
 def start_with_last_screenshot():
     """Start the manual annotator with the last screenshot from memory"""
-    from pattern_memory import pattern_memory
+    from command_handlers.pattern_memory import pattern_memory
     
-    # Get the patterns
-    patterns = pattern_memory.patterns
+    # Look through learned elements and earlier annotations
+    patterns = dict(pattern_memory.patterns.items())
+    patterns.update(pattern_memory.repository.annotations.items())
     
     # Find the most recent screenshot
-    latest_screenshot = None
+    latest_pattern = None
     latest_time = 0
     latest_url = None
     
     for pattern_id, pattern in patterns.items():
-        if "screenshot" in pattern and pattern.get("last_seen", 0) > latest_time:
-            latest_screenshot = pattern["screenshot"]
+        has_screenshot = pattern.get("screenshot_blob") or pattern.get("screenshot")
+        if has_screenshot and pattern.get("last_seen", 0) > latest_time:
+            latest_pattern = pattern
             latest_time = pattern.get("last_seen", 0)
             latest_url = pattern.get("url", "unknown")
     
+    # Only the chosen screenshot is read from the blob store
+    latest_screenshot = pattern_memory.blob_store.load_screenshot(latest_pattern) if latest_pattern else None
     if latest_screenshot:
         # Start annotator with the screenshot
         manual_annotator.start()
@@ -0,0 +1,140 @@
+"""
+Content-addressed storage for pattern screenshots
+"""
+
+import os
+import time
+import base64
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
+
+logger = logging.getLogger("EirosShell")
+
+class BlobStore:
+    """
+    Keeps image data in files named by their SHA-256 digest, so pattern
+    records only carry the digest and identical images are stored once
+    """
+
+    def __init__(self, blobs_dir: Optional[Path] = None):
+        self.blobs_dir = Path(blobs_dir) if blobs_dir else Path(os.path.expanduser("~")) / "EirosShell" / "patterns" / "blobs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.writes = 0
+        self.dedupes = 0
+
+    def path(self, digest: str) -> Path:
+        """File path of a blob; blobs are fanned out by the first two hex digits"""
+        return self.blobs_dir / digest[:2] / digest
+
+    def put(self, data: Union[bytes, str]) -> str:
+        """Store bytes (or base64 text) and return their digest"""
+        if isinstance(data, str):
+            data = base64.b64decode(data)
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self.path(digest)
+        if blob_path.exists():
+            # Refresh the age so garbage collection keeps a blob that is in use again
+            os.utime(blob_path)
+            self.dedupes += 1
+            return digest
+
+        blob_path.parent.mkdir(exist_ok=True)
+        tmp_path = blob_path.with_name(f".{digest}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, blob_path)
+        self.writes += 1
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Read a blob, or None if it is missing"""
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            logger.warning(f"Blob {digest} not found in {self.blobs_dir}")
+            return None
+        except Exception as e:
+            logger.error(f"Error reading blob {digest}: {str(e)}")
+            return None
+
+    def get_base64(self, digest: str) -> Optional[str]:
+        """Read a blob as base64 text"""
+        data = self.get(digest)
+        return base64.b64encode(data).decode('utf-8') if data is not None else None
+
+    def load_screenshot(self, pattern: Dict[str, Any]) -> Optional[bytes]:
+        """Screenshot bytes of a pattern record, from its blob or from legacy inline base64"""
+        digest = pattern.get("screenshot_blob")
+        if digest:
+            return self.get(digest)
+        if pattern.get("screenshot"):
+            try:
+                return base64.b64decode(pattern["screenshot"])
+            except Exception as e:
+                logger.error(f"Error decoding inline screenshot: {str(e)}")
+        return None
+
+    def externalize(self, patterns: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Move inline base64 screenshots of pattern records into the store,
+        replacing them with digests. Returns the keys of changed records.
+        """
+        changed = []
+        for key, pattern in patterns.items():
+            screenshot = pattern.get("screenshot")
+            if not isinstance(screenshot, str):
+                continue
+            try:
+                if screenshot:
+                    pattern["screenshot_blob"] = self.put(screenshot)
+                del pattern["screenshot"]
+                changed.append(key)
+            except Exception as e:
+                logger.error(f"Error moving screenshot of {key} to the blob store: {str(e)}")
+        if changed:
+            logger.info(f"Moved inline screenshots of {len(changed)} patterns to {self.blobs_dir}")
+        return changed
+
+    def size(self, digest: str) -> int:
+        """Size of a blob in bytes (0 if missing)"""
+        try:
+            return self.path(digest).stat().st_size
+        except OSError:
+            return 0
+
+    def collect_garbage(self, referenced: Set[str], min_age: float = 3600.0) -> Tuple[int, int]:
+        """
+        Delete blobs no pattern references. Blobs younger than min_age seconds are
+        kept, since a screenshot may be stored just before the record that uses it.
+        Returns the number of deleted blobs and the bytes freed.
+        """
+        deleted, freed = 0, 0
+        cutoff = time.time() - min_age
+        for blob_path in self.blobs_dir.glob("*/*"):
+            if blob_path.name.startswith(".") or blob_path.name in referenced:
+                continue
+            try:
+                stat = blob_path.stat()
+                if stat.st_mtime > cutoff:
+                    continue
+                blob_path.unlink()
+                deleted += 1
+                freed += stat.st_size
+            except OSError as e:
+                logger.error(f"Error deleting blob {blob_path.name}: {str(e)}")
+        if deleted:
+            logger.info(f"Deleted {deleted} unreferenced blobs ({freed} bytes)")
+        return deleted, freed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return blob counts and disk usage"""
+        files = [p for p in self.blobs_dir.glob("*/*") if not p.name.startswith(".")]
+        return {
+            "blobs": len(files),
+            "bytes": sum(p.stat().st_size for p in files),
+            "writes": self.writes,
+            "dedupes": self.dedupes
+        }
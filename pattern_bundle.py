@@ -0,0 +1,334 @@
+"""
+Packed pattern bundles: one file holding pattern records, preprocessed
+grayscale templates, their signatures, the screenshot blobs the records
+reference and an index, for shipping learned patterns to other machines.
+Templates are memory-mapped when matching.
+
+Layout: magic (8 bytes), format version (uint32), index length (uint64),
+JSON index, padding to DATA_ALIGNMENT, then raw uint8 template pixels and
+blob bytes, each starting at an aligned offset. Records refer to their
+template as <bundle file name>#<key>, relative to the bundle's directory.
+
+Usage:
+    python pattern_bundle.py build patterns.pbundle [--dir ~/EirosShell/patterns]
+    python pattern_bundle.py inspect patterns.pbundle
+    python pattern_bundle.py verify patterns.pbundle
+    python pattern_bundle.py import patterns.pbundle
+"""
+
+import os
+import json
+import time
+import shutil
+import struct
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+logger = logging.getLogger("EirosShell")
+
+BUNDLE_MAGIC = b"EIROSPB1"
+BUNDLE_VERSION = 1
+BUNDLE_SUFFIX = ".pbundle"
+DATA_ALIGNMENT = 64
+HEADER = struct.Struct("<8sIQ")
+BUNDLES_DIR = "bundles"  # Imported bundles are kept here, inside the pattern directory
+
+def bundle_template_path(bundle_path: str, key: str) -> str:
+    """image_path value that refers to a template inside a bundle; relative bundle paths stay relative"""
+    return f"{Path(bundle_path).as_posix()}#{quote(key, safe='')}"
+
+def is_bundle_path(path: str) -> bool:
+    """Check whether an image_path points into a bundle"""
+    return "#" in path and path.rpartition("#")[0].endswith(BUNDLE_SUFFIX)
+
+def _aligned(offset: int) -> int:
+    return (offset + DATA_ALIGNMENT - 1) // DATA_ALIGNMENT * DATA_ALIGNMENT
+
+class PatternBundle:
+    """
+    Read-only view of a bundle file. Templates are returned as arrays backed
+    by the memory map, so they are neither decoded nor copied.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        with open(self.path, 'rb') as f:
+            magic, version, index_length = HEADER.unpack(f.read(HEADER.size))
+            if magic != BUNDLE_MAGIC:
+                raise ValueError(f"{self.path} is not a pattern bundle")
+            if version != BUNDLE_VERSION:
+                raise ValueError(f"Unsupported pattern bundle version {version}")
+            self.index = json.loads(f.read(index_length).decode('utf-8'))
+        self.data_offset = _aligned(HEADER.size + index_length)
+        self._map = np.memmap(self.path, dtype=np.uint8, mode='r')
+        self._templates = {}
+
+    @property
+    def records(self) -> Dict[str, Dict[str, Any]]:
+        """Pattern records stored in the bundle"""
+        return self.index["records"]
+
+    @property
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """Template entries (offset, shape, signature, sha256) keyed by pattern key"""
+        return self.index["templates"]
+
+    @property
+    def blobs(self) -> Dict[str, Dict[str, Any]]:
+        """Screenshot blob entries (offset, length) keyed by digest"""
+        return self.index.get("blobs", {})
+
+    def template(self, key: str) -> Optional[np.ndarray]:
+        """Grayscale template of a pattern as a read-only view into the bundle"""
+        template = self._templates.get(key)
+        if template is None:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            h, w = entry["shape"]
+            start = self.data_offset + entry["offset"]
+            template = self._map[start:start + h * w].reshape(h, w)
+            self._templates[key] = template
+        return template
+
+    def blob(self, digest: str) -> Optional[bytes]:
+        """Bytes of a screenshot blob stored in the bundle"""
+        entry = self.blobs.get(digest)
+        if entry is None:
+            return None
+        start = self.data_offset + entry["offset"]
+        return self._map[start:start + entry["length"]].tobytes()
+
+    def verify(self) -> List[str]:
+        """Check bounds and checksums of every template; returns the problems found"""
+        problems = []
+        for key, entry in self.entries.items():
+            h, w = entry["shape"]
+            start = self.data_offset + entry["offset"]
+            if entry["offset"] % DATA_ALIGNMENT:
+                problems.append(f"{key}: unaligned offset {entry['offset']}")
+            if start + h * w > len(self._map):
+                problems.append(f"{key}: data extends past the end of the file")
+                continue
+            if hashlib.sha256(self._map[start:start + h * w]).hexdigest() != entry["sha256"]:
+                problems.append(f"{key}: checksum mismatch")
+            if key not in self.records:
+                problems.append(f"{key}: template without a pattern record")
+        for digest, entry in self.blobs.items():
+            start = self.data_offset + entry["offset"]
+            if start + entry["length"] > len(self._map):
+                problems.append(f"blob {digest}: data extends past the end of the file")
+            elif hashlib.sha256(self._map[start:start + entry["length"]]).hexdigest() != digest:
+                problems.append(f"blob {digest}: checksum mismatch")
+        return problems
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts and sizes for inspection"""
+        template_bytes = sum(h * w for h, w in (entry["shape"] for entry in self.entries.values()))
+        return {
+            "path": self.path,
+            "version": BUNDLE_VERSION,
+            "created_at": self.index.get("created_at"),
+            "records": len(self.records),
+            "templates": len(self.entries),
+            "template_bytes": template_bytes,
+            "blobs": len(self.blobs),
+            "blob_bytes": sum(entry["length"] for entry in self.blobs.values()),
+            "file_bytes": os.path.getsize(self.path)
+        }
+
+_open_bundles = {}
+_open_bundles_lock = threading.Lock()
+
+def open_bundle(path: str) -> PatternBundle:
+    """Open a bundle once per process and reuse its memory map"""
+    path = os.path.abspath(path)
+    with _open_bundles_lock:
+        bundle = _open_bundles.get(path)
+        if bundle is None:
+            bundle = PatternBundle(path)
+            _open_bundles[path] = bundle
+        return bundle
+
+def load_bundle_template(image_path: str, base_dir: Optional[Path] = None) -> Optional[np.ndarray]:
+    """
+    Resolve an image_path of the form <bundle>#<key> to its memory-mapped
+    template. A relative bundle path is resolved against base_dir.
+    """
+    try:
+        bundle_path, _, key = image_path.rpartition("#")
+        if base_dir is not None and not os.path.isabs(bundle_path):
+            bundle_path = str(Path(base_dir) / bundle_path)
+        return open_bundle(bundle_path).template(unquote(key))
+    except Exception as e:
+        logger.error(f"Error loading template from bundle {image_path}: {str(e)}")
+        return None
+
+def build_bundle(output_path: str, patterns: Dict[str, Dict[str, Any]], image_processor=None,
+                 blob_store=None) -> Dict[str, Any]:
+    """
+    Write a bundle with all pattern records, the grayscale template of every
+    record that has an image and, with a blob store, the screenshot blobs the
+    records reference. References that cannot be packed (missing images,
+    blobs without a store) are removed from the records, so no record points
+    at a file of this machine. Returns the bundle summary.
+    """
+    if image_processor is None:
+        from pattern_image_processor import PatternImageProcessor
+        image_processor = PatternImageProcessor()
+    from pattern_repository import classify_pattern
+
+    output_path = Path(output_path)
+    records, entries, blobs, blocks = {}, {}, {}, []
+    offset = 0
+    for key, pattern in patterns.items():
+        # The kind is kept explicitly, since it may depend on a reference removed below
+        record = dict(pattern, kind=classify_pattern(pattern))
+        records[key] = record
+
+        digest = record.pop("screenshot_blob", None)
+        if digest and digest not in blobs:
+            data = blob_store.get(digest) if blob_store is not None else None
+            if data is not None:
+                blobs[digest] = {"offset": offset, "length": len(data)}
+                blocks.append((offset, data))
+                offset = _aligned(offset + len(data))
+        if digest in blobs:
+            record["screenshot_blob"] = digest
+
+        image_path = record.pop("image_path", None)
+        if not image_path:
+            continue
+        template = image_processor.load_template(image_path)
+        if template is None:
+            logger.warning(f"Skipping template of {key}: image not found at {image_path}")
+            continue
+
+        data = np.ascontiguousarray(template, dtype=np.uint8)
+        signature = image_processor.compute_signature(data)
+        record["image_path"] = bundle_template_path(output_path.name, key)
+        entries[key] = {
+            "offset": offset,
+            "shape": list(data.shape[:2]),
+            "signature": signature,
+            "sha256": hashlib.sha256(data).hexdigest()
+        }
+        blocks.append((offset, data.tobytes()))
+        offset = _aligned(offset + data.size)
+
+    index = json.dumps({
+        "created_at": time.time(),
+        "records": records,
+        "templates": entries,
+        "blobs": blobs
+    }).encode('utf-8')
+
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(index)))
+        f.write(index)
+        data_offset = _aligned(HEADER.size + len(index))
+        for block_offset, data in blocks:
+            f.seek(data_offset + block_offset)
+            f.write(data)
+        f.truncate(data_offset + offset)
+    os.replace(tmp_path, output_path)
+
+    # A rebuilt bundle must not be served from an old memory map
+    with _open_bundles_lock:
+        _open_bundles.pop(os.path.abspath(output_path), None)
+    summary = PatternBundle(str(output_path)).summary()
+    logger.info(f"Built pattern bundle {output_path}: {summary['records']} records, "
+                f"{summary['templates']} templates, {summary['blobs']} blobs")
+    return summary
+
+def _store_bundle(bundle: PatternBundle, patterns_dir: Path) -> str:
+    """Copy a bundle into the pattern directory; returns its path relative to that directory"""
+    relative = Path(BUNDLES_DIR) / os.path.basename(bundle.path)
+    target = Path(patterns_dir) / relative
+    if os.path.abspath(target) != bundle.path:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        shutil.copyfile(bundle.path, tmp_path)
+        os.replace(tmp_path, target)
+        # A replaced bundle must not be served from an old memory map
+        with _open_bundles_lock:
+            _open_bundles.pop(os.path.abspath(target), None)
+    return relative.as_posix()
+
+def import_bundle(bundle_path: str, repository=None, variant_backfill=None) -> int:
+    """
+    Add the records of a bundle to the pattern repository. The bundle is
+    copied into the pattern directory and templates keep pointing into it
+    by a path relative to that directory, so nothing is extracted and the
+    store can be moved. Screenshot blobs are added to the blob store. With a
+    variant backfill, the imported templates get their variants right away.
+    Returns the number of records.
+    """
+    if repository is None:
+        from pattern_repository import pattern_repository as repository
+    bundle = open_bundle(bundle_path)
+    stored_path = _store_bundle(bundle, repository.storage.patterns_dir)
+
+    for key, pattern in bundle.records.items():
+        record = dict(pattern)
+        if key in bundle.entries:
+            record["image_path"] = bundle_template_path(stored_path, key)
+        digest = record.get("screenshot_blob")
+        if digest:
+            data = bundle.blob(digest)
+            if data is not None:
+                repository.blob_store.put(data)
+            else:
+                # Bundles built before blobs were packed only carry the digest
+                del record["screenshot_blob"]
+        repository.put(key, record)
+    repository.save(list(bundle.records))
+    if variant_backfill is not None:
+        variant_backfill.run_once(list(bundle.entries))
+        repository.flush()
+    logger.info(f"Imported {len(bundle.records)} patterns from {bundle.path}")
+    return len(bundle.records)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, inspect, verify and import pattern bundles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Pack the pattern store into a bundle")
+    build_parser.add_argument("path", help="Output bundle file")
+    build_parser.add_argument("--dir", help="Pattern directory (default ~/EirosShell/patterns)")
+    for name, help_text in (("inspect", "Show bundle contents"), ("verify", "Check bundle integrity"),
+                            ("import", "Add bundle patterns to the pattern store")):
+        subparsers.add_parser(name, help=help_text).add_argument("path", help="Bundle file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from pattern_storage import create_pattern_storage
+        from pattern_blob_store import BlobStore
+        storage = create_pattern_storage(Path(args.dir) if args.dir else None)
+        blob_store = BlobStore(storage.patterns_dir / "blobs")
+        print(json.dumps(build_bundle(args.path, storage.load_patterns(), blob_store=blob_store), indent=2))
+    elif args.command == "inspect":
+        bundle = PatternBundle(args.path)
+        print(json.dumps(bundle.summary(), indent=2))
+        for key, entry in sorted(bundle.entries.items()):
+            h, w = entry["shape"]
+            print(f"{key:<40}{w:>6}x{h:<6}mean {entry['signature']['mean']:6.1f}  std {entry['signature']['std']:6.1f}")
+    elif args.command == "verify":
+        problems = PatternBundle(args.path).verify()
+        for problem in problems:
+            print(problem)
+        print("OK" if not problems else f"{len(problems)} problems found")
+        raise SystemExit(1 if problems else 0)
+    else:
+        from pattern_matcher import variant_backfill
+        print(f"Imported {import_bundle(args.path, variant_backfill=variant_backfill)} patterns")
+
+if __name__ == "__main__":
+    main()
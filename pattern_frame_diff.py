@@ -0,0 +1,129 @@
+"""
+Incremental re-matching: keeps the last frame and match results of each page
+and reuses the results whose screen area did not change
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger("EirosShell")
+
+def changed_blocks(previous: np.ndarray, current: np.ndarray, block_size: int = 32,
+                   pixel_threshold: int = 12) -> np.ndarray:
+    """
+    Compare two grayscale frames of equal size block by block. Returns a
+    boolean grid with True where some pixel of the block changed by more
+    than pixel_threshold gray levels.
+    """
+    h, w = current.shape[:2]
+    rows, cols = -(-h // block_size), -(-w // block_size)
+    diff = np.zeros((rows * block_size, cols * block_size), dtype=np.uint8)
+    # Absolute difference without uint8 wrap-around
+    diff[:h, :w] = np.maximum(previous, current) - np.minimum(previous, current)
+    return diff.reshape(rows, block_size, cols, block_size).max(axis=(1, 3)) > pixel_threshold
+
+class FrameState:
+    """
+    Last prepared frame of a page and the result of every pattern matched
+    on it (a match, or None when the pattern was not found)
+    """
+
+    def __init__(self, gray: np.ndarray, scale: float, results: Dict[str, Optional[Dict[str, Any]]]):
+        self.gray = gray
+        self.scale = scale
+        self.results = results
+        self.updated_at = time.time()
+
+class FrameStateCache:
+    """
+    Per-page frame states. A stored match is reused when neither its region
+    nor the window it was searched in overlaps a changed block; a stored miss
+    only when nothing changed, since it came from a search of the whole frame.
+    """
+
+    def __init__(self, max_pages: int = 8, block_size: int = 32, pixel_threshold: int = 12):
+        self.max_pages = max_pages
+        self.block_size = block_size
+        self.pixel_threshold = pixel_threshold
+        self._states = OrderedDict()  # url -> FrameState
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.rematched = 0
+
+    def _overlaps(self, mask: np.ndarray, rect: Optional[List[float]], scale: float) -> bool:
+        """Whether a full-resolution (x, y, w, h) rectangle touches a changed block"""
+        if not rect:
+            return bool(mask.any())
+        x, y, w, h = [float(v) * scale for v in rect]
+        c0, r0 = max(0, int(x) // self.block_size), max(0, int(y) // self.block_size)
+        c1 = int(np.ceil(x + w)) // self.block_size
+        r1 = int(np.ceil(y + h)) // self.block_size
+        return bool(mask[r0:r1 + 1, c0:c1 + 1].any())
+
+    def reusable(self, url: str, prepared, pattern_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Results of the previous frame of a page that still hold for the new
+        frame, keyed by pattern id (None values are misses that still hold)
+        """
+        with self._lock:
+            state = self._states.get(url)
+        if state is None or state.scale != prepared.scale or state.gray.shape != prepared.gray.shape:
+            return {}
+
+        mask = changed_blocks(state.gray, prepared.gray, self.block_size, self.pixel_threshold)
+        frame_changed = bool(mask.any())
+        reused = {}
+        for pattern_id in pattern_ids:
+            if pattern_id not in state.results:
+                continue
+            match = state.results[pattern_id]
+            if match is None:
+                if not frame_changed:
+                    reused[pattern_id] = None
+            elif not (self._overlaps(mask, match["region"], prepared.scale)
+                      or self._overlaps(mask, match.get("search_window"), prepared.scale)):
+                reused[pattern_id] = dict(match, reused=True)
+
+        with self._lock:
+            self.reused += len(reused)
+            self.rematched += len(pattern_ids) - len(reused)
+        if reused:
+            changed = int(mask.sum())
+            logger.info(f"{changed}/{mask.size} screen blocks changed on {url}, "
+                        f"reusing {len(reused)} of {len(pattern_ids)} pattern results")
+        return reused
+
+    def update(self, url: str, prepared, results: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        """Remember a frame and the results that hold for it"""
+        with self._lock:
+            self._states[url] = FrameState(prepared.gray, prepared.scale, results)
+            self._states.move_to_end(url)
+            while len(self._states) > self.max_pages:
+                self._states.popitem(last=False)
+
+    def invalidate(self, url: Optional[str] = None, pattern_id: Optional[str] = None) -> None:
+        """Forget pages (all of them when no url is given) or the results of one pattern"""
+        with self._lock:
+            if pattern_id is not None:
+                for state in self._states.values():
+                    state.results.pop(pattern_id, None)
+            elif url is None:
+                self._states.clear()
+            else:
+                self._states.pop(url, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """How many pattern results were reused instead of matched again"""
+        with self._lock:
+            total = self.reused + self.rematched
+            return {
+                "pages": len(self._states),
+                "reused": self.reused,
+                "rematched": self.rematched,
+                "reuse_rate": self.reused / total if total else 0.0
+            }
@@ -4,46 +4,185 @@ Image processing module for pattern matching
 """
 
 import cv2
+import hashlib
 import numpy as np
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any, Tuple, Optional
 
+from pattern_template_cache import TemplateCache
+from pattern_bundle import is_bundle_path, load_bundle_template
+from pattern_template_variants import TemplateVariants, VARIANTS_VERSION, variant_name
+
 logger = logging.getLogger("EirosShell")
 
+def reduce_image(image: np.ndarray, level: int) -> np.ndarray:
+    """
+    Downscale an image by a factor of 2**level with area averaging.
+    Screenshots and templates must be reduced the same way for coarse scores to be comparable.
+    """
+    if level <= 0:
+        return image
+    factor = 1.0 / (2 ** level)
+    return cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, overlap: float,
+                        limit: Optional[int] = None) -> np.ndarray:
+    """
+    Greedy non-maximum suppression over (x, y, w, h) boxes. Returns the indices
+    of the kept boxes, highest score first; a box is dropped when its
+    intersection over union with a kept box exceeds overlap.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+    boxes = boxes.astype(np.float64)
+    x0, y0 = boxes[:, 0], boxes[:, 1]
+    x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size and (limit is None or len(keep) < limit):
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        inter_w = np.clip(np.minimum(x1[best], x1[rest]) - np.maximum(x0[best], x0[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y1[best], y1[rest]) - np.maximum(y0[best], y0[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter)
+        order = rest[iou <= overlap]
+    return np.array(keep, dtype=np.intp)
+
+class PreparedScreenshot:
+    """
+    Screenshot converted once (grayscale, optionally downscaled) so that
+    many templates can be matched against it
+    """
+    
+    def __init__(self, gray: np.ndarray, scale: float = 1.0, frame_id: Optional[str] = None):
+        self.gray = gray
+        self.scale = scale
+        self.frame_id = frame_id
+        self.height, self.width = gray.shape[:2]
+        self._pyramid = {0: gray}
+        
+    def pyramid_level(self, level: int) -> np.ndarray:
+        """Return the screenshot reduced by a factor of 2**level, building levels on demand"""
+        if level not in self._pyramid:
+            self._pyramid[level] = reduce_image(self.gray, level)
+        return self._pyramid[level]
+
 class PatternImageProcessor:
     """
     Handles image processing operations for pattern matching
     """
     
-    def __init__(self):
+    def __init__(self, template_cache: Optional[TemplateCache] = None):
         self.match_threshold = 0.8  # Minimum confidence for a match
+        self.match_scale = 1.0  # Downscale factor applied to screenshots and templates before matching
+        self.max_prepared_frames = 4  # Number of prepared screenshots kept by frame id
+        self.match_mode = "exhaustive"  # "exhaustive" or "pyramid" (coarse-to-fine, opt-in and lossy, see _locate_pyramid)
+        self.pyramid_levels = 1  # Number of halvings for the coarse search
+        self.pyramid_refine_radius = 4  # Extra full-resolution pixels searched around each coarse candidate
+        self.pyramid_candidates = 16  # Coarse peaks refined at full resolution
+        self.pyramid_coarse_margin = 0.35  # How far below match_threshold a coarse peak may score
+        self.pyramid_min_template_size = 8  # Smallest template side allowed at the coarse level
+        self.pyramid_fallback = True  # Confirm a pyramid miss with a full-resolution scan
+        self.certain_confidence = 0.95  # A match this strong ends a best-match search early
+        self.search_strategy = "region_prior"  # "region_prior" (stored region first) or "full"
+        self.region_margins = [16, 64, 256]  # Window growth steps around a stored region, in pixels
+        self.nms_overlap = 0.3  # Occurrences overlapping a stronger one by more than this IoU are merged into it
+        self.max_instances = 50  # Most occurrences returned for one template
+        self.variant_edges = False  # Also precompute a Canny edge map with template variants
+        self.template_cache = template_cache or TemplateCache()
+        self.variant_store = None  # Precomputed template variants (TemplateVariantStore), set by the matcher engine
+        self.patterns_dir = None  # Directory relative bundle references are resolved against, set by the matcher engine
+        self._prepared_frames = OrderedDict()
+        self.region_stats = {}  # pattern id -> counters for the region-prior search
+        self._lock = threading.Lock()  # Matching may run on worker threads
         
-    def match_pattern(self, screenshot: np.ndarray, template_path: str) -> Optional[Dict[str, Any]]:
-        """Match a single pattern in the screenshot"""
+    def load_template(self, template_path: str) -> Optional[np.ndarray]:
+        """
+        Load a grayscale template, using the decoded template cache. Templates
+        imported from a bundle are memory-mapped views and bypass the cache.
+        """
+        if is_bundle_path(template_path):
+            return load_bundle_template(template_path, self.patterns_dir)
+        return self.template_cache.get(template_path)
+    
+    def prepare_screenshot(self, screenshot: np.ndarray, frame_id: Optional[str] = None,
+                           scale: Optional[float] = None) -> PreparedScreenshot:
+        """
+        Convert a screenshot for matching. When a frame id is given the result is
+        cached, so repeated calls for the same frame skip the conversion.
+        """
+        scale = self.match_scale if scale is None else scale
+        cache_key = (frame_id, scale)
+        if frame_id is not None:
+            with self._lock:
+                if cache_key in self._prepared_frames:
+                    self._prepared_frames.move_to_end(cache_key)
+                    return self._prepared_frames[cache_key]
+        
+        if screenshot.ndim == 2:
+            gray = screenshot
+        else:
+            gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
+        if scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        prepared = PreparedScreenshot(gray, scale, frame_id)
+        if frame_id is not None:
+            with self._lock:
+                self._prepared_frames[cache_key] = prepared
+                while len(self._prepared_frames) > self.max_prepared_frames:
+                    self._prepared_frames.popitem(last=False)
+        return prepared
+        
+    def match_prepared(self, prepared: PreparedScreenshot, template_path: str,
+                       region: Optional[List[float]] = None, pattern_id: Optional[str] = None,
+                       variants: Optional[TemplateVariants] = None) -> Optional[Dict[str, Any]]:
+        """
+        Match a single template against a prepared screenshot.
+        With the region-prior strategy and a stored region, windows around that
+        region are searched first and the full screenshot only on a miss.
+        With precomputed variants the template is not converted at all.
+        """
         try:
-            template = cv2.imread(template_path)
-            if template is None:
-                logger.warning(f"Could not load template image from {template_path}")
+            gray_template, scaled_template = self._resolve_template(template_path, prepared.scale, variants)
+            if gray_template is None:
                 return None
-                
-            # Convert both to grayscale for better matching
-            gray_screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
-            gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+            
+            h, w = gray_template.shape[:2]
             
             # Apply template matching
-            result = cv2.matchTemplate(gray_screenshot, gray_template, cv2.TM_CCOEFF_NORMED)
+            max_val, max_loc, search_window = -1.0, None, None
+            use_region = self.search_strategy == "region_prior" and region is not None and len(region) == 4
+            if use_region:
+                max_val, max_loc, search_window = self._locate_in_region(prepared, scaled_template, region)
             
-            # Get the best match location and confidence
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            local_hit = max_loc is not None and max_val > self.match_threshold
+            if not local_hit:
+                search_window = [0, 0, prepared.width, prepared.height]
+                if self.match_mode == "pyramid":
+                    max_val, max_loc = self._locate_pyramid(prepared, scaled_template, variants)
+                else:
+                    max_val, max_loc = self._locate_exhaustive(prepared.gray, scaled_template)
             
-            if max_val > self.match_threshold:
-                top_left = max_loc
-                h, w = template.shape[:2]
+            found = max_loc is not None and max_val > self.match_threshold
+            if use_region and pattern_id is not None:
+                self._record_region_stats(pattern_id, local_hit, found)
+            
+            if found:
+                # Map the location back to full-resolution coordinates
+                x = int(round(max_loc[0] / prepared.scale))
+                y = int(round(max_loc[1] / prepared.scale))
                 
                 match = {
                     "confidence": float(max_val),
-                    "region": [top_left[0], top_left[1], w, h],
-                    "center": [top_left[0] + w//2, top_left[1] + h//2]
+                    "region": [x, y, w, h],
+                    "center": [x + w//2, y + h//2],
+                    "search_window": [int(round(v / prepared.scale)) for v in search_window]
                 }
                 return match
             
@@ -52,25 +191,369 @@ class PatternImageProcessor:
             
         return None
     
-    def match_patterns(self, screenshot: np.ndarray, patterns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Match all provided patterns against the screenshot"""
+    def _resolve_template(self, template_path: str, scale: float,
+                          variants: Optional[TemplateVariants] = None) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Return the grayscale template and its copy at the match scale, preferring precomputed variants"""
+        gray_template = variants.gray if variants is not None else self.load_template(template_path)
+        if gray_template is None:
+            logger.warning(f"Could not load template image from {template_path}")
+            return None, None
+        
+        scaled_template = gray_template
+        if scale != 1.0:
+            scaled_template = variants.get(scale) if variants is not None else None
+            if scaled_template is None:
+                scaled_template = cv2.resize(gray_template, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return gray_template, scaled_template
+    
+    def match_all_prepared(self, prepared: PreparedScreenshot, template_path: str,
+                           variants: Optional[TemplateVariants] = None,
+                           max_instances: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find every occurrence of a template above match_threshold with a single
+        matchTemplate pass. Local peaks of the score map are merged by
+        non-maximum suppression. Occurrences are returned in reading order
+        (top to bottom, left to right) with their "index" and confidence "rank".
+        """
+        try:
+            gray_template, scaled_template = self._resolve_template(template_path, prepared.scale, variants)
+            if gray_template is None:
+                return []
+            
+            h, w = gray_template.shape[:2]
+            t_h, t_w = scaled_template.shape[:2]
+            if t_h > prepared.height or t_w > prepared.width:
+                return []
+            
+            result = cv2.matchTemplate(prepared.gray, scaled_template, cv2.TM_CCOEFF_NORMED)
+            # Keep only local maxima, so a plateau of neighbouring scores becomes one candidate
+            peaks = (result >= cv2.dilate(result, np.ones((3, 3), np.uint8))) & (result > self.match_threshold)
+            ys, xs = np.nonzero(peaks)
+            scores = result[ys, xs]
+            boxes = np.stack([xs, ys, np.full_like(xs, t_w), np.full_like(ys, t_h)], axis=1)
+            keep = non_max_suppression(boxes, scores, self.nms_overlap, max_instances or self.max_instances)
+            
+            # Reading order: rows first, then columns. Sorted by y, a location less than half a
+            # template height below the previous one continues its row
+            xs, ys, scores = xs[keep], ys[keep], scores[keep]
+            ranks = np.empty(len(keep), dtype=np.intp)
+            ranks[np.argsort(-scores, kind="stable")] = np.arange(len(keep))
+            by_y = np.argsort(ys, kind="stable")
+            rows = np.empty(len(keep), dtype=np.intp)
+            rows[by_y] = np.cumsum(np.diff(ys[by_y], prepend=ys[by_y][:1]) * 2 >= t_h)
+            order = np.lexsort((xs, rows))
+            
+            matches = []
+            for index, i in enumerate(order):
+                x = int(round(xs[i] / prepared.scale))
+                y = int(round(ys[i] / prepared.scale))
+                matches.append({
+                    "confidence": float(scores[i]),
+                    "region": [x, y, w, h],
+                    "center": [x + w//2, y + h//2],
+                    "search_window": [0, 0, int(round(prepared.width / prepared.scale)),
+                                      int(round(prepared.height / prepared.scale))],
+                    "index": index,
+                    "rank": int(ranks[i])
+                })
+            return matches
+        
+        except Exception as e:
+            logger.error(f"Error in multi-instance pattern matching: {str(e)}")
+            return []
+    
+    def _locate_in_region(self, prepared: PreparedScreenshot, template: np.ndarray,
+                          region: List[float]) -> Tuple[float, Optional[Tuple[int, int]], Optional[List[int]]]:
+        """
+        Search windows around a stored region, widening by region_margins until
+        the threshold is reached. Returns the best score, its location in prepared
+        coordinates and the window (x, y, w, h) that produced it.
+        """
+        t_h, t_w = template.shape[:2]
+        rx, ry, rw, rh = [float(v) * prepared.scale for v in region]
+        best_val, best_loc, best_window = -1.0, None, None
+        
+        for margin in self.region_margins:
+            margin = margin * prepared.scale
+            x0 = max(0, int(rx - margin))
+            y0 = max(0, int(ry - margin))
+            x1 = min(prepared.width, int(np.ceil(rx + max(rw, t_w) + margin)))
+            y1 = min(prepared.height, int(np.ceil(ry + max(rh, t_h) + margin)))
+            if x1 - x0 < t_w or y1 - y0 < t_h:
+                continue
+            
+            val, loc = self._locate_exhaustive(prepared.gray[y0:y1, x0:x1], template)
+            if val > best_val:
+                best_val, best_loc = val, (x0 + loc[0], y0 + loc[1])
+                best_window = [x0, y0, x1 - x0, y1 - y0]
+            if best_val > self.match_threshold:
+                break
+            if x0 == 0 and y0 == 0 and x1 == prepared.width and y1 == prepared.height:
+                # The window already covers the whole screenshot
+                break
+        
+        return best_val, best_loc, best_window
+    
+    def compute_signature(self, template: np.ndarray) -> Dict[str, Any]:
+        """Compact summary of a template (mean and standard deviation of its gray levels)"""
+        if template.ndim == 3:
+            template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        mean, std = cv2.meanStdDev(template)
+        h, w = template.shape[:2]
+        return {"mean": float(mean[0][0]), "std": float(std[0][0]), "size": [w, h]}
+    
+    def build_variants(self, template: np.ndarray, source: str) -> TemplateVariants:
+        """
+        Precompute the forms of a template used by matching with the current
+        settings: grayscale, downscaled, pyramid levels, signature and optionally edges
+        """
+        if template.ndim == 3:
+            template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        gray = np.array(template, dtype=np.uint8)
+        arrays = {"gray": gray}
+        
+        scaled = gray
+        if self.match_scale != 1.0:
+            scaled = cv2.resize(gray, None, fx=self.match_scale, fy=self.match_scale, interpolation=cv2.INTER_AREA)
+            arrays[variant_name(self.match_scale)] = scaled
+        levels = 0
+        for level in range(1, self.pyramid_levels + 1):
+            if min(scaled.shape[:2]) >> level < 1:
+                break
+            arrays[variant_name(self.match_scale, level)] = reduce_image(scaled, level)
+            levels = level
+        if self.variant_edges:
+            arrays["edges"] = cv2.Canny(gray, 50, 150)
+        
+        meta = {
+            "version": VARIANTS_VERSION,
+            "source": source,
+            "scale": self.match_scale,
+            "levels": levels,
+            "edges": self.variant_edges,
+            "signature": self.compute_signature(gray)
+        }
+        digest = hashlib.sha256(gray.tobytes())
+        digest.update(repr(sorted((k, v) for k, v in meta.items() if k != "signature")).encode('utf-8'))
+        meta["token"] = digest.hexdigest()[:16]
+        return TemplateVariants(arrays, meta)
+    
+    def variants_current(self, pattern: Dict[str, Any]) -> bool:
+        """Whether a template record carries variants made for its image and the current settings"""
+        meta = pattern.get("variants")
+        if not meta:
+            return False
+        # Very small templates cannot be reduced as often as pyramid_levels asks
+        smallest = max(1, int(round(min(meta["signature"]["size"]) * self.match_scale)))
+        levels = min(self.pyramid_levels, smallest.bit_length() - 1)
+        return (meta.get("version") == VARIANTS_VERSION
+                and meta.get("source") == pattern.get("image_path")
+                and meta.get("scale") == self.match_scale
+                and meta.get("levels", 0) >= levels
+                and (meta.get("edges") or not self.variant_edges))
+    
+    def get_variants(self, pattern: Dict[str, Any]) -> Optional[TemplateVariants]:
+        """Precomputed variants of a template record, or None if it has none for its current image"""
+        meta = pattern.get("variants")
+        if self.variant_store is None or not meta:
+            return None
+        if meta.get("version") != VARIANTS_VERSION or meta.get("source") != pattern.get("image_path"):
+            return None
+        return self.variant_store.get(pattern.get("id"), meta)
+    
+    def _record_region_stats(self, pattern_id: str, local_hit: bool, found: bool) -> None:
+        with self._lock:
+            stats = self.region_stats.setdefault(pattern_id, {"local_hits": 0, "full_scans": 0, "full_hits": 0, "misses": 0})
+            if local_hit:
+                stats["local_hits"] += 1
+            else:
+                stats["full_scans"] += 1
+                if found:
+                    stats["full_hits"] += 1
+                else:
+                    stats["misses"] += 1
+    
+    def get_region_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-pattern counters showing how often the stored-region window was enough"""
+        report = {}
+        with self._lock:
+            region_stats = {pattern_id: dict(stats) for pattern_id, stats in self.region_stats.items()}
+        for pattern_id, stats in region_stats.items():
+            total = stats["local_hits"] + stats["full_scans"]
+            report[pattern_id] = dict(stats, local_hit_rate=stats["local_hits"] / total if total else 0.0)
+        return report
+        
+    def _locate_exhaustive(self, gray: np.ndarray, template: np.ndarray) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """Scan the whole image and return the best confidence and its top-left location"""
+        result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+    
+    def _locate_pyramid(self, prepared: PreparedScreenshot, template: np.ndarray,
+                        variants: Optional[TemplateVariants] = None) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """
+        Coarse-to-fine search: find candidate peaks on a reduced screenshot and
+        template, then rescore only small full-resolution windows around them.
+        The returned confidence is always a full-resolution TM_CCOEFF_NORMED score.
+        
+        This is lossy: thin text and 1px borders alias away at the coarse level,
+        so the true location can score below look-alike elements and not be
+        refined at all. With pyramid_fallback a miss is confirmed by a full
+        scan, so only templates that are found save time; when several
+        locations clear match_threshold, the one returned may still not be the
+        best.
+        """
+        t_h, t_w = template.shape[:2]
+        levels = self.pyramid_levels
+        while levels > 0 and min(t_h, t_w) >> levels < self.pyramid_min_template_size:
+            levels -= 1
+        if levels == 0:
+            return self._locate_exhaustive(prepared.gray, template)
+        
+        coarse_template = variants.get(prepared.scale, levels) if variants is not None else None
+        if coarse_template is None:
+            coarse_template = reduce_image(template, levels)
+        coarse_screen = prepared.pyramid_level(levels)
+        if (coarse_screen.shape[0] < coarse_template.shape[0]
+                or coarse_screen.shape[1] < coarse_template.shape[1]):
+            return self._locate_exhaustive(prepared.gray, template)
+        
+        coarse_result = cv2.matchTemplate(coarse_screen, coarse_template, cv2.TM_CCOEFF_NORMED)
+        coarse_threshold = self.match_threshold - self.pyramid_coarse_margin
+        factor = 2 ** levels
+        radius = self.pyramid_refine_radius + factor
+        c_h, c_w = coarse_template.shape[:2]
+        
+        best_val, best_loc = -1.0, None
+        for _ in range(self.pyramid_candidates):
+            _, peak_val, _, peak_loc = cv2.minMaxLoc(coarse_result)
+            if peak_val < coarse_threshold:
+                break
+            
+            # Suppress this peak so the next iteration finds a different candidate
+            px, py = peak_loc
+            coarse_result[max(0, py - c_h // 2):py + c_h // 2 + 1,
+                          max(0, px - c_w // 2):px + c_w // 2 + 1] = -1.0
+            
+            # Refine in a full-resolution window around the candidate
+            x0 = max(0, px * factor - radius)
+            y0 = max(0, py * factor - radius)
+            x1 = min(prepared.width, px * factor + t_w + radius)
+            y1 = min(prepared.height, py * factor + t_h + radius)
+            if x1 - x0 < t_w or y1 - y0 < t_h:
+                continue
+            window_val, window_loc = self._locate_exhaustive(prepared.gray[y0:y1, x0:x1], template)
+            if window_val > best_val:
+                best_val, best_loc = window_val, (x0 + window_loc[0], y0 + window_loc[1])
+        
+        if best_val <= self.match_threshold and self.pyramid_fallback:
+            return self._locate_exhaustive(prepared.gray, template)
+        return best_val, best_loc
+        
+    def match_pattern(self, screenshot: np.ndarray, template_path: str) -> Optional[Dict[str, Any]]:
+        """Match a single pattern in the screenshot"""
+        return self.match_prepared(self.prepare_screenshot(screenshot), template_path)
+    
+    def match_pattern_record(self, prepared: PreparedScreenshot, pattern: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Match one stored pattern against a prepared screenshot and attach the pattern information"""
+        if "image_path" not in pattern:
+            return None
+        
+        match = self.match_prepared(prepared, pattern["image_path"], pattern.get("region"), pattern.get("id"),
+                                    self.get_variants(pattern))
+        if match:
+            # Add pattern information to match data
+            match["id"] = pattern["id"]
+            match["selector"] = pattern.get("selector", "")
+            match["original_pattern"] = pattern
+            logger.info(f"Found match for pattern {pattern['id']} with confidence {match['confidence']:.2f}")
+        return match
+    
+    def match_all_pattern_record(self, prepared: PreparedScreenshot, pattern: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Find every occurrence of one stored pattern and attach the pattern information"""
+        if "image_path" not in pattern:
+            return []
+        
+        matches = self.match_all_prepared(prepared, pattern["image_path"], self.get_variants(pattern))
+        for match in matches:
+            match["id"] = pattern["id"]
+            match["selector"] = pattern.get("selector", "")
+            match["original_pattern"] = pattern
+        if matches:
+            logger.info(f"Found {len(matches)} occurrences of pattern {pattern['id']}")
+        return matches
+    
+    def score_at(self, prepared: PreparedScreenshot, pattern: Dict[str, Any], region: List[float]) -> float:
+        """
+        Confidence of a stored pattern at a (x, y, w, h) region of a prepared
+        screenshot, allowing one pixel of rounding; -1.0 when it cannot be scored
+        """
+        try:
+            if "image_path" not in pattern:
+                return -1.0
+            _, template = self._resolve_template(pattern["image_path"], prepared.scale, self.get_variants(pattern))
+            if template is None:
+                return -1.0
+            t_h, t_w = template.shape[:2]
+            x = int(round(float(region[0]) * prepared.scale))
+            y = int(round(float(region[1]) * prepared.scale))
+            x0, y0 = max(0, x - 1), max(0, y - 1)
+            x1, y1 = min(prepared.width, x + t_w + 1), min(prepared.height, y + t_h + 1)
+            if x1 - x0 < t_w or y1 - y0 < t_h:
+                return -1.0
+            score, _ = self._locate_exhaustive(prepared.gray[y0:y1, x0:x1], template)
+            return float(score)
+        except Exception as e:
+            logger.error(f"Error scoring pattern {pattern.get('id')} at its region: {str(e)}")
+            return -1.0
+    
+    @staticmethod
+    def order_candidates(patterns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Order patterns most-likely first: by hit count, then by how recently they matched"""
+        def likelihood(pattern):
+            stats = pattern.get("match_stats") or {}
+            return (stats.get("hits", 0), stats.get("last_matched", 0.0))
+        return sorted(patterns, key=likelihood, reverse=True)
+    
+    def match_patterns_batch(self, screenshot: np.ndarray, patterns: List[Dict[str, Any]],
+                             frame_id: Optional[str] = None, scale: Optional[float] = None,
+                             certain_confidence: Optional[float] = None,
+                             outcomes: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Match all provided patterns against one screenshot, preparing it only once
+        (an already prepared screenshot is used as is).
+        With certain_confidence, candidates are tried most-likely first and the
+        search stops at the first match that clears it.
+        A given outcomes dict receives pattern id -> match (or None) for every pattern tried.
+        Returns the matches sorted by confidence (highest first).
+        """
+        if isinstance(screenshot, PreparedScreenshot):
+            prepared = screenshot
+        else:
+            prepared = self.prepare_screenshot(screenshot, frame_id, scale)
         matches = []
         
+        if certain_confidence is not None:
+            patterns = self.order_candidates(patterns)
+        
         for pattern in patterns:
-            if "image_path" in pattern:
-                match = self.match_pattern(screenshot, pattern["image_path"])
-                if match:
-                    # Add pattern information to match data
-                    match["id"] = pattern["id"]
-                    match["selector"] = pattern.get("selector", "")
-                    match["original_pattern"] = pattern
-                    matches.append(match)
-                    logger.info(f"Found match for pattern {pattern['id']} with confidence {match['confidence']:.2f}")
+            match = self.match_pattern_record(prepared, pattern)
+            if outcomes is not None:
+                outcomes[pattern["id"]] = match
+            if match:
+                matches.append(match)
+                if certain_confidence is not None and match["confidence"] >= certain_confidence:
+                    logger.info(f"Match for pattern {pattern['id']} is certain, skipping remaining candidates")
+                    break
         
         # Sort by confidence (highest first)
         matches.sort(key=lambda x: x["confidence"], reverse=True)
         return matches
     
+    def match_patterns(self, screenshot: np.ndarray, patterns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Match all provided patterns against the screenshot"""
+        return self.match_patterns_batch(screenshot, patterns)
+    
     def crop_element(self, screenshot: np.ndarray, bbox: Dict[str, float]) -> np.ndarray:
         """Crop an element from a screenshot using its bounding box"""
         x, y = int(bbox["x"]), int(bbox["y"])
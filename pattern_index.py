@@ -0,0 +1,118 @@
+"""
+Secondary indexes for fast pattern candidate lookup
+"""
+
+import fnmatch
+import logging
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("EirosShell")
+
+def normalize_url(url: str) -> str:
+    """Reduce a URL to origin + path, dropping the query string and fragment"""
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    if not parts.scheme and not parts.netloc:
+        return url.split("?", 1)[0].split("#", 1)[0]
+    path = parts.path.rstrip("/") or "/"
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{path}"
+
+def is_wildcard_url(url: str) -> bool:
+    """URL patterns such as https://site.com/docs/* apply to a whole section of a site"""
+    return "*" in url
+
+class PatternIndex:
+    """
+    Maintains lookup tables from exact URL, normalized URL, wildcard URL
+    pattern and pattern id to pattern keys, updated incrementally
+    """
+
+    def __init__(self):
+        self._by_url = {}  # exact url -> {pattern key: None}
+        self._by_normalized_url = {}  # normalized url -> {pattern key: None}
+        self._by_id = {}  # pattern id -> pattern key
+        self._wildcards = {}  # pattern key -> wildcard url
+        self._indexed = {}  # pattern key -> (url, id) currently indexed
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._by_url.clear()
+        self._by_normalized_url.clear()
+        self._by_id.clear()
+        self._wildcards.clear()
+        self._indexed.clear()
+
+    def rebuild(self, patterns: Dict[str, Dict[str, Any]]) -> None:
+        """Index every pattern from scratch"""
+        self.clear()
+        for key, pattern in patterns.items():
+            self.add(key, pattern)
+        logger.debug(f"Pattern index rebuilt for {len(patterns)} patterns")
+
+    def add(self, key: str, pattern: Dict[str, Any]) -> None:
+        """Index a pattern, replacing any previous entry for the same key"""
+        self.remove(key)
+        url = pattern.get("url") or ""
+        pattern_id = pattern.get("id", key)
+
+        if url:
+            if is_wildcard_url(url):
+                self._wildcards[key] = url
+            else:
+                self._by_url.setdefault(url, {})[key] = None
+                self._by_normalized_url.setdefault(normalize_url(url), {})[key] = None
+        self._by_id[key] = key
+        if pattern_id != key:
+            self._by_id.setdefault(pattern_id, key)
+        self._indexed[key] = (url, pattern_id)
+
+    def remove(self, key: str) -> None:
+        """Drop a pattern from the index"""
+        indexed = self._indexed.pop(key, None)
+        if indexed is None:
+            return
+        url, pattern_id = indexed
+
+        self._wildcards.pop(key, None)
+        for table, table_key in ((self._by_url, url), (self._by_normalized_url, normalize_url(url))):
+            keys = table.get(table_key)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del table[table_key]
+        if self._by_id.get(key) == key:
+            del self._by_id[key]
+        if self._by_id.get(pattern_id) == key:
+            del self._by_id[pattern_id]
+
+    def lookup_id(self, pattern_id: str) -> Optional[str]:
+        """Return the pattern key for a pattern id"""
+        return self._by_id.get(pattern_id)
+
+    def url_applies(self, key: str, url: str) -> bool:
+        """Check whether the pattern stored under key applies to a URL"""
+        indexed = self._indexed.get(key)
+        if indexed is None:
+            return False
+        pattern_url = indexed[0]
+        if key in self._wildcards:
+            return self._wildcard_matches(pattern_url, url)
+        return pattern_url == url or (bool(pattern_url) and normalize_url(pattern_url) == normalize_url(url))
+
+    def lookup_url(self, url: str) -> List[str]:
+        """
+        Return pattern keys for a URL: exact matches first, then patterns whose
+        URL differs only by query string or fragment, then wildcard patterns
+        """
+        keys = dict(self._by_url.get(url, {}))
+        keys.update(self._by_normalized_url.get(normalize_url(url), {}))
+        for key, pattern_url in self._wildcards.items():
+            if self._wildcard_matches(pattern_url, url):
+                keys[key] = None
+        return list(keys)
+
+    @staticmethod
+    def _wildcard_matches(pattern_url: str, url: str) -> bool:
+        return fnmatch.fnmatchcase(url, pattern_url) or fnmatch.fnmatchcase(normalize_url(url), pattern_url)
@@ -0,0 +1,120 @@
+"""
+Match result cache keyed by a digest of the screenshot
+"""
+
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("EirosShell")
+
+def frame_digest(gray: np.ndarray) -> bytes:
+    """
+    Digest of a grayscale frame's pixels. Frames only share a digest when
+    they are identical, so a small new element always yields a new digest;
+    frames that differ in a few places are left to the block-level reuse of
+    the frame state cache.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(gray.shape).encode('ascii'))
+    digest.update(np.ascontiguousarray(gray).data)
+    return digest.digest()
+
+class MatchResultCache:
+    """
+    Remembers the last match found per URL and candidate set together with
+    the digest of the frame it was found on. Only matches are stored: a
+    search that found nothing is repeated, so an element that just appeared
+    is not reported missing. Callers re-score a cached match on the new
+    frame before using it.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (url, candidate ids) -> (frame digest, match, stored at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(url: str, candidates: List[Dict[str, Any]], element_id: Optional[str] = None) -> Tuple:
+        """Cache key for a URL, optional element id and candidate set"""
+        return (url or "", element_id or "", tuple(sorted(str(p.get("id", "")) for p in candidates)))
+
+    def get(self, key: Tuple, digest: bytes) -> Optional[Any]:
+        """
+        The match (or list of occurrences) stored for the identical frame,
+        or None. Hits are counted by the caller once the match is verified.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_digest, match, _ = entry
+            if stored_digest != digest:
+                # The frame changed, the stored result no longer applies
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if isinstance(match, list):
+                # All occurrences of a pattern (find_all_matches)
+                return [dict(occurrence, cached=True) for occurrence in match]
+            return dict(match, cached=True)
+
+    def confirm(self, key: Tuple, verified: bool) -> None:
+        """Count a stored match the caller re-scored; one that no longer holds is dropped"""
+        with self._lock:
+            if verified:
+                self.hits += 1
+                return
+            self._entries.pop(key, None)
+            self.invalidations += 1
+            self.misses += 1
+
+    def put(self, key: Tuple, digest: bytes, match: Optional[Any]) -> None:
+        """Store the match (or occurrences) found on a frame; empty results are not stored"""
+        if not match:
+            return
+        with self._lock:
+            self._entries[key] = (digest, match, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url: Optional[str] = None, pattern_id: Optional[str] = None) -> None:
+        """Drop stored results for a URL, for results involving a pattern, or all results"""
+        with self._lock:
+            if url is None and pattern_id is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [key for key in self._entries
+                         if (url is not None and key[0] == url)
+                         or (pattern_id is not None and str(pattern_id) in key[2])]
+                for key in stale:
+                    del self._entries[key]
+                removed = len(stale)
+            self.invalidations += removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
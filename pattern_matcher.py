@@ -6,16 +6,16 @@ Pattern Matcher module for visual element recognition
 import logging
 from typing import Dict, List, Any, Optional
 
-from pattern_storage import PatternStorage
+from pattern_repository import pattern_repository
 from pattern_image_processor import PatternImageProcessor
 from pattern_matcher_engine import PatternMatcherEngine
+from pattern_template_variants import VariantBackfill
 
 logger = logging.getLogger("EirosShell")
 
-# Initialize components
-storage = PatternStorage()
+# Initialize components; patterns are loaded on first use or by pattern_repository.warm_up()
 image_processor = PatternImageProcessor()
-pattern_matcher = PatternMatcherEngine(storage, image_processor)
+pattern_matcher = PatternMatcherEngine(None, image_processor, repository=pattern_repository)
 
-# Load patterns on startup
-pattern_matcher.load_patterns()
+# Builds template variants for patterns stored without them
+variant_backfill = VariantBackfill(pattern_matcher)
@@ -3,14 +3,23 @@
 Pattern matcher engine for visual element recognition
 """
 
+import os
+import time
+import asyncio
+import threading
 import cv2
-import pyautogui
 import logging
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 
 from pattern_storage import PatternStorage
 from pattern_image_processor import PatternImageProcessor
+from pattern_index import PatternIndex
+from pattern_match_cache import MatchResultCache, frame_digest
+from pattern_frame_diff import FrameStateCache
+from pattern_repository import PatternRepository, TEMPLATE
+from pattern_template_variants import TemplateVariantStore
 
 logger = logging.getLogger("EirosShell")
 
@@ -19,67 +28,404 @@ class PatternMatcherEngine:
     Core matching engine to find UI patterns
     """
     
-    def __init__(self, storage: PatternStorage, image_processor: PatternImageProcessor):
-        self.storage = storage
+    def __init__(self, storage: Optional[PatternStorage], image_processor: PatternImageProcessor,
+                 max_workers: Optional[int] = None, repository: Optional[PatternRepository] = None):
+        self.repository = repository or PatternRepository(storage)
         self.image_processor = image_processor
-        self.patterns = {}
+        self.index = PatternIndex()
+        self.match_cache = MatchResultCache()
+        self.frame_states = FrameStateCache()
+        self._patterns = self.repository.templates
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)  # Threads used by find_best_match_async
+        self._executor = None
+        # Keep the indexes in step with templates added or removed anywhere in the process
+        self.repository.subscribe(self._on_repository_change)
+        if self.repository.loaded:
+            self.index.rebuild(self._patterns)
+            self._bind_storage()
+    
+    @property
+    def storage(self) -> PatternStorage:
+        """Storage backend of the pattern repository"""
+        return self.repository.storage
+    
+    def _bind_storage(self) -> None:
+        """Let the image processor resolve bundle references and variants of the open storage"""
+        self.image_processor.patterns_dir = self.storage.patterns_dir
+        self._ensure_variant_store()
+    
+    def _ensure_variant_store(self) -> TemplateVariantStore:
+        """Open the variant store next to the pattern storage and hand it to the image processor"""
+        if self.image_processor.variant_store is None:
+            self.image_processor.variant_store = TemplateVariantStore(self.storage.patterns_dir / "variants")
+        return self.image_processor.variant_store
+    
+    @property
+    def variant_store(self) -> TemplateVariantStore:
+        """Precomputed template variants next to the pattern storage, shared with the image processor"""
+        return self._ensure_variant_store()
+        
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the matching thread pool on first use"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pattern-match")
+        return self._executor
+    
+    def close(self) -> None:
+        """Shut down the matching thread pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        
+    @property
+    def patterns(self) -> Dict[str, Any]:
+        """Stored visual templates keyed by pattern id"""
+        return self._patterns
+    
+    @patterns.setter
+    def patterns(self, patterns: Dict[str, Any]) -> None:
+        for pattern_id in list(self._patterns):
+            del self._patterns[pattern_id]
+        self._patterns.update(patterns)
+    
+    def _on_repository_change(self, event: str, kind: Optional[str], key: Optional[str]) -> None:
+        if event == "load":
+            self.index.rebuild(self._patterns)
+            self.match_cache.invalidate()
+            self.frame_states.invalidate()
+            # Storage is open now, so matching can read stored variants and imported bundles
+            self._bind_storage()
+        elif kind == TEMPLATE:
+            if event == "set":
+                self.index.add(key, self._patterns[key])
+            else:
+                self.index.remove(key)
+                self.variant_store.remove(key)
+            self.match_cache.invalidate(pattern_id=key)
+            self.frame_states.invalidate(pattern_id=key)
+    
+    def add_pattern(self, pattern_id: str, pattern: Dict[str, Any]) -> None:
+        """Add or replace a pattern; the lookup indexes follow through the repository"""
+        self._patterns[pattern_id] = pattern
+    
+    def remove_pattern(self, pattern_id: str) -> None:
+        """Remove a pattern and its index entries"""
+        self._patterns.pop(pattern_id, None)
+    
+    def invalidate_match_cache(self, url: Optional[str] = None) -> None:
+        """Forget reusable match results, e.g. after navigation"""
+        self.match_cache.invalidate(url=url)
+        self.frame_states.invalidate(url=url)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit rates of the decoded template cache and the match result cache"""
+        return {
+            "templates": self.image_processor.template_cache.stats(),
+            "variants": self.variant_store.stats(),
+            "matches": self.match_cache.stats(),
+            "frames": self.frame_states.stats()
+        }
         
     def load_patterns(self) -> None:
-        """Load patterns from storage"""
-        self.patterns = self.storage.load_patterns()
+        """Reload patterns from storage"""
+        self.repository.load()
+    
+    def ensure_loaded(self) -> None:
+        """Load patterns on first use"""
+        self.repository.ensure_loaded()
     
-    def save_patterns(self) -> bool:
-        """Save patterns to storage"""
-        return self.storage.save_patterns(self.patterns)
+    def save_patterns(self, changed_keys: Optional[List[str]] = None) -> bool:
+        """Save patterns to storage; with changed_keys only those patterns are written"""
+        return self.repository.save(changed_keys)
+        
+    def _select_candidates(self, url: str, element_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Return the stored patterns that apply to a URL and optional element ID.
+        Uses the indexes, so the cost depends on the number of candidates, not on all patterns.
+        """
+        if element_id:
+            key = self.index.lookup_id(element_id)
+            if key is None or key not in self._patterns:
+                return []
+            if url and not self.index.url_applies(key, url):
+                return []
+            return [self._patterns[key]]
         
-    def find_best_match(self, url: str, screenshot: np.ndarray, element_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
-        """Find the best match for a given URL and optional element ID"""
+        if not url:
+            return list(self._patterns.values())
+        
+        return [self._patterns[key] for key in self.index.lookup_url(url) if key in self._patterns]
+        
+    def find_best_match(self, url: str, screenshot: np.ndarray, element_id: Optional[str] = None,
+                        frame_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the best match for a given URL and optional element ID.
+        The screenshot is prepared once and reused for every candidate;
+        pass a frame_id to reuse the prepared frame across calls.
+        """
         # Filter patterns by URL if provided
-        url_patterns = []
-        for pattern_id, pattern in self.patterns.items():
-            if element_id and pattern_id != element_id:
-                continue
-            
-            if pattern.get("url") == url or not url:
-                url_patterns.append(pattern)
+        url_patterns = self._select_candidates(url, element_id)
         
         if not url_patterns:
             logger.info(f"No patterns found for URL {url}")
             return None
         
-        # Match against filtered patterns
-        matches = self.image_processor.match_patterns(screenshot, url_patterns)
+        prepared, digest = self._prepare_frame(screenshot, frame_id)
         
-        if matches:
+        # Reuse the previous match if the frame is identical and the match still scores there
+        cache_key = self.match_cache.make_key(url, url_patterns, element_id)
+        cached_match = self._verified_cached(cache_key, digest, prepared, url_patterns)
+        if cached_match:
+            logger.info(f"Frame unchanged for URL {url}, reusing previous match result")
+            self.record_match(cached_match)
+            return cached_match
+        
+        # Reuse results whose screen area did not change since the previous frame of this page
+        certain_confidence = self.image_processor.certain_confidence
+        outcomes = self.frame_states.reusable(url, prepared, [p["id"] for p in url_patterns])
+        reused_best = self._best_of(outcomes.values())
+        if reused_best is None or reused_best["confidence"] < certain_confidence:
+            # Match the remaining patterns, most likely first, stopping at a certain match
+            self.image_processor.match_patterns_batch(
+                prepared, [p for p in url_patterns if p["id"] not in outcomes],
+                certain_confidence=certain_confidence, outcomes=outcomes
+            )
+        self.frame_states.update(url, prepared, outcomes)
+        
+        matches = [match for match in outcomes.values() if match]
+        best_match = self._best_of(matches)  # Best match (highest confidence)
+        self.match_cache.put(cache_key, digest, best_match)
+        if best_match:
             logger.info(f"Found {len(matches)} matches for URL {url}")
-            return matches[0]  # Return the best match (highest confidence)
+            self.record_match(best_match)
+        return best_match
+    
+    async def find_best_match_async(self, url: str, screenshot: np.ndarray, element_id: Optional[str] = None,
+                                    frame_id: Optional[str] = None,
+                                    accept_confidence: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Async variant of find_best_match that keeps OpenCV work off the event loop.
+        Candidates are submitted most-likely first and matched in parallel on the
+        thread pool (OpenCV releases the GIL); once a match reaches accept_confidence
+        (the processor's certain_confidence by default) the remaining work is cancelled.
+        """
+        url_patterns = [p for p in self._select_candidates(url, element_id) if "image_path" in p]
+        url_patterns = self.image_processor.order_candidates(url_patterns)
+        
+        if not url_patterns:
+            logger.info(f"No patterns found for URL {url}")
+            return None
+        
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        if accept_confidence is None:
+            accept_confidence = self.image_processor.certain_confidence
+        
+        prepared, digest = await loop.run_in_executor(executor, self._prepare_frame, screenshot, frame_id)
+        
+        # Reuse the previous match if the frame is identical and the match still scores there
+        cache_key = self.match_cache.make_key(url, url_patterns, element_id)
+        cached_match = await loop.run_in_executor(executor, self._verified_cached, cache_key, digest, prepared,
+                                                  url_patterns)
+        if cached_match:
+            logger.info(f"Frame unchanged for URL {url}, reusing previous match result")
+            self.record_match(cached_match)
+            return cached_match
+        
+        # Reuse results whose screen area did not change since the previous frame of this page
+        outcomes = self.frame_states.reusable(url, prepared, [p["id"] for p in url_patterns])
+        best_match = self._best_of(outcomes.values())
+        match_count = sum(1 for match in outcomes.values() if match)
+        pending = [p for p in url_patterns if p["id"] not in outcomes]
+        if best_match is not None and best_match["confidence"] >= accept_confidence:
+            pending = []
+        
+        cancelled = threading.Event()
+        
+        def match_one(pattern):
+            # Work queued before cancellation may still start; skip it cheaply
+            if cancelled.is_set():
+                return pattern["id"], None, False
+            return pattern["id"], self.image_processor.match_pattern_record(prepared, pattern), True
+        
+        tasks = [loop.run_in_executor(executor, match_one, pattern) for pattern in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                pattern_id, match, tried = await next_done
+                if tried:
+                    outcomes[pattern_id] = match
+                if not match:
+                    continue
+                match_count += 1
+                if best_match is None or match["confidence"] > best_match["confidence"]:
+                    best_match = match
+                if best_match["confidence"] >= accept_confidence:
+                    logger.info(f"Accepting match {best_match['id']} with confidence {best_match['confidence']:.2f} early")
+                    break
+        finally:
+            cancelled.set()
+            for task in tasks:
+                task.cancel()
+        
+        self.frame_states.update(url, prepared, outcomes)
+        self.match_cache.put(cache_key, digest, best_match)
+        if best_match:
+            logger.info(f"Found {match_count} matches for URL {url}")
+            self.record_match(best_match)
+        return best_match
+    
+    def find_all_matches(self, url: str, screenshot: np.ndarray, element_id: Optional[str] = None,
+                         frame_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find every occurrence of the best matching pattern, scanning the screenshot
+        once per candidate. Occurrences are in reading order; match["index"]
+        addresses the n-th one.
+        """
+        candidates = [p for p in self._select_candidates(url, element_id) if "image_path" in p]
+        if not candidates:
+            logger.info(f"No patterns found for URL {url}")
+            return []
+        
+        prepared, digest = self._prepare_frame(screenshot, frame_id)
+        cache_key = self.match_cache.make_key(url, candidates, element_id) + ("all",)
+        cached_matches = self._verified_cached(cache_key, digest, prepared, candidates)
+        if cached_matches:
+            logger.info(f"Frame unchanged for URL {url}, reusing previous occurrences")
+            return cached_matches
+        
+        results = [self.image_processor.match_all_pattern_record(prepared, pattern) for pattern in candidates]
+        return self._store_occurrences(cache_key, digest, results)
+    
+    async def find_all_matches_async(self, url: str, screenshot: np.ndarray, element_id: Optional[str] = None,
+                                     frame_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Async variant of find_all_matches; candidates are scanned in parallel on the thread pool"""
+        candidates = [p for p in self._select_candidates(url, element_id) if "image_path" in p]
+        if not candidates:
+            logger.info(f"No patterns found for URL {url}")
+            return []
+        
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        prepared, digest = await loop.run_in_executor(executor, self._prepare_frame, screenshot, frame_id)
+        cache_key = self.match_cache.make_key(url, candidates, element_id) + ("all",)
+        cached_matches = await loop.run_in_executor(executor, self._verified_cached, cache_key, digest, prepared,
+                                                    candidates)
+        if cached_matches:
+            logger.info(f"Frame unchanged for URL {url}, reusing previous occurrences")
+            return cached_matches
+        
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, self.image_processor.match_all_pattern_record, prepared, pattern)
+            for pattern in candidates
+        ])
+        return self._store_occurrences(cache_key, digest, results)
+    
+    def _verified_cached(self, cache_key, digest: bytes, prepared,
+                         candidates: List[Dict[str, Any]]) -> Optional[Any]:
+        """
+        The match (or occurrences) cached for an identical frame, each re-scored
+        at its region on the new frame; None when nothing is cached or a
+        stored location no longer reaches match_threshold
+        """
+        cached = self.match_cache.get(cache_key, digest)
+        if cached is None:
+            return None
+        patterns = {p["id"]: p for p in candidates}
+        threshold = self.image_processor.match_threshold
+        for match in cached if isinstance(cached, list) else [cached]:
+            pattern = patterns.get(match.get("id"))
+            score = self.image_processor.score_at(prepared, pattern, match["region"]) if pattern else -1.0
+            if score < threshold:
+                self.match_cache.confirm(cache_key, False)
+                return None
+            match["confidence"] = score
+        self.match_cache.confirm(cache_key, True)
+        return cached
+    
+    def _store_occurrences(self, cache_key, digest: bytes, results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Keep the occurrences of the pattern with the strongest match and cache them"""
+        matches = max(results, key=lambda occurrences: max((m["confidence"] for m in occurrences), default=-1.0))
+        self.match_cache.put(cache_key, digest, matches)
+        if matches:
+            self.record_match(max(matches, key=lambda m: m["confidence"]))
+        return matches
+    
+    @staticmethod
+    def select_occurrence(matches: List[Dict[str, Any]], index: int) -> Optional[Dict[str, Any]]:
+        """The index-th occurrence in reading order (negative counts from the end), or None"""
+        try:
+            return matches[int(index)]
+        except (IndexError, ValueError, TypeError):
+            return None
+    
+    @staticmethod
+    def _best_of(matches) -> Optional[Dict[str, Any]]:
+        """Highest-confidence match, ignoring misses"""
+        return max((match for match in matches if match), key=lambda match: match["confidence"], default=None)
+    
+    def _prepare_frame(self, screenshot: np.ndarray, frame_id: Optional[str] = None):
+        """Prepare a screenshot for matching and compute its digest"""
+        prepared = self.image_processor.prepare_screenshot(screenshot, frame_id)
+        return prepared, frame_digest(prepared.gray)
+    
+    def record_match(self, match: Dict[str, Any]) -> None:
+        """Update the success history of the matched pattern so it is tried first next time"""
+        pattern = self._patterns.get(match.get("id"))
+        if pattern is None:
+            return
+        stats = pattern.setdefault("match_stats", {"hits": 0})
+        stats["hits"] = stats.get("hits", 0) + 1
+        stats["last_confidence"] = match["confidence"]
+        stats["last_matched"] = time.time()
+        # Batched by the write-behind writer instead of a storage write per match
+        self.repository.mark_dirty([match["id"]])
+    
+    @staticmethod
+    def _match_center(match: Dict[str, Any]) -> Optional[List[int]]:
+        """Center of a match in screenshot pixels"""
+        if "center" in match:
+            return list(match["center"])
+        if "region" in match:
+            x, y, w, h = match["region"]
+            return [x + w // 2, y + h // 2]
         return None
     
     def click_match(self, match: Dict[str, Any]) -> bool:
-        """Click on the center of a matched element using PyAutoGUI"""
+        """Click on the center of a matched element using PyAutoGUI (needs a display)"""
         try:
-            if "center" in match:
-                x, y = match["center"]
-                pyautogui.click(x, y)
-                logger.info(f"Clicked on matched element at ({x}, {y})")
-                return True
-            elif "region" in match:
-                x, y, w, h = match["region"]
-                center_x = x + w // 2
-                center_y = y + h // 2
-                pyautogui.click(center_x, center_y)
-                logger.info(f"Clicked on matched element at ({center_x}, {center_y})")
-                return True
-            return False
+            center = self._match_center(match)
+            if center is None:
+                return False
+            # Imported on use: PyAutoGUI fails to import without a display
+            import pyautogui
+            pyautogui.click(*center)
+            logger.info(f"Clicked on matched element at ({center[0]}, {center[1]})")
+            return True
         except Exception as e:
             logger.error(f"Error clicking on match: {str(e)}")
             return False
     
+    async def click_match_async(self, match: Dict[str, Any], browser=None) -> bool:
+        """
+        Click on the center of a matched element. With a browser the click goes
+        through its page, in page coordinates, which also works headless;
+        without one it falls back to PyAutoGUI.
+        """
+        if browser is None or getattr(browser, "page", None) is None:
+            return self.click_match(match)
+        center = self._match_center(match)
+        if center is None:
+            return False
+        if await browser.click_at(*center):
+            logger.info(f"Clicked on matched element at ({center[0]}, {center[1]})")
+            return True
+        return False
+    
     async def record_pattern(self, browser, selector: str, name: Optional[str] = None) -> Dict[str, Any]:
         """Record a new pattern by taking a screenshot and saving element region"""
         try:
             # Get the current URL
-            url = await browser.page.url
+            url = browser.page.url
             
             # Find the element on the page
             element = await browser.wait_for_selector(selector)
@@ -91,12 +437,8 @@ class PatternMatcherEngine:
             if not bbox:
                 return {"status": "error", "message": f"Could not get bounding box for {selector}"}
             
-            # Take a screenshot of the page
-            screenshot_path = str(self.storage.patterns_dir / f"temp_screenshot.png")
-            await browser.take_screenshot(path=screenshot_path)
-            
-            # Load the screenshot
-            screenshot = cv2.imread(screenshot_path)
+            # Capture the page in memory
+            screenshot = await browser.capture_screenshot()
             if screenshot is None:
                 return {"status": "error", "message": "Failed to capture screenshot"}
             
@@ -114,6 +456,13 @@ class PatternMatcherEngine:
             # Save the cropped image
             cv2.imwrite(image_path, element_img)
             
+            # Drop any decoded copy of a template we just overwrote
+            self.image_processor.template_cache.invalidate(image_path)
+            
+            # Precompute the forms matching uses, so it never converts this template again
+            variants = self.image_processor.build_variants(element_img, image_path)
+            self.variant_store.save(pattern_id, variants)
+            
             # Get the element's text if possible
             element_text = ""
             try:
@@ -128,14 +477,15 @@ class PatternMatcherEngine:
                 "url": url,
                 "text": element_text,
                 "image_path": image_path,
-                "region": [bbox["x"], bbox["y"], bbox["width"], bbox["height"]]
+                "region": [bbox["x"], bbox["y"], bbox["width"], bbox["height"]],
+                "variants": variants.meta
             }
             
             # Add to patterns dictionary
-            self.patterns[pattern_id] = new_pattern
+            self.add_pattern(pattern_id, new_pattern)
             
-            # Save patterns to disk
-            self.save_patterns()
+            # Save the new pattern to disk
+            self.save_patterns([pattern_id])
             
             return {
                 "status": "success",
@@ -0,0 +1,255 @@
+"""
+Process-wide in-memory pattern repository shared by the pattern matcher,
+element memory and manual annotations
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import MutableMapping
+from typing import Dict, List, Any, Optional, Callable, Iterable
+
+from pattern_storage import PatternStorage, create_pattern_storage
+from pattern_write_behind import WriteBehindWriter
+from pattern_blob_store import BlobStore
+
+logger = logging.getLogger("EirosShell")
+
+TEMPLATE = "template"  # Visual templates matched by the pattern matcher
+ELEMENT = "element"  # DOM elements learned by pattern memory
+ANNOTATION = "annotation"  # Elements marked in the manual annotator
+KINDS = (TEMPLATE, ELEMENT, ANNOTATION)
+
+def classify_pattern(pattern: Dict[str, Any]) -> str:
+    """Kind of a stored record; records saved before kinds existed are recognized by their fields"""
+    kind = pattern.get("kind")
+    if kind in KINDS:
+        return kind
+    if pattern.get("manual"):
+        return ANNOTATION
+    if "image_path" in pattern:
+        return TEMPLATE
+    return ELEMENT
+
+class PatternView(MutableMapping):
+    """
+    Dict-like view of the repository records of one kind. Writing through
+    the view stores the record in the repository and notifies subscribers.
+    The first access loads the repository.
+    """
+
+    def __init__(self, repository: "PatternRepository", kind: str):
+        self.repository = repository
+        self.kind = kind
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        self.repository.ensure_loaded()
+        if key not in self.repository._keys[self.kind]:
+            raise KeyError(key)
+        return self.repository._records[key]
+
+    def __setitem__(self, key: str, pattern: Dict[str, Any]) -> None:
+        self.repository.put(key, pattern, self.kind)
+
+    def __delitem__(self, key: str) -> None:
+        self.repository.ensure_loaded()
+        if key not in self.repository._keys[self.kind]:
+            raise KeyError(key)
+        self.repository.delete(key)
+
+    def __iter__(self):
+        self.repository.ensure_loaded()
+        return iter(list(self.repository._keys[self.kind]))
+
+    def __len__(self) -> int:
+        self.repository.ensure_loaded()
+        return len(self.repository._keys[self.kind])
+
+    def __contains__(self, key) -> bool:
+        self.repository.ensure_loaded()
+        return key in self.repository._keys[self.kind]
+
+    def __repr__(self) -> str:
+        return f"PatternView({self.kind})"
+
+class PatternRepository:
+    """
+    Loads all patterns from one storage backend once and serves them through
+    typed views (templates, elements, annotations). Components write through
+    the repository, so they never reload the store or overwrite each other.
+    Nothing is opened or parsed until first use or an explicit warm_up().
+    """
+
+    def __init__(self, storage: Optional[PatternStorage] = None):
+        self._storage = storage
+        self._blob_store = None
+        self._writer = None
+        self._records = {}  # pattern key -> record
+        self._keys = {kind: {} for kind in KINDS}  # kind -> {pattern key: None}
+        self._subscribers = []
+        self._lock = threading.RLock()  # The annotator saves from its own thread
+        self._load_lock = threading.Lock()  # Serializes the first load between warm-up and first use
+        self._loader = None  # Thread running load(), which may use the records before loaded is set
+        self.loaded = False
+        self.templates = PatternView(self, TEMPLATE)
+        self.elements = PatternView(self, ELEMENT)
+        self.annotations = PatternView(self, ANNOTATION)
+
+    @property
+    def storage(self) -> PatternStorage:
+        """Storage backend, opened on first use"""
+        if self._storage is None:
+            with self._lock:
+                if self._storage is None:
+                    self._storage = create_pattern_storage()
+        return self._storage
+
+    @property
+    def blob_store(self) -> BlobStore:
+        """Screenshot blob store next to the pattern storage"""
+        if self._blob_store is None:
+            with self._lock:
+                if self._blob_store is None:
+                    self._blob_store = BlobStore(self.storage.patterns_dir / "blobs")
+        return self._blob_store
+
+    @property
+    def writer(self) -> WriteBehindWriter:
+        """Batches access statistics instead of writing them on every command"""
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    # Timer and exit flushes take the lock the annotator's saves hold
+                    self._writer = WriteBehindWriter(self.storage, lambda: self._records, lock=self._lock)
+        return self._writer
+
+    def subscribe(self, callback: Callable[[str, Optional[str], Optional[str]], None]) -> Callable[[], None]:
+        """
+        Register callback(event, kind, key) for "set", "delete" and "load" events
+        (kind and key are None for "load"). Returns a function that unsubscribes.
+        """
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback) if callback in self._subscribers else None
+
+    def _notify(self, event: str, kind: Optional[str] = None, key: Optional[str] = None) -> None:
+        for callback in list(self._subscribers):
+            try:
+                callback(event, kind, key)
+            except Exception as e:
+                logger.error(f"Error in pattern repository subscriber: {str(e)}")
+
+    def load(self) -> None:
+        """
+        (Re)load all patterns from storage, writing pending changes first.
+        loaded is only set once the records are prepared and subscribers
+        (e.g. the matcher's indexes) have seen them, since ensure_loaded
+        callers skip the lock when it is set. Meanwhile only the loading
+        thread uses the records.
+        """
+        self._loader = threading.current_thread()
+        try:
+            if self._writer is not None:
+                self._writer.flush()
+            records = self.storage.load_patterns()
+            # Records from older versions carry screenshots inline; keep only a reference
+            changed = self.blob_store.externalize(records)
+            with self._lock:
+                self._records = records
+                for keys in self._keys.values():
+                    keys.clear()
+                for key, pattern in records.items():
+                    self._keys[classify_pattern(pattern)][key] = None
+
+            if changed:
+                self.save(changed)
+            logger.info(f"Pattern repository loaded: {self.counts()}")
+            self._notify("load")
+            self.loaded = True
+        finally:
+            self._loader = None
+
+    def ensure_loaded(self) -> None:
+        """Load patterns unless they are already in memory"""
+        if self.loaded or self._loader is threading.current_thread():
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load()
+
+    async def warm_up(self) -> None:
+        """
+        Load patterns on a worker thread, so the store can be parsed while
+        the browser starts instead of on the first command that needs it
+        """
+        if not self.loaded:
+            await asyncio.get_running_loop().run_in_executor(None, self.ensure_loaded)
+
+    def view(self, kind: str) -> PatternView:
+        """Typed view for a kind name"""
+        return {TEMPLATE: self.templates, ELEMENT: self.elements, ANNOTATION: self.annotations}[kind]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of records of each kind"""
+        self.ensure_loaded()
+        return {kind: len(keys) for kind, keys in self._keys.items()}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a record of any kind"""
+        self.ensure_loaded()
+        return self._records.get(key)
+
+    def put(self, key: str, pattern: Dict[str, Any], kind: Optional[str] = None) -> None:
+        """Add or replace a record; it is written by the next save()"""
+        self.ensure_loaded()
+        kind = kind or classify_pattern(pattern)
+        pattern["kind"] = kind
+        with self._lock:
+            previous = self._records.get(key)
+            if previous is not None:
+                self._keys[classify_pattern(previous)].pop(key, None)
+            self._records[key] = pattern
+            self._keys[kind][key] = None
+        self._notify("set", kind, key)
+
+    def delete(self, key: str) -> None:
+        """Remove a record from memory and storage"""
+        self.ensure_loaded()
+        with self._lock:
+            pattern = self._records.pop(key, None)
+            if pattern is None:
+                return
+            kind = classify_pattern(pattern)
+            self._keys[kind].pop(key, None)
+            self.writer.mark_removed([key])
+        self._notify("delete", kind, key)
+
+    def save(self, keys: Optional[Iterable[str]] = None) -> bool:
+        """Write the given records now (all records when keys is None)"""
+        with self._lock:
+            self.writer.flush()
+            if keys is None:
+                return self.storage.save_patterns(self._records)
+            return self.storage.save_changes(self._records, list(keys))
+
+    def mark_dirty(self, keys: Iterable[str]) -> None:
+        """Record in-place updates (e.g. access statistics) to be written in the next batch"""
+        with self._lock:
+            self.writer.mark_dirty(keys)
+
+    def flush(self) -> bool:
+        """Write pending batched changes now, e.g. at shutdown"""
+        if self._writer is None:
+            return True
+        with self._lock:
+            return self._writer.flush()
+
+    def clear(self, kind: str) -> None:
+        """Remove every record of one kind"""
+        self.ensure_loaded()
+        with self._lock:
+            for key in list(self._keys[kind]):
+                self.delete(key)
+            self.writer.flush()
+
+# Global pattern repository instance
+pattern_repository = PatternRepository()
@@ -0,0 +1,202 @@
+"""
+Retention policy for learned patterns: TTL, entry and size limits with
+background eviction and store compaction
+"""
+
+import json
+import math
+import time
+import asyncio
+import logging
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from pattern_repository import PatternRepository, pattern_repository, ELEMENT, KINDS
+
+logger = logging.getLogger("EirosShell")
+
+class RetentionPolicy:
+    """
+    Limits for stored patterns. Patterns seen often age more slowly: the age
+    used for the TTL and for eviction order is divided by
+    1 + frequency_weight * ln(times_seen), so a pattern seen once ages in real time.
+    """
+
+    def __init__(self, max_entries: Optional[int] = 5000, max_bytes: Optional[int] = 256 * 1024 * 1024,
+                 ttl: Optional[float] = 90 * 24 * 3600, frequency_weight: float = 1.0,
+                 kinds: Tuple[str, ...] = (ELEMENT,)):
+        self.max_entries = max_entries  # Most patterns kept per run (None for no limit)
+        self.max_bytes = max_bytes  # Record and screenshot bytes kept (None for no limit)
+        self.ttl = ttl  # Seconds since last_seen after which a pattern is dropped (None for no TTL)
+        self.frequency_weight = frequency_weight
+        self.kinds = kinds  # Pattern kinds subject to eviction; manual annotations and templates are kept
+
+    def effective_age(self, pattern: Dict[str, Any], now: float) -> float:
+        """Age of a pattern in seconds, shortened for frequently seen patterns"""
+        last_seen = pattern.get("last_seen") or pattern.get("learned_at") or 0.0
+        times_seen = max(1, pattern.get("times_seen", 1))
+        return max(0.0, now - last_seen) / (1.0 + self.frequency_weight * math.log(times_seen))
+
+class RetentionManager:
+    """
+    Applies a retention policy to the pattern repository, deleting evicted
+    patterns, unreferenced screenshot blobs and compacting the store
+    """
+
+    def __init__(self, repository: Optional[PatternRepository] = None, policy: Optional[RetentionPolicy] = None,
+                 interval: float = 3600.0):
+        self.repository = repository or pattern_repository
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval  # Seconds between background runs
+        self.blob_min_age = 3600.0  # Unreferenced blobs younger than this are kept
+        self.compact_free_ratio = 0.2  # Share of free database pages that makes compaction worthwhile
+        self.last_report = None
+        self._task = None
+
+    def select_victims(self, now: Optional[float] = None) -> Dict[str, str]:
+        """Return the keys to evict, each with the reason ("ttl", "max_entries" or "max_bytes")"""
+        now = time.time() if now is None else now
+        policy = self.policy
+        blob_store = self.repository.blob_store
+
+        candidates = []
+        for kind in policy.kinds:
+            for key, pattern in self.repository.view(kind).items():
+                candidates.append((policy.effective_age(pattern, now), key, pattern))
+        # Most evictable first
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        victims = {}
+        kept = []
+        for age, key, pattern in candidates:
+            if policy.ttl is not None and age > policy.ttl:
+                victims[key] = "ttl"
+            else:
+                kept.append((key, pattern))
+
+        if policy.max_entries is not None and len(kept) > policy.max_entries:
+            excess = len(kept) - policy.max_entries
+            for key, _ in kept[:excess]:
+                victims[key] = "max_entries"
+            kept = kept[excess:]
+
+        if policy.max_bytes is not None:
+            # Screenshots shared by several patterns count once and are freed with the last of them
+            blob_refs, blob_sizes, record_sizes = {}, {}, {}
+            for key, pattern in kept:
+                record_sizes[key] = len(json.dumps(pattern))
+                digest = pattern.get("screenshot_blob")
+                if digest:
+                    blob_refs[digest] = blob_refs.get(digest, 0) + 1
+                    if digest not in blob_sizes:
+                        blob_sizes[digest] = blob_store.size(digest)
+            total = sum(record_sizes.values()) + sum(blob_sizes.values())
+
+            for key, pattern in kept:
+                if total <= policy.max_bytes:
+                    break
+                victims[key] = "max_bytes"
+                total -= record_sizes[key]
+                digest = pattern.get("screenshot_blob")
+                if digest:
+                    blob_refs[digest] -= 1
+                    if blob_refs[digest] == 0:
+                        total -= blob_sizes[digest]
+
+        return victims
+
+    def _evict(self, victims: Dict[str, str]) -> int:
+        """Delete evicted patterns from the repository; returns the record bytes removed"""
+        freed = 0
+        for key in victims:
+            pattern = self.repository.get(key)
+            if pattern is not None:
+                freed += len(json.dumps(pattern))
+                self.repository.delete(key)
+        return freed
+
+    def _referenced_blobs(self) -> Set[str]:
+        """Screenshot blobs still used by a pattern; read on the thread that owns the repository"""
+        referenced = set()
+        for kind in KINDS:
+            for pattern in list(self.repository.view(kind).values()):
+                if pattern.get("screenshot_blob"):
+                    referenced.add(pattern["screenshot_blob"])
+        return referenced
+
+    def _reclaim(self, referenced: Set[str]) -> Tuple[int, int]:
+        """
+        Delete unreferenced blobs and compact the store if enough of it is free.
+        Touches only files, so it may run on a worker thread once the
+        deletions have been flushed.
+        """
+        _, blob_bytes = self.repository.blob_store.collect_garbage(referenced, self.blob_min_age)
+        return blob_bytes, self.repository.storage.compact(self.compact_free_ratio)
+
+    def _report(self, victims: Dict[str, str], record_bytes: int, blob_bytes: int,
+                store_bytes: int, started: float) -> Dict[str, Any]:
+        reasons = {}
+        for reason in victims.values():
+            reasons[reason] = reasons.get(reason, 0) + 1
+        report = {
+            "evicted": len(victims),
+            "reasons": reasons,
+            "record_bytes": record_bytes,
+            "blob_bytes": blob_bytes,
+            "store_bytes": store_bytes,
+            "reclaimed_bytes": record_bytes + blob_bytes + store_bytes,
+            "remaining": self.repository.counts(),
+            "duration": time.time() - started
+        }
+        self.last_report = report
+        if victims or blob_bytes or store_bytes:
+            logger.info(f"Pattern retention evicted {len(victims)} patterns {reasons}, "
+                        f"reclaimed {report['reclaimed_bytes']} bytes "
+                        f"(records {record_bytes}, blobs {blob_bytes}, store {store_bytes})")
+        return report
+
+    def run_once(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Apply the policy synchronously and return a report"""
+        started = time.time()
+        victims = self.select_victims(now)
+        record_bytes = self._evict(victims)
+        self.repository.flush()
+        blob_bytes, store_bytes = self._reclaim(self._referenced_blobs())
+        return self._report(victims, record_bytes, blob_bytes, store_bytes, started)
+
+    async def run_once_async(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Apply the policy: patterns are evicted, the deletions flushed and the
+        referenced blobs collected on the event loop thread, which owns the
+        repository records, while blob deletion and compaction run on a
+        worker thread
+        """
+        started = time.time()
+        victims = self.select_victims(now)
+        record_bytes = self._evict(victims)
+        # Serializing records off the loop would race with the loop updating them
+        self.repository.flush()
+        referenced = self._referenced_blobs()
+        blob_bytes, store_bytes = await asyncio.get_running_loop().run_in_executor(None, self._reclaim, referenced)
+        return self._report(victims, record_bytes, blob_bytes, store_bytes, started)
+
+    def start(self) -> None:
+        """Run the policy in the background every interval seconds"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def _run_periodically(self) -> None:
+        while True:
+            try:
+                await self.run_once_async()
+            except Exception as e:
+                logger.error(f"Error applying pattern retention: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def stop(self) -> None:
+        """Stop background runs"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+# Global retention manager instance
+retention_manager = RetentionManager()
@@ -0,0 +1,230 @@
+"""
+SQLite pattern storage backend: one row per pattern, so touching a single
+element rewrites only that row instead of the whole JSON file
+
+Usage:
+    python pattern_sqlite_storage.py migrate [--json pattern_memory.json] [--table patterns]
+    python pattern_sqlite_storage.py export out.json [--table patterns]
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterable
+
+from pattern_storage import PatternStorage, write_json_atomic
+from pattern_repository import KINDS, ELEMENT, classify_pattern
+
+logger = logging.getLogger("EirosShell")
+
+# Kind of record kept in a table; other tables (the shared repository's
+# "patterns") hold every kind
+TABLE_KINDS = {"element_memory": ELEMENT}
+
+class SQLitePatternStorage(PatternStorage):
+    """
+    Stores patterns as rows (key, context, url, last_seen, data) in a SQLite
+    database next to the JSON file it replaces. The JSON file is imported once
+    on first use and left in place as a backup. A table restricted to one
+    kind imports only the records of that kind.
+    """
+
+    def __init__(self, patterns_dir: Optional[Path] = None, table: str = "patterns",
+                 kind: Optional[str] = None):
+        super().__init__(patterns_dir)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.table = table
+        self.kind = kind or TABLE_KINDS.get(table)
+        if self.kind is not None and self.kind not in KINDS:
+            raise ValueError(f"Invalid pattern kind: {self.kind}")
+        self.db_file = self.patterns_dir / "patterns.db"
+        self._written = {}  # pattern key -> serialized data last written
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self.migrate_from_json()
+        with self._lock:
+            self._written = dict(self._conn.execute(f"SELECT key, data FROM {self.table}").fetchall())
+
+    def _create_schema(self) -> None:
+        with self._conn:
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    context TEXT,
+                    url TEXT,
+                    last_seen REAL,
+                    data TEXT NOT NULL
+                )""")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_context ON {self.table} (context)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_url ON {self.table} (url)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_seen ON {self.table} (last_seen)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS storage_meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    @staticmethod
+    def _row(key: str, pattern: Dict[str, Any], data: str) -> tuple:
+        """Column values for a pattern"""
+        last_seen = pattern.get("last_seen")
+        if last_seen is None:
+            last_seen = (pattern.get("match_stats") or {}).get("last_matched")
+        return (key, pattern.get("context"), pattern.get("url"), last_seen, data)
+
+    def _upsert(self, rows: Iterable[tuple]) -> None:
+        self._conn.executemany(
+            f"INSERT INTO {self.table} (key, context, url, last_seen, data) VALUES (?, ?, ?, ?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET context=excluded.context, url=excluded.url, "
+            f"last_seen=excluded.last_seen, data=excluded.data",
+            rows
+        )
+
+    def migrate_from_json(self, json_path: Optional[str] = None, force: bool = False) -> int:
+        """
+        Import patterns of the table's kind from the JSON file into the table.
+        Runs once per table unless forced; returns the number of imported
+        patterns.
+        """
+        marker = f"migrated:{self.table}"
+        try:
+            with self._lock:
+                done = self._conn.execute("SELECT value FROM storage_meta WHERE name = ?", (marker,)).fetchone()
+            if done and not force:
+                return 0
+
+            source = Path(json_path) if json_path else self.patterns_file
+            patterns = super().load_patterns(str(source)) if source.exists() else {}
+            if self.kind is not None:
+                patterns = {key: pattern for key, pattern in patterns.items()
+                            if classify_pattern(pattern) == self.kind}
+            with self._lock, self._conn:
+                self._upsert(self._row(key, pattern, json.dumps(pattern)) for key, pattern in patterns.items())
+                self._conn.execute("INSERT OR REPLACE INTO storage_meta (name, value) VALUES (?, ?)",
+                                   (marker, json.dumps({"source": str(source), "count": len(patterns), "at": time.time()})))
+            if patterns:
+                logger.info(f"Migrated {len(patterns)} patterns from {source} into {self.db_file} ({self.table})")
+            return len(patterns)
+        except Exception as e:
+            logger.error(f"Error migrating patterns to SQLite: {str(e)}")
+            return 0
+
+    def load_patterns(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """Load patterns from the database, or from a JSON file when a path is given"""
+        if path:
+            return super().load_patterns(path)
+        try:
+            with self._lock:
+                rows = self._conn.execute(f"SELECT key, data FROM {self.table}").fetchall()
+                self._written = {key: data for key, data in rows}
+            patterns = {key: json.loads(data) for key, data in rows}
+            logger.info(f"Loaded {len(patterns)} patterns from {self.db_file} ({self.table})")
+            return patterns
+        except Exception as e:
+            logger.error(f"Error loading patterns: {str(e)}")
+            return {}
+
+    def save_patterns(self, patterns: Dict[str, Any]) -> bool:
+        """Synchronize the table with patterns, writing only rows whose content changed"""
+        removed = [key for key in self._written if key not in patterns]
+        return self.save_changes(patterns, patterns.keys(), removed, only_if_changed=True)
+
+    def save_changes(self, patterns: Dict[str, Any], changed_keys: Iterable[str],
+                     removed_keys: Iterable[str] = (), only_if_changed: bool = False) -> bool:
+        """Write the given patterns and delete removed ones in a single transaction"""
+        try:
+            rows = []
+            for key in changed_keys:
+                if key not in patterns:
+                    continue
+                data = json.dumps(patterns[key])
+                if only_if_changed and self._written.get(key) == data:
+                    continue
+                rows.append(self._row(key, patterns[key], data))
+            removed = [key for key in removed_keys if key not in patterns]
+            if not rows and not removed:
+                return True
+
+            with self._lock, self._conn:
+                self._upsert(rows)
+                self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", ((key,) for key in removed))
+                for row in rows:
+                    self._written[row[0]] = row[4]
+                for key in removed:
+                    self._written.pop(key, None)
+            logger.debug(f"Wrote {len(rows)} and deleted {len(removed)} patterns in {self.db_file} ({self.table})")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving patterns: {str(e)}")
+            return False
+
+    def export_json(self, path: Optional[str] = None) -> Optional[str]:
+        """Write all patterns of the table to a JSON file in the original format"""
+        try:
+            export_path = Path(path) if path else self.patterns_dir / f"{self.table}_export.json"
+            with self._lock:
+                rows = self._conn.execute(f"SELECT key, data FROM {self.table} ORDER BY key").fetchall()
+            write_json_atomic(export_path, {key: json.loads(data) for key, data in rows})
+            logger.info(f"Exported {len(rows)} patterns to {export_path}")
+            return str(export_path)
+        except Exception as e:
+            logger.error(f"Error exporting patterns: {str(e)}")
+            return None
+
+    def _file_size(self) -> int:
+        return sum(path.stat().st_size for path in (self.db_file, Path(f"{self.db_file}-wal")) if path.exists())
+
+    def compact(self, min_free_ratio: float = 0.2) -> int:
+        """
+        Rebuild the database file once at least min_free_ratio of its pages
+        are free (left by deletions); returns the bytes freed. VACUUM holds
+        the lock for a full rewrite, so it is skipped while little would be gained.
+        """
+        try:
+            with self._lock:
+                free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+                pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+                if not pages or free_pages / pages < min_free_ratio:
+                    logger.debug(f"Skipping compaction of {self.db_file}: {free_pages}/{pages} pages free")
+                    return 0
+                before = self._file_size()
+                self._conn.execute("VACUUM")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                freed = max(0, before - self._file_size())
+            logger.info(f"Compacted {self.db_file}, freed {freed} bytes")
+            return freed
+        except Exception as e:
+            logger.error(f"Error compacting pattern database: {str(e)}")
+            return 0
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate pattern storage to SQLite or export it back to JSON")
+    parser.add_argument("--dir", help="Pattern directory (default ~/EirosShell/patterns)")
+    parser.add_argument("--table", default="patterns", help="Pattern table")
+    parser.add_argument("--kind", choices=KINDS, help="Only import records of this kind")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Import a JSON pattern file")
+    migrate_parser.add_argument("--json", help="JSON file to import (default pattern_memory.json)")
+    export_parser = subparsers.add_parser("export", help="Export patterns to a JSON file")
+    export_parser.add_argument("path", nargs="?", help="Output file")
+    args = parser.parse_args()
+
+    storage = SQLitePatternStorage(args.dir, args.table, args.kind)
+    if args.command == "migrate":
+        count = storage.migrate_from_json(args.json, force=True)
+        print(f"Imported {count} patterns into {storage.db_file} ({storage.table})")
+    else:
+        print(f"Exported to {storage.export_json(args.path)}")
+    storage.close()
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,34 @@ import os
 import json
 import logging
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterable
 
 logger = logging.getLogger("EirosShell")
 
+def write_json_atomic(path: Path, data: Any) -> None:
+    """
+    Write JSON to a temporary file in the same directory and rename it over
+    the target, so a crash never leaves a truncated file behind
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
 class PatternStorage:
     """
     Handles loading and saving patterns to/from disk
     """
     
-    def __init__(self):
-        self.patterns_dir = Path(os.path.expanduser("~")) / "EirosShell" / "patterns"
+    def __init__(self, patterns_dir: Optional[Path] = None):
+        self.patterns_dir = Path(patterns_dir) if patterns_dir else Path(os.path.expanduser("~")) / "EirosShell" / "patterns"
         self.patterns_dir.mkdir(parents=True, exist_ok=True)
         self.patterns_file = self.patterns_dir / "pattern_memory.json"
         
@@ -44,14 +61,52 @@ class PatternStorage:
     def save_patterns(self, patterns: Dict[str, Any]) -> bool:
         """Save patterns to disk"""
         try:
-            with open(self.patterns_file, 'w') as f:
-                json.dump(patterns, f, indent=2)
+            write_json_atomic(self.patterns_file, patterns)
             logger.info(f"Saved {len(patterns)} patterns to {self.patterns_file}")
             return True
         except Exception as e:
             logger.error(f"Error saving patterns: {str(e)}")
             return False
     
+    def save_changes(self, patterns: Dict[str, Any], changed_keys: Iterable[str],
+                     removed_keys: Iterable[str] = ()) -> bool:
+        """Persist changes to some patterns; the JSON file can only be rewritten as a whole"""
+        return self.save_patterns(patterns)
+    
+    def export_json(self, path: Optional[str] = None) -> Optional[str]:
+        """Write all stored patterns to a JSON file"""
+        try:
+            export_path = Path(path) if path else self.patterns_dir / "pattern_memory_export.json"
+            write_json_atomic(export_path, self.load_patterns())
+            return str(export_path)
+        except Exception as e:
+            logger.error(f"Error exporting patterns: {str(e)}")
+            return None
+    
+    def compact(self, min_free_ratio: float = 0.2) -> int:
+        """Reclaim unused space once enough of the store is free; returns the bytes freed (the JSON file has none)"""
+        return 0
+    
     def get_pattern_path(self, pattern_id: str) -> str:
         """Get the file path for a pattern image"""
         return str(self.patterns_dir / f"{pattern_id}.png")
+
+def create_pattern_storage(patterns_dir: Optional[Path] = None, backend: Optional[str] = None,
+                           table: str = "patterns") -> PatternStorage:
+    """
+    Create the configured storage backend: "sqlite" (default, one row per pattern)
+    or "json" (the whole pattern_memory.json rewritten on every save).
+    The backend can be chosen with the PATTERN_BACKEND environment variable.
+    """
+    backend = (backend or os.environ.get("PATTERN_BACKEND", "sqlite")).lower()
+    if backend == "json":
+        return PatternStorage(patterns_dir)
+    if backend != "sqlite":
+        logger.warning(f"Unknown pattern storage backend '{backend}', using sqlite")
+    
+    from pattern_sqlite_storage import SQLitePatternStorage
+    try:
+        return SQLitePatternStorage(patterns_dir, table)
+    except Exception as e:
+        logger.error(f"Error opening SQLite pattern storage, falling back to JSON: {str(e)}")
+        return PatternStorage(patterns_dir)
@@ -0,0 +1,114 @@
+"""
+Template cache module for pattern matching
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("EirosShell")
+
+class TemplateCache:
+    """
+    Bounded LRU cache of decoded grayscale templates.
+    Entries are keyed by path and validated against the file's mtime and size,
+    so a template rewritten on disk is decoded again on next access.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> ((mtime_ns, size), grayscale template)
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize_path(template_path) -> str:
+        return os.path.abspath(str(template_path))
+
+    @staticmethod
+    def _file_key(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, template_path) -> Optional[np.ndarray]:
+        """Return the grayscale template for a path, decoding it on a miss"""
+        path = self._normalize_path(template_path)
+        file_key = self._file_key(path)
+        if file_key is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == file_key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                # Stale entry: the file changed since it was decoded
+                self._remove(path)
+
+        template = cv2.imread(path)
+        if template is None:
+            return None
+        gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        # Cached arrays are shared between callers, so protect them from in-place edits
+        gray_template.setflags(write=False)
+
+        with self._lock:
+            self._store(path, file_key, gray_template)
+        return gray_template
+
+    def invalidate(self, template_path) -> None:
+        """Drop the cached entry for a path"""
+        path = self._normalize_path(template_path)
+        with self._lock:
+            self._remove(path)
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _store(self, path: str, file_key: Tuple[int, int], image: np.ndarray) -> None:
+        if image.nbytes > self.max_bytes:
+            logger.debug(f"Template {path} is larger than the cache limit, not caching")
+            return
+        self._remove(path)
+        self._entries[path] = (file_key, image)
+        self._current_bytes += image.nbytes
+        while self._current_bytes > self.max_bytes and self._entries:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._current_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _remove(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._current_bytes -= entry[1].nbytes
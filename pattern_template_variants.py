@@ -0,0 +1,240 @@
+"""
+Precomputed template variants: the grayscale template, its downscaled and
+pyramid forms, its signature and an optional edge map, stored once per
+pattern so matching only reads ready-to-use arrays
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Iterable
+from urllib.parse import quote
+
+import numpy as np
+
+logger = logging.getLogger("EirosShell")
+
+VARIANTS_VERSION = 1
+
+def variant_name(scale: float, level: int = 0) -> str:
+    """Array name of a template downscaled by scale and then reduced level times"""
+    return f"s{scale:g}_l{level}"
+
+class TemplateVariants:
+    """
+    Ready-to-match forms of one template. meta describes how they were made
+    and is stored in the pattern record under "variants".
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.arrays = arrays
+        self.meta = meta
+        self.nbytes = sum(array.nbytes for array in arrays.values())
+        for array in arrays.values():
+            # Variants are shared between matching threads
+            array.setflags(write=False)
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.arrays["gray"]
+
+    @property
+    def edges(self) -> Optional[np.ndarray]:
+        return self.arrays.get("edges")
+
+    def get(self, scale: float, level: int = 0) -> Optional[np.ndarray]:
+        """Template for a match scale and pyramid level, or None if it was not precomputed"""
+        if scale == 1.0 and level == 0:
+            return self.gray
+        return self.arrays.get(variant_name(scale, level))
+
+class TemplateVariantStore:
+    """
+    Keeps the variants of each pattern in an uncompressed .npz file and the
+    recently used ones in a bounded in-memory LRU
+    """
+
+    def __init__(self, variants_dir: Path, max_bytes: int = 64 * 1024 * 1024):
+        self.variants_dir = Path(variants_dir)
+        self.variants_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # pattern key -> TemplateVariants
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.writes = 0
+
+    def path(self, key: str) -> Path:
+        return self.variants_dir / f"{quote(key, safe='')}.npz"
+
+    def save(self, key: str, variants: TemplateVariants) -> None:
+        """Write the variants of a pattern and keep them in memory"""
+        path = self.path(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **variants.arrays)
+        os.replace(tmp_path, path)
+        self.writes += 1
+        with self._lock:
+            self._store(key, variants)
+
+    def get(self, key: str, meta: Dict[str, Any]) -> Optional[TemplateVariants]:
+        """Variants of a pattern matching the record's meta, loaded from disk on a miss"""
+        with self._lock:
+            variants = self._entries.get(key)
+            if variants is not None and variants.meta.get("token") == meta.get("token"):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return variants
+
+        try:
+            with np.load(self.path(key)) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error loading template variants of {key}: {str(e)}")
+            return None
+
+        variants = TemplateVariants(arrays, meta)
+        with self._lock:
+            self.loads += 1
+            self._store(key, variants)
+        return variants
+
+    def remove(self, key: str) -> None:
+        """Delete the variants of a pattern"""
+        with self._lock:
+            self._remove(key)
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error deleting template variants of {key}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "writes": self.writes
+            }
+
+    def _store(self, key: str, variants: TemplateVariants) -> None:
+        self._remove(key)
+        if variants.nbytes > self.max_bytes:
+            return
+        self._entries[key] = variants
+        self._current_bytes += variants.nbytes
+        while self._current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._current_bytes -= evicted.nbytes
+
+    def _remove(self, key: str) -> None:
+        variants = self._entries.pop(key, None)
+        if variants is not None:
+            self._current_bytes -= variants.nbytes
+
+class VariantBackfill:
+    """
+    Generates variants for stored templates that have none or whose variants
+    no longer match the matcher settings, e.g. patterns recorded by older
+    versions or imported from a bundle
+    """
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.last_report = None
+        self._task = None
+
+    def pending(self, keys: Optional[Iterable[str]] = None) -> List[str]:
+        """Keys of templates whose variants are missing or outdated"""
+        templates = self.matcher.patterns
+        keys = list(templates) if keys is None else [key for key in keys if key in templates]
+        processor = self.matcher.image_processor
+        return [key for key in keys if not processor.variants_current(templates[key])]
+
+    def _build(self, key: str, pattern: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Compute and write the variants of one template; returns their meta"""
+        processor = self.matcher.image_processor
+        template = processor.load_template(pattern["image_path"])
+        if template is None:
+            logger.warning(f"Cannot build variants of {key}: template not found at {pattern['image_path']}")
+            return None
+        variants = processor.build_variants(template, pattern["image_path"])
+        self.matcher.variant_store.save(key, variants)
+        return variants.meta
+
+    def _apply(self, key: str, meta: Dict[str, Any]) -> None:
+        pattern = self.matcher.patterns.get(key)
+        if pattern is None:
+            return
+        pattern["variants"] = meta
+        self.matcher.repository.mark_dirty([key])
+
+    def _report(self, built: int, failed: int, started: float) -> Dict[str, Any]:
+        report = {"built": built, "failed": failed, "duration": time.time() - started}
+        self.last_report = report
+        if built or failed:
+            logger.info(f"Template variants backfilled for {built} patterns ({failed} failed) "
+                        f"in {report['duration']:.2f}s")
+        return report
+
+    def run_once(self, keys: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Backfill synchronously and return a report"""
+        started = time.time()
+        built, failed = 0, 0
+        for key in self.pending(keys):
+            meta = self._build(key, self.matcher.patterns[key])
+            if meta is None:
+                failed += 1
+                continue
+            self._apply(key, meta)
+            built += 1
+        return self._report(built, failed, started)
+
+    async def run_once_async(self, keys: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Backfill with the image work on a worker thread; records are updated
+        on the event loop thread, which owns the repository
+        """
+        started = time.time()
+        loop = asyncio.get_running_loop()
+        built, failed = 0, 0
+        for key in self.pending(keys):
+            pattern = self.matcher.patterns.get(key)
+            if pattern is None:
+                continue
+            meta = await loop.run_in_executor(None, self._build, key, pattern)
+            if meta is None:
+                failed += 1
+                continue
+            self._apply(key, meta)
+            built += 1
+        return self._report(built, failed, started)
+
+    def start(self) -> None:
+        """Backfill in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            await self.run_once_async()
+        except Exception as e:
+            logger.error(f"Error backfilling template variants: {str(e)}")
+
+    def stop(self) -> None:
+        """Stop a running backfill"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,126 @@
+"""
+Write-behind batching of pattern updates
+"""
+
+import time
+import atexit
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Callable, Iterable, Optional
+
+logger = logging.getLogger("EirosShell")
+
+class WriteBehindWriter:
+    """
+    Collects keys of changed patterns and writes them to storage in batches:
+    after flush_interval seconds without a flush, as soon as max_dirty keys
+    are pending, and at shutdown. Every flush holds lock, which owners of
+    the patterns share so a flush never overlaps their own saves.
+    """
+
+    def __init__(self, storage, get_patterns: Callable[[], Dict[str, Any]],
+                 flush_interval: float = 2.0, max_dirty: int = 50, lock: Optional[threading.RLock] = None):
+        self.storage = storage
+        self.get_patterns = get_patterns
+        self.lock = lock or threading.RLock()
+        self.flush_interval = flush_interval  # Seconds a change may wait before it is written
+        self.max_dirty = max_dirty  # Pending keys that force an immediate flush
+        self._dirty = {}  # pattern key -> None, in order of first change
+        self._removed = {}
+        self._timer = None
+        self._timer_loop = None
+        self.flushes = 0
+        self.changes = 0
+        self.written = 0
+        atexit.register(self.flush)
+
+    @property
+    def pending(self) -> int:
+        """Number of changed patterns not written yet"""
+        return len(self._dirty) + len(self._removed)
+
+    def mark_dirty(self, keys: Iterable[str]) -> None:
+        """Record changed patterns; they are written by the next flush"""
+        for key in keys:
+            self._dirty[key] = None
+            self._removed.pop(key, None)
+            self.changes += 1
+        self._schedule()
+
+    def mark_removed(self, keys: Iterable[str]) -> None:
+        """Record deleted patterns"""
+        for key in keys:
+            self._removed[key] = None
+            self._dirty.pop(key, None)
+            self.changes += 1
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self.pending >= self.max_dirty:
+            self.flush()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without an event loop changes wait for the dirty limit or shutdown
+            return
+        if self._timer is not None and self._timer_loop is loop:
+            return
+        # The flush runs on the loop thread, so it never sees patterns mid-update
+        self._timer = loop.call_later(self.flush_interval, self.flush)
+        self._timer_loop = loop
+
+    def discard(self) -> None:
+        """Forget pending changes, e.g. before the whole memory is rewritten"""
+        self._dirty.clear()
+        self._removed.clear()
+        self._cancel_timer()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._timer_loop = None
+
+    def flush(self) -> bool:
+        """Write all pending changes now"""
+        with self.lock:
+            return self._flush()
+
+    def _flush(self) -> bool:
+        self._cancel_timer()
+        if not self._dirty and not self._removed:
+            return True
+
+        dirty, removed = list(self._dirty), list(self._removed)
+        self._dirty.clear()
+        self._removed.clear()
+        start = time.perf_counter()
+        if not self.storage.save_changes(self.get_patterns(), dirty, removed):
+            # Keep the changes so the next flush retries them
+            for key in dirty:
+                self._dirty.setdefault(key, None)
+            for key in removed:
+                self._removed.setdefault(key, None)
+            return False
+
+        self.flushes += 1
+        self.written += len(dirty) + len(removed)
+        logger.debug(f"Flushed {len(dirty) + len(removed)} pattern changes in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return True
+
+    def close(self) -> None:
+        """Flush pending changes and stop flushing at exit"""
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return write-behind counters"""
+        return {
+            "pending": self.pending,
+            "changes": self.changes,
+            "written": self.written,
+            "flushes": self.flushes,
+            "coalesced": self.changes - self.written - self.pending
+        }
@@ -6,11 +6,12 @@ import asyncio
 import sys
 import os
 import argparse
-from utils import setup_autostart, setup_logging, get_system_info, internet_connection_available
+from utils import setup_autostart, setup_logging, get_system_info, internet_connection_available, load_dotenv
 from pathlib import Path
 import time
 import logging
 from diagnostics import run_preflight_checks
+from browser_launch_profile import LAUNCH_PROFILES, display_available, resolve_launch_profile
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -19,12 +20,25 @@ def parse_arguments():
     parser.add_argument("--debug", action="store_true", help="Запустить в режиме отладки (подробное логирование)")
     parser.add_argument("--nogui", action="store_true", help="Запустить без графического интерфейса")
     parser.add_argument("--skip-preflight", action="store_true", help="Пропустить предварительные проверки")
+    parser.add_argument("--profile", choices=sorted(LAUNCH_PROFILES),
+                        help="Профиль запуска браузера (по умолчанию desktop, без дисплея server)")
+    headless_group = parser.add_mutually_exclusive_group()
+    headless_group.add_argument("--headless", dest="headless", action="store_true", default=None,
+                                help="Запустить браузер без окна")
+    headless_group.add_argument("--headed", dest="headless", action="store_false",
+                                help="Запустить браузер с окном")
+    parser.add_argument("--viewport", help="Размер области просмотра, например 1280x800")
+    parser.add_argument("--device-scale-factor", type=float, help="Коэффициент масштабирования устройства")
+    parser.add_argument("--browser-arg", action="append", default=[],
+                        help="Дополнительный флаг Chromium (можно указать несколько раз)")
     return parser.parse_args()
 
 async def main():
     try:
         args = parse_arguments()
         debug_mode = args.debug
+        # Настройки из .env (HEADLESS, BROWSER_PROFILE, VIEWPORT, ...) дополняют аргументы
+        load_dotenv()
 
         # Настройка логирования
         log_dir = Path(os.path.expanduser("~")) / "EirosShell" / "logs"
@@ -65,8 +79,13 @@ async def main():
         system_info = get_system_info()
         logger.info(f"Информация о системе: {system_info}")
             
-        # Check if GUI should be disabled
-        headless_mode = args.nogui
+        # Профиль запуска браузера из аргументов и .env
+        launch_profile = resolve_launch_profile(args.profile, args.headless, args.viewport,
+                                                args.device_scale_factor, args.browser_arg)
+        logger.info(f"Профиль запуска браузера: {launch_profile.to_dict()}")
+        
+        # Check if GUI should be disabled (also when there is no display to show it on)
+        headless_mode = args.nogui or not display_available()
         
         # Initialize debug GUI if not in headless mode
         if not headless_mode:
@@ -96,7 +115,7 @@ async def main():
         print(f"EirosShell v0.7 запущена {'в режиме отладки ' if debug_mode else ''}. Лог доступен в: {log_file}")
         
         # Запускаем основной модуль
-        await bootstrap_main(debug_mode)
+        await bootstrap_main(debug_mode, launch_profile)
         
     except ImportError as ie:
         logger.exception(f"Ошибка импорта модуля: {str(ie)}")
@@ -0,0 +1,122 @@
+"""
+Test script for the element handle cache
+"""
+
+import asyncio
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from browser_driver import BrowserController
+from browser_launch_profile import LaunchProfile
+from browser_element_cache import ARM_SCRIPT
+
+class FakeHandle:
+    def __init__(self, selector):
+        self.selector = selector
+        self.stale = False
+        self.hidden = False
+        self.clicks = 0
+        self.visibility_waits = 0
+
+    async def wait_for_element_state(self, state, timeout=None):
+        self.visibility_waits += 1
+        if self.hidden:
+            raise PlaywrightTimeoutError(f"Timeout {timeout}ms exceeded")
+
+    async def click(self):
+        if self.stale:
+            raise RuntimeError("Element is not attached to the DOM")
+        self.clicks += 1
+
+    async def fill(self, text):
+        self.text = text
+
+class FakePage:
+    def __init__(self):
+        self.main_frame = object()
+        self.handlers = {}
+        self.binding = None
+        self.lookups = 0
+        self.arms = 0
+        self.selector_clicks = 0
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def once(self, event, handler):
+        pass
+
+    async def expose_binding(self, name, callback):
+        self.binding = callback
+
+    async def add_init_script(self, script):
+        pass
+
+    async def evaluate(self, script):
+        if script == ARM_SCRIPT:
+            self.arms += 1
+
+    async def query_selector(self, selector):
+        self.lookups += 1
+        return FakeHandle(selector)
+
+    async def wait_for_selector(self, selector, timeout=None):
+        self.lookups += 1
+        return FakeHandle(selector)
+
+    async def click(self, selector):
+        self.lookups += 1
+        self.selector_clicks += 1
+
+    async def fill(self, selector, text):
+        self.lookups += 1
+
+def test_one_handle_serves_recognition_wait_and_click():
+    """The selector is resolved once per DOM generation; navigation, detached frames and mutations drop handles"""
+    browser = BrowserController(LaunchProfile("server", headless=True))
+    page = FakePage()
+    browser.page = page
+
+    async def run():
+        # Recognition, waiting and the click share one resolution; the page is armed once
+        handle = await browser.query_selector("#send")
+        assert await browser.wait_for_selector("#send", timeout=10000) is handle
+        assert await browser.wait_for_selector("#send", timeout=10000) is handle
+        assert await browser.click("#send")
+        assert page.lookups == 1 and handle.clicks == 1 and page.arms == 1
+        # A handle found by recognition is waited for until visible once
+        assert handle.visibility_waits == 1
+
+        # Each invalidation event starts a new generation
+        for invalidate in (lambda: page.binding(None), lambda: page.handlers["framenavigated"](page.main_frame),
+                           lambda: page.handlers["framedetached"](object())):
+            invalidate()
+            assert await browser.query_selector("#send") is not handle
+            handle = await browser.query_selector("#send")
+        assert page.lookups == 4
+        # Mutations and navigations disarm the page; a detached frame does not
+        assert page.arms == 3
+
+        # A hidden cached element times out like wait_for_selector
+        await browser.query_selector("#hidden")
+        browser.element_cache.peek(page, "#hidden").hidden = True
+        assert await browser.wait_for_selector("#hidden", timeout=100) is None
+
+        # Events for child frames keep the handles
+        page.handlers["framenavigated"](object())
+        assert await browser.query_selector("#send") is handle
+
+        # A stale handle falls back to the selector
+        handle.stale = True
+        assert await browser.click("#send")
+        assert page.selector_clicks == 1
+        assert browser.element_cache.peek(page, "#send") is None
+
+        # Without a cached handle the action resolves the selector itself
+        assert await browser.type_text("#other", "hello")
+        assert browser.element_cache.stats()["misses"] == 5
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    test_one_handle_serves_recognition_wait_and_click()
@@ -0,0 +1,71 @@
+"""
+Test script for browser launch profiles and headless operation
+"""
+
+import os
+import sys
+import asyncio
+import subprocess
+
+from browser_launch_profile import LaunchProfile, resolve_launch_profile, SERVER_ARGS
+from pattern_image_processor import PatternImageProcessor
+from pattern_matcher_engine import PatternMatcherEngine
+
+PROFILE_SETTINGS = ("BROWSER_PROFILE", "HEADLESS", "VIEWPORT", "DEVICE_SCALE_FACTOR", "BROWSER_ARGS", "DISPLAY")
+
+def test_launch_profiles():
+    """Profiles translate into launch options; settings and missing displays adjust them"""
+    desktop = LaunchProfile("desktop")
+    assert desktop.launch_options() == {"headless": False, "args": ["--start-maximized"]}
+
+    saved = {name: os.environ.pop(name, None) for name in PROFILE_SETTINGS}
+    try:
+        os.environ.update({"VIEWPORT": "1024x768", "DEVICE_SCALE_FACTOR": "2", "BROWSER_ARGS": "--lang=en-US"})
+        server = resolve_launch_profile("server", extra_args=["--proxy-server=direct://"])
+        options = server.launch_options()
+        assert options["headless"] is True
+        assert options["viewport"] == {"width": 1024, "height": 768}
+        assert options["device_scale_factor"] == 2.0
+        assert set(SERVER_ARGS) <= set(options["args"])
+        assert {"--disable-gpu", "--disable-extensions", "--lang=en-US", "--proxy-server=direct://"} <= set(options["args"])
+        assert "--start-maximized" not in options["args"]
+        assert server.channels == (None,)
+
+        if sys.platform.startswith("linux"):
+            # No display: server is the default and a headed request falls back to headless
+            assert resolve_launch_profile().name == "server"
+            assert resolve_launch_profile("desktop", headless=False).headless is True
+            os.environ["DISPLAY"] = ":0"
+            assert resolve_launch_profile().name == "desktop"
+    finally:
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+
+class MockBrowser:
+    def __init__(self):
+        self.page = object()
+        self.clicks = []
+
+    async def click_at(self, x, y):
+        self.clicks.append((x, y))
+        return True
+
+def test_visual_click_through_page():
+    """Visual matches are clicked through the browser page, without PyAutoGUI"""
+    engine = PatternMatcherEngine(None, PatternImageProcessor())
+    browser = MockBrowser()
+    assert asyncio.run(engine.click_match_async({"region": [100, 40, 60, 20]}, browser))
+    assert asyncio.run(engine.click_match_async({"center": [15, 25]}, browser))
+    assert browser.clicks == [(130, 50), (15, 25)]
+    assert not asyncio.run(engine.click_match_async({}, browser))
+
+    # The matcher imports without a display
+    env = {name: value for name, value in os.environ.items() if name not in ("DISPLAY", "PYTHONPATH")}
+    subprocess.run([sys.executable, "-c", "import pattern_matcher_engine, browser_launch_profile"],
+                   env=env, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+if __name__ == "__main__":
+    test_launch_profiles()
+    test_visual_click_through_page()
@@ -0,0 +1,134 @@
+"""
+Test script for navigation policies and request blocking
+"""
+
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+from browser_navigation import (NavigationPolicy, NavigationPolicies, ResourceBlocker,
+                                NavigationTimings, navigate)
+
+class FakeRequest:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+class FakeRoute:
+    def __init__(self):
+        self.outcome = None
+
+    async def abort(self, error_code=None):
+        self.outcome = "aborted"
+
+    async def fallback(self):
+        self.outcome = "continued"
+
+class FakePage:
+    def __init__(self, requests):
+        self.url = ""
+        self.requests = requests
+        self.handler = None
+        self.calls = []
+        self.idle = None  # Event that network idle waits for, if any
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    def once(self, event, handler):
+        pass
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        self.url = url
+        self.calls.append(("goto", wait_until))
+        outcomes = []
+        for request in self.requests:
+            route = FakeRoute()
+            if self.handler:
+                await self.handler(route, request)
+            outcomes.append(route.outcome)
+        return outcomes
+
+    async def wait_for_selector(self, selector, timeout=None):
+        self.calls.append(("selector", selector))
+
+    async def wait_for_load_state(self, state, timeout=None):
+        self.calls.append(("load_state", state))
+        if self.idle:
+            await self.idle.wait()
+
+def test_policies_resolve_per_domain_and_command():
+    """Domain entries apply to subdomains, commands override them and bad values are rejected"""
+    policies = NavigationPolicies(NavigationPolicy("networkidle"))
+    policies.set_domain_policy("example.com", wait_until="domcontentloaded", block=["images"])
+    policies.set_domain_policy("app.example.com", wait_for="#root")
+
+    assert policies.policy_for("https://other.org/").wait_until == "networkidle"
+    assert policies.policy_for("https://www.example.com/a").to_dict()["block"] == ["images"]
+    app = policies.policy_for("https://app.example.com/")
+    assert app.wait_until == "selector" and app.selector == "#root"
+    command = policies.policy_for("https://app.example.com/", {"wait_until": "load", "block": "fonts, trackers"})
+    assert command.wait_until == "load" and command.selector is None
+    assert command.block == ["fonts", "trackers"]
+
+    for bad in ({"wait_until": "idle"}, {"wait_until": "selector"}):
+        try:
+            policies.policy_for("https://other.org/", bad)
+            assert False, "invalid policy accepted"
+        except ValueError:
+            pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "navigation_policies.json"
+        path.write_text(json.dumps({"default": {"wait_until": "load"}, "domains": {"news.org": {"block": ["media"]}}}))
+        policies.load(path)
+        assert policies.default.wait_until == "load"
+        assert policies.policy_for("https://news.org/").block == ["media"]
+
+def test_navigation_blocks_requests_and_reports_time_saved():
+    """Blocked categories and third-party trackers are aborted; time saved is measured against network idle"""
+    requests = [
+        FakeRequest("https://example.com/", "document"),
+        FakeRequest("https://example.com/logo.png", "image"),
+        FakeRequest("https://example.com/app.js", "script"),
+        FakeRequest("https://www.google-analytics.com/analytics.js", "script"),
+        FakeRequest("https://example.com/font.woff2", "font"),
+    ]
+    blocker = ResourceBlocker()
+    timings = NavigationTimings()
+
+    async def run():
+        page = FakePage(requests)
+        # Without blocking no route is installed and network idle sets the baseline
+        report = await navigate(page, "https://example.com/", NavigationPolicy("networkidle"), blocker, timings)
+        assert page.handler is None and report["time_saved"] == 0.0
+        assert timings.baseline("https://example.com/") == report["elapsed"]
+        timings.record_baseline("https://example.com/", 5.0 / timings.smoothing)
+
+        policy = NavigationPolicy(selector="#main", block=["images", "trackers"])
+        report = await navigate(page, "https://example.com/", policy, blocker, timings)
+        assert page.calls[-2:] == [("goto", "commit"), ("selector", "#main")]
+        assert report["blocked_requests"] == 2
+        assert 4.9 < report["time_saved"] <= 5.0
+
+        # A new navigation cancels the previous one's network idle wait
+        page = FakePage([])
+        page.idle = asyncio.Event()
+        await navigate(page, "https://slow.example.org/", NavigationPolicy("load"), blocker, timings)
+        await navigate(page, "https://example.com/", NavigationPolicy("load"), blocker, timings)
+        await asyncio.sleep(0)
+        page.idle.set()
+        await asyncio.sleep(0)
+        assert timings.baseline("https://slow.example.org/") is None
+        assert timings.baseline("https://example.com/") < 5.0
+
+        # Tracker patterns do not block the tracker's own site
+        assert not blocker.should_block(["trackers"], "script", "https://www.hotjar.com/x.js", "https://hotjar.com/")
+
+    asyncio.run(run())
+    assert blocker.stats() == {"blocked": 2, "allowed": 3}
+
+if __name__ == "__main__":
+    test_policies_resolve_per_domain_and_command()
+    test_navigation_blocks_requests_and_reports_time_saved()
@@ -0,0 +1,94 @@
+"""
+Test script for the browser page pool
+"""
+
+import asyncio
+
+from browser_page_pool import PagePool
+
+class FakeFrame:
+    pass
+
+class FakePage:
+    def __init__(self):
+        self.main_frame = FakeFrame()
+        self.handlers = {}
+        self.closed = False
+        self.heap = 10 * 1024 * 1024
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def navigate(self):
+        self.handlers["framenavigated"](self.main_frame)
+
+    def is_closed(self):
+        return self.closed
+
+    async def evaluate(self, expression):
+        return self.heap
+
+    async def close(self):
+        self.closed = True
+
+class FakeContext:
+    browser = None  # Persistent contexts have no separate browser object
+
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+class FakeController:
+    def __init__(self):
+        self.browser = FakeContext()
+
+async def test_page_pool_leases_and_recycles():
+    """Pages are reused up to max_pages, waiters get released pages and worn pages are replaced"""
+    controller = FakeController()
+    pool = PagePool(controller, max_pages=2, max_navigations=3, max_memory_bytes=100 * 1024 * 1024)
+
+    first = await pool.acquire()
+    second = await pool.acquire()
+    assert first.page is not second.page
+    assert pool.stats()["leased"] == 2
+
+    # A third chain waits until a page is released
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    await pool.release(first)
+    third = await asyncio.wait_for(waiter, 1)
+    assert third is first and pool.stats()["waits"] == 1
+
+    # Navigation and memory limits recycle pages on release
+    for _ in range(3):
+        third.page.navigate()
+    second.page.heap = 200 * 1024 * 1024
+    await pool.release(third)
+    await pool.release(second)
+    assert first.page.closed and second.page.closed
+    assert pool.stats()["recycled"] == 2 and pool.size == 0
+
+    # Concurrent leases stay within max_pages
+    active, peak = 0, 0
+    async def chain():
+        nonlocal active, peak
+        async with pool.lease() as pooled:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            pooled.page.navigate()
+            active -= 1
+    await asyncio.gather(*(chain() for _ in range(6)))
+    assert peak == 2
+    assert len(controller.browser.pages) == 4
+
+    await pool.close()
+    assert all(page.closed for page in controller.browser.pages)
+
+if __name__ == "__main__":
+    asyncio.run(test_page_pool_leases_and_recycles())
@@ -0,0 +1,131 @@
+"""
+Test script for the on-disk HTTP response cache
+"""
+
+import asyncio
+import tempfile
+import threading
+
+from browser_response_cache import ResponseCache, freshness_lifetime
+
+class FakeRequest:
+    def __init__(self, url, resource_type="script", headers=None, method="GET"):
+        self.url = url
+        self.resource_type = resource_type
+        self.headers = headers or {}
+        self.method = method
+
+class FakeResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+class FakeRoute:
+    def __init__(self, response):
+        self.response = response
+        self.fetched = False
+        self.fulfilled = None
+        self.fell_back = False
+
+    async def fetch(self):
+        self.fetched = True
+        return self.response
+
+    async def fulfill(self, status, headers, body):
+        self.fulfilled = (status, headers, body)
+
+    async def fallback(self):
+        self.fell_back = True
+
+def test_freshness_rules():
+    """Cache-Control and Expires decide how long a response may be reused"""
+    assert freshness_lifetime({"cache-control": "public, max-age=600"}) == 600
+    assert freshness_lifetime({"cache-control": "max-age=600, s-maxage=60"}) == 60
+    assert freshness_lifetime({"cache-control": "no-store"}) == 0
+    assert freshness_lifetime({"cache-control": "no-cache, max-age=600"}) == 0
+    assert freshness_lifetime({"expires": "Thu, 01 Jan 1970 00:00:00 GMT"}) == 0
+    assert freshness_lifetime({}) is None
+
+def test_routed_requests_hit_the_cache():
+    """Responses are stored per vary header values, served from disk, expire and survive a restart"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(tmp, overrides={"https://cdn.example.com/*": 3600})
+        bundle = FakeResponse(200, {"cache-control": "max-age=600", "vary": "Accept-Encoding",
+                                    "content-encoding": "gzip", "content-type": "text/javascript"}, b"x" * 1000)
+
+        async def request(req, response):
+            route = FakeRoute(response)
+            await cache.handle(route, req)
+            return route
+
+        # Files are read and written on the cache's I/O thread, not on the event loop
+        io_threads = set()
+        for name in ("_read_body", "_write_entry"):
+            method = getattr(cache, name)
+            def record(*args, method=method):
+                io_threads.add(threading.current_thread().name)
+                return method(*args)
+            setattr(cache, name, record)
+
+        async def run():
+            gzip = {"accept-encoding": "gzip"}
+            first = await request(FakeRequest("https://example.com/app.js", headers=gzip), bundle)
+            second = await request(FakeRequest("https://example.com/app.js", headers=gzip), bundle)
+            assert first.fetched and not second.fetched
+            assert second.fulfilled[2] == b"x" * 1000
+            assert "content-encoding" not in second.fulfilled[1]
+
+            # A different vary header value is a different entry
+            other = await request(FakeRequest("https://example.com/app.js", headers={"accept-encoding": "br"}), bundle)
+            assert other.fetched
+
+            # no-store is skipped unless an override covers the URL; documents and POSTs are not routed
+            private = FakeResponse(200, {"cache-control": "no-store"}, b"p")
+            await request(FakeRequest("https://example.com/private.js"), private)
+            assert (await request(FakeRequest("https://example.com/private.js"), private)).fetched
+            await request(FakeRequest("https://cdn.example.com/lib.js"), private)
+            assert not (await request(FakeRequest("https://cdn.example.com/lib.js"), private)).fetched
+            assert (await request(FakeRequest("https://example.com/", "document"), bundle)).fell_back
+            assert (await request(FakeRequest("https://example.com/app.js", method="POST"), bundle)).fell_back
+
+        asyncio.run(run())
+        assert io_threads and all(name.startswith("response-cache") for name in io_threads)
+        stats = cache.stats()
+        assert stats["hits"] == 2 and stats["misses"] == 5
+        assert stats["bytes_saved"] == 1001 and stats["entries"] == 3
+
+        # Entries expire
+        assert cache.lookup("https://example.com/app.js", {"accept-encoding": "gzip"}, now=10 ** 11) is None
+        assert cache.stats()["entries"] == 2
+
+        # The index is rebuilt from disk
+        reopened = ResponseCache(tmp, overrides=cache.overrides)
+        assert reopened.stats()["entries"] == 2
+        assert reopened.lookup("https://cdn.example.com/lib.js", {})["body"] == b"p"
+        cache.close()
+        reopened.close()
+
+def test_size_limit_evicts_least_recently_used():
+    """The cache stays under max_bytes by dropping the least recently used entries"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(tmp, max_bytes=8000)
+        headers = {"cache-control": "max-age=600"}
+        for name in ("a", "b", "c"):
+            assert cache.store(f"https://example.com/{name}.js", {}, 200, headers, b"x" * 1000)
+        cache.lookup("https://example.com/a.js", {})
+        for name in ("d", "e", "f", "g", "h", "i"):
+            cache.store(f"https://example.com/{name}.js", {}, 200, headers, b"x" * 1000)
+        assert cache.size <= 8000 and cache.evictions == 1
+        assert cache.lookup("https://example.com/a.js", {}) is not None
+        assert cache.lookup("https://example.com/b.js", {}) is None
+        # Entries larger than an eighth of the cache are not stored
+        assert not cache.store("https://example.com/big.js", {}, 200, headers, b"x" * 1001)
+
+if __name__ == "__main__":
+    test_freshness_rules()
+    test_routed_requests_hit_the_cache()
+    test_size_limit_evicts_least_recently_used()
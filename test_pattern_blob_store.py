@@ -0,0 +1,46 @@
+"""
+Test script for the content-addressed screenshot blob store
+"""
+
+import base64
+import hashlib
+import shutil
+from pathlib import Path
+
+from pattern_blob_store import BlobStore
+
+def test_blob_store_dedupes_and_externalizes():
+    """Identical screenshots are stored once and pattern records keep only the digest"""
+    blobs_dir = Path("./test_patterns") / "blobs"
+    shutil.rmtree(blobs_dir, ignore_errors=True)
+    store = BlobStore(blobs_dir)
+
+    screenshot = b"\x89PNG fake page screenshot" * 100
+    screenshot_b64 = base64.b64encode(screenshot).decode('utf-8')
+    patterns = {
+        f"@field{i}:manual": {"id": f"field{i}", "context": "manual", "screenshot": screenshot_b64}
+        for i in range(3)
+    }
+    patterns["#plain:default"] = {"selector": "#plain", "context": "default"}
+
+    changed = store.externalize(patterns)
+    assert sorted(changed) == ["@field0:manual", "@field1:manual", "@field2:manual"]
+
+    digest = hashlib.sha256(screenshot).hexdigest()
+    for key in changed:
+        assert "screenshot" not in patterns[key]
+        assert patterns[key]["screenshot_blob"] == digest
+
+    stats = store.stats()
+    assert stats["blobs"] == 1
+    assert stats["bytes"] == len(screenshot)
+    assert stats["dedupes"] == 2
+
+    # Data is read only when asked for
+    assert store.load_screenshot(patterns["@field1:manual"]) == screenshot
+    assert store.get_base64(digest) == screenshot_b64
+    assert store.load_screenshot(patterns["#plain:default"]) is None
+    assert store.get("0" * 64) is None
+
+if __name__ == "__main__":
+    test_blob_store_dedupes_and_externalizes()
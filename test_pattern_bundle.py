@@ -0,0 +1,82 @@
+"""
+Test script for packed pattern bundles
+"""
+
+import shutil
+import cv2
+import numpy as np
+from pathlib import Path
+
+from pattern_bundle import PatternBundle, build_bundle, import_bundle, is_bundle_path
+from pattern_blob_store import BlobStore
+from pattern_storage import PatternStorage
+from pattern_repository import PatternRepository
+from pattern_image_processor import PatternImageProcessor
+
+def _make_screenshot() -> np.ndarray:
+    rng = np.random.default_rng(7)
+    screenshot = rng.integers(0, 255, (300, 400, 3), dtype=np.uint8)
+    cv2.rectangle(screenshot, (120, 80), (200, 110), (40, 160, 220), -1)
+    cv2.putText(screenshot, "OK", (140, 102), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return screenshot
+
+def test_bundle_build_match_and_import():
+    """Templates and screenshots are packed once, memory-mapped for matching and imported without extraction"""
+    test_dir = Path("./test_patterns") / "bundle"
+    shutil.rmtree(test_dir, ignore_errors=True)
+    test_dir.mkdir(parents=True)
+
+    screenshot = _make_screenshot()
+    template_path = test_dir / "ok_button.png"
+    cv2.imwrite(str(template_path), screenshot[80:111, 120:201])
+    source_blobs = BlobStore(test_dir / "blobs")
+    digest = source_blobs.put(b"screenshot bytes")
+    patterns = {
+        "ok_button": {"id": "ok_button", "url": "https://example.com", "image_path": str(template_path)},
+        "#search:default": {"selector": "#search", "context": "default", "times_seen": 3, "screenshot_blob": digest},
+        "#gone:default": {"selector": "#gone", "context": "default", "screenshot_blob": "0" * 64}
+    }
+
+    bundle_path = test_dir / "patterns.pbundle"
+    summary = build_bundle(str(bundle_path), patterns, blob_store=source_blobs)
+    assert summary["records"] == 3 and summary["templates"] == 1 and summary["blobs"] == 1
+    assert summary["template_bytes"] == 31 * 81
+
+    bundle = PatternBundle(str(bundle_path))
+    assert bundle.verify() == []
+    template = bundle.template("ok_button")
+    assert isinstance(template.base, np.memmap), "Templates should be views into the bundle file"
+    assert template.shape == (31, 81)
+    assert bundle.entries["ok_button"]["signature"]["size"] == [81, 31]
+    # Records carry no paths of the building machine, and missing blobs are not referenced
+    assert bundle.records["ok_button"]["image_path"] == "patterns.pbundle#ok_button"
+    assert "screenshot_blob" not in bundle.records["#gone:default"]
+
+    # Import into a fresh store; records point into the bundle copied into the store
+    store_dir = test_dir / "store"
+    repository = PatternRepository(PatternStorage(store_dir))
+    assert import_bundle(str(bundle_path), repository) == 3
+    imported = repository.templates["ok_button"]
+    assert is_bundle_path(imported["image_path"])
+    assert imported["image_path"] == "bundles/patterns.pbundle#ok_button"
+    assert repository.blob_store.load_screenshot(repository.elements["#search:default"]) == b"screenshot bytes"
+
+    processor = PatternImageProcessor()
+    processor.patterns_dir = store_dir
+    match = processor.match_pattern_record(processor.prepare_screenshot(screenshot), imported)
+    assert match is not None and match["region"] == [120, 80, 81, 31]
+    assert processor.template_cache.stats()["entries"] == 0, "Bundle templates bypass the decode cache"
+
+    # Reopened stores still resolve the bundle templates
+    reloaded = PatternRepository(PatternStorage(store_dir))
+    assert processor.load_template(reloaded.templates["ok_button"]["image_path"]) is not None
+
+    # Corruption is reported
+    data = bytearray(bundle_path.read_bytes())
+    data[bundle.data_offset + 10] ^= 0xFF
+    corrupt_path = test_dir / "corrupt.pbundle"
+    corrupt_path.write_bytes(bytes(data))
+    assert PatternBundle(str(corrupt_path)).verify() == ["ok_button: checksum mismatch"]
+
+if __name__ == "__main__":
+    test_bundle_build_match_and_import()
@@ -0,0 +1,74 @@
+"""
+Test script for incremental re-matching of changed screen regions
+"""
+
+import shutil
+import cv2
+import numpy as np
+from pathlib import Path
+
+from pattern_storage import PatternStorage
+from pattern_image_processor import PatternImageProcessor
+from pattern_matcher_engine import PatternMatcherEngine
+from pattern_frame_diff import changed_blocks
+
+def test_changed_blocks():
+    """Only blocks with a pixel changed beyond the threshold are flagged"""
+    previous = np.full((100, 130), 50, dtype=np.uint8)
+    current = previous.copy()
+    current[70, 120] = 200
+    current[5, 5] = 55  # Below the threshold
+    mask = changed_blocks(previous, current, block_size=32)
+    assert mask.shape == (4, 5)
+    assert list(zip(*np.nonzero(mask))) == [(2, 3)]
+
+def test_incremental_rematching():
+    """Patterns away from a changed area reuse their previous results"""
+    test_dir = Path("./test_patterns") / "frame_diff"
+    shutil.rmtree(test_dir, ignore_errors=True)
+    test_dir.mkdir(parents=True)
+
+    rng = np.random.default_rng(21)
+    noise = rng.integers(0, 256, size=(150, 200), dtype=np.uint8)
+    screenshot = cv2.cvtColor(cv2.resize(noise, (800, 600), interpolation=cv2.INTER_LINEAR), cv2.COLOR_GRAY2BGR)
+
+    processor = PatternImageProcessor()
+    processor.certain_confidence = 1.01  # Match every candidate
+    engine = PatternMatcherEngine(PatternStorage(test_dir / "store"), processor)
+    crops = {"diff_a": (100, 50), "diff_b": (400, 300), "diff_c": (650, 500)}
+    for pattern_id, (x, y) in crops.items():
+        path = test_dir / f"{pattern_id}.png"
+        cv2.imwrite(str(path), screenshot[y:y+40, x:x+60])
+        engine.add_pattern(pattern_id, {"id": pattern_id, "url": "https://example.com/list",
+                                        "image_path": str(path), "region": [x, y, 60, 40]})
+
+    url = "https://example.com/list"
+    try:
+        assert engine.find_best_match(url, screenshot)["id"] in crops
+
+        # A change next to diff_c only: the other two results are reused
+        changed = screenshot.copy()
+        changed[560:590, 560:620] = 255
+        engine.match_cache.invalidate()  # Skip the whole-frame cache to exercise the block diff
+        assert engine.find_best_match(url, changed) is not None
+        stats = engine.get_cache_stats()["frames"]
+        assert stats["reused"] == 2 and stats["rematched"] == 1
+
+        # Covering diff_b re-matches it, and it is no longer found
+        covered = changed.copy()
+        covered[300:340, 400:460] = 0
+        engine.match_cache.invalidate()
+        engine.find_best_match(url, covered)
+        states = engine.frame_states._states[url].results
+        assert states["diff_b"] is None
+        assert states["diff_a"]["reused"] and states["diff_c"]["region"] == [650, 500, 60, 40]
+
+        # Navigation forgets the page
+        engine.invalidate_match_cache()
+        assert engine.get_cache_stats()["frames"]["pages"] == 0
+    finally:
+        engine.close()
+
+if __name__ == "__main__":
+    test_changed_blocks()
+    test_incremental_rematching()
@@ -0,0 +1,194 @@
+"""
+Test script for the pattern matcher engine
+"""
+
+import asyncio
+import shutil
+import cv2
+import numpy as np
+from pathlib import Path
+
+from pattern_storage import PatternStorage
+from pattern_image_processor import PatternImageProcessor
+from pattern_matcher_engine import PatternMatcherEngine
+
+def _make_screenshot(seed: int = 3) -> np.ndarray:
+    """Textured screenshot so every crop has a single unambiguous location"""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, size=(150, 200), dtype=np.uint8)
+    return cv2.cvtColor(cv2.resize(noise, (800, 600), interpolation=cv2.INTER_LINEAR), cv2.COLOR_GRAY2BGR)
+
+def _make_engine(screenshot: np.ndarray, url: str = "https://example.com/app") -> PatternMatcherEngine:
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    shutil.rmtree(test_dir / "engine_store", ignore_errors=True)
+    
+    engine = PatternMatcherEngine(PatternStorage(test_dir / "engine_store"), PatternImageProcessor(), max_workers=2)
+    crops = {"engine_a": (100, 50), "engine_b": (400, 300), "engine_c": (650, 500)}
+    for pattern_id, (x, y) in crops.items():
+        path = test_dir / f"{pattern_id}.png"
+        cv2.imwrite(str(path), screenshot[y:y+40, x:x+60])
+        engine.add_pattern(pattern_id, {
+            "id": pattern_id,
+            "selector": f"#{pattern_id}",
+            "url": url,
+            "image_path": str(path),
+            "region": [x, y, 60, 40]
+        })
+    return engine
+
+async def test_find_best_match_async():
+    """The async API returns the same match as the synchronous one"""
+    screenshot = _make_screenshot()
+    engine = _make_engine(screenshot)
+    try:
+        sync_match = engine.find_best_match("https://example.com/app", screenshot, "engine_b")
+        async_match = await engine.find_best_match_async("https://example.com/app", screenshot, "engine_b")
+        assert async_match is not None
+        assert async_match["id"] == sync_match["id"] == "engine_b"
+        assert async_match["region"] == sync_match["region"] == [400, 300, 60, 40]
+        
+        # No candidates for another URL
+        assert await engine.find_best_match_async("https://other.example.com", screenshot) is None
+    finally:
+        engine.close()
+
+async def test_find_best_match_async_keeps_loop_responsive():
+    """Matching runs on worker threads, so other coroutines keep running meanwhile"""
+    screenshot = _make_screenshot()
+    engine = _make_engine(screenshot)
+    engine.image_processor.search_strategy = "full"
+    ticks = 0
+    
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+    
+    ticker_task = asyncio.create_task(ticker())
+    try:
+        match = await engine.find_best_match_async("https://example.com/app", screenshot, accept_confidence=1.1)
+        assert match is not None
+        assert ticks > 1, "Event loop was blocked during matching"
+    finally:
+        ticker_task.cancel()
+        engine.close()
+
+def test_candidate_selection_uses_url_indexes():
+    """Candidates are looked up by exact URL, normalized URL, wildcard and id"""
+    engine = PatternMatcherEngine(PatternStorage(Path("./test_patterns") / "engine_store"), PatternImageProcessor())
+    engine.patterns = {
+        "login": {"id": "login", "url": "https://example.com/login?next=/home", "image_path": "login.png"},
+        "docs_nav": {"id": "docs_nav", "url": "https://example.com/docs/*", "image_path": "docs.png"},
+        "other": {"id": "other", "url": "https://other.example.com/", "image_path": "other.png"}
+    }
+    
+    def candidate_ids(url, element_id=None):
+        return [p["id"] for p in engine._select_candidates(url, element_id)]
+    
+    # Query string and fragment are ignored through the normalized URL index
+    assert candidate_ids("https://example.com/login") == ["login"]
+    assert candidate_ids("https://EXAMPLE.com/login/#form") == ["login"]
+    # Wildcard URL patterns serve a whole section
+    assert candidate_ids("https://example.com/docs/api/intro") == ["docs_nav"]
+    assert candidate_ids("https://example.com/blog") == []
+    # Element id lookups still respect the URL
+    assert candidate_ids("https://example.com/docs/faq", "docs_nav") == ["docs_nav"]
+    assert candidate_ids("https://example.com/login", "docs_nav") == []
+    # No URL means every pattern
+    assert sorted(candidate_ids("")) == ["docs_nav", "login", "other"]
+    
+    # Incremental updates
+    engine.add_pattern("login", {"id": "login", "url": "https://example.com/signin", "image_path": "login.png"})
+    assert candidate_ids("https://example.com/login") == []
+    assert candidate_ids("https://example.com/signin") == ["login"]
+    engine.remove_pattern("docs_nav")
+    assert candidate_ids("https://example.com/docs/api") == []
+
+def test_hit_rate_ordering_and_early_termination():
+    """The most frequently matched pattern is tried first and a certain match ends the search"""
+    screenshot = _make_screenshot()
+    engine = _make_engine(screenshot)
+    engine.patterns["engine_c"]["match_stats"] = {"hits": 5, "last_confidence": 1.0, "last_matched": 1.0}
+    
+    match = engine.find_best_match("https://example.com/app", screenshot)
+    assert match["id"] == "engine_c"
+    # Only the first candidate was scanned
+    assert set(engine.image_processor.get_region_stats()) == {"engine_c"}
+    
+    stats = engine.patterns["engine_c"]["match_stats"]
+    assert stats["hits"] == 6
+    assert stats["last_confidence"] > 0.99
+    assert stats["last_matched"] > 1.0
+    
+    # The success history is written with the next batch, not per match
+    engine.repository.flush()
+    stored = engine.storage.load_patterns()
+    assert stored["engine_c"]["match_stats"]["hits"] == 6
+
+def test_match_result_cache():
+    """An identical frame reuses the previous match after re-scoring it; misses and changed frames are rescanned"""
+    screenshot = _make_screenshot()
+    engine = _make_engine(screenshot)
+    url = "https://example.com/app"
+    
+    # A miss is not remembered, so the element is found as soon as it appears
+    hidden = screenshot.copy()
+    hidden[300:340, 400:460] = 128
+    assert engine.find_best_match(url, hidden, "engine_b") is None
+    first = engine.find_best_match(url, screenshot, "engine_b")
+    assert first["id"] == "engine_b"
+    assert not first.get("cached")
+    
+    # Same content in a fresh array, as from a new capture of an unchanged page
+    again = engine.find_best_match(url, screenshot.copy(), "engine_b")
+    assert again["cached"]
+    assert again["region"] == first["region"]
+    assert again["confidence"] > 0.99
+    
+    # A small change elsewhere is a new frame: the element is searched again, not taken from the cache
+    moved = screenshot.copy()
+    moved[304:344, 403:463] = screenshot[300:340, 400:460]
+    match = engine.find_best_match(url, moved, "engine_b")
+    assert match["region"] == [403, 304, 60, 40] and not match.get("cached")
+    
+    # A stored match that no longer scores on the frame is dropped
+    engine.match_cache.put(engine.match_cache.make_key(url, [engine.patterns["engine_b"]], "engine_b"),
+                           engine._prepare_frame(hidden)[1], dict(first))
+    assert engine.find_best_match(url, hidden, "engine_b") is None
+    stats = engine.get_cache_stats()["matches"]
+    assert stats["hits"] == 1
+    assert stats["invalidations"] == 2
+    
+    # Navigation clears everything
+    engine.invalidate_match_cache()
+    assert engine.get_cache_stats()["matches"]["entries"] == 0
+
+async def test_find_all_matches_async():
+    """Every occurrence of a repeated element comes from one scan and is addressable by index"""
+    screenshot = _make_screenshot()
+    screenshot[100:140, 700:760] = screenshot[300:340, 400:460]
+    engine = _make_engine(screenshot)
+    try:
+        matches = await engine.find_all_matches_async("https://example.com/app", screenshot, "engine_b")
+        assert [m["region"] for m in matches] == [[700, 100, 60, 40], [400, 300, 60, 40]]
+        assert engine.select_occurrence(matches, 1)["region"] == [400, 300, 60, 40]
+        assert engine.select_occurrence(matches, -1) is matches[-1]
+        assert engine.select_occurrence(matches, 5) is None
+        
+        # Same frame: served from the cache, identical to the synchronous API
+        cached = engine.find_all_matches("https://example.com/app", screenshot, "engine_b")
+        assert [m["region"] for m in cached] == [m["region"] for m in matches]
+        assert all(m["cached"] for m in cached)
+        assert engine.get_cache_stats()["matches"]["hits"] == 1
+    finally:
+        engine.close()
+
+if __name__ == "__main__":
+    asyncio.run(test_find_best_match_async())
+    asyncio.run(test_find_best_match_async_keeps_loop_responsive())
+    test_candidate_selection_uses_url_indexes()
+    test_hit_rate_ordering_and_early_termination()
+    test_match_result_cache()
+    asyncio.run(test_find_all_matches_async())
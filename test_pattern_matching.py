@@ -7,7 +7,7 @@ import asyncio
 import cv2
 import numpy as np
 from pathlib import Path
-from pattern_image_processor import PatternImageProcessor
+from pattern_image_processor import PatternImageProcessor, non_max_suppression
 
 async def test_pattern_matching():
     """Test the visual pattern matching functionality"""
@@ -55,5 +55,179 @@ async def test_pattern_matching():
     cv2.rectangle(result_img, (x, y), (x+w, y+h), (0, 255, 0), 2)
     cv2.imwrite(str(test_dir / "match_result.png"), result_img)
 
+async def test_batch_pattern_matching():
+    """Test matching several patterns against one prepared screenshot"""
+    
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    
+    # Two distinct templates placed in the screenshot, one template that is absent
+    screenshot = np.zeros((600, 800, 3), dtype=np.uint8)
+    cv2.rectangle(screenshot, (200, 150), (300, 200), (255, 255, 255), -1)
+    cv2.circle(screenshot, (600, 400), 30, (255, 255, 255), -1)
+    cv2.imwrite(str(test_dir / "batch_button.png"), screenshot[140:210, 190:310])
+    cv2.imwrite(str(test_dir / "batch_circle.png"), screenshot[360:440, 560:640])
+    absent = np.zeros((40, 40, 3), dtype=np.uint8)
+    cv2.line(absent, (0, 0), (39, 39), (255, 255, 255), 3)
+    cv2.imwrite(str(test_dir / "batch_absent.png"), absent)
+    
+    patterns = [
+        {"id": "batch_button", "image_path": str(test_dir / "batch_button.png")},
+        {"id": "batch_circle", "image_path": str(test_dir / "batch_circle.png")},
+        {"id": "batch_absent", "image_path": str(test_dir / "batch_absent.png")},
+        {"id": "no_image", "selector": "#no-image"}
+    ]
+    
+    image_processor = PatternImageProcessor()
+    matches = image_processor.match_patterns_batch(screenshot, patterns, frame_id="frame-1")
+    
+    assert {m["id"] for m in matches} == {"batch_button", "batch_circle"}
+    by_id = {m["id"]: m for m in matches}
+    assert by_id["batch_button"]["region"] == [190, 140, 120, 70]
+    assert by_id["batch_circle"]["region"] == [560, 360, 80, 80]
+    
+    # The batch API returns the same match dicts as the per-pattern API
+    single = image_processor.match_patterns(screenshot, patterns)
+    assert [(m["id"], m["region"]) for m in single] == [(m["id"], m["region"]) for m in matches]
+    
+    # The prepared frame is reused for the same frame id
+    prepared = image_processor.prepare_screenshot(screenshot, frame_id="frame-1")
+    assert image_processor.prepare_screenshot(screenshot, frame_id="frame-1") is prepared
+    
+    # Downscaled matching still reports full-resolution coordinates
+    scaled = image_processor.match_patterns_batch(screenshot, patterns, frame_id="frame-1", scale=0.5)
+    scaled_by_id = {m["id"]: m for m in scaled}
+    x, y, w, h = scaled_by_id["batch_button"]["region"]
+    assert abs(x - 190) <= 2 and abs(y - 140) <= 2 and (w, h) == (120, 70)
+
+async def test_pyramid_pattern_matching():
+    """Test that the coarse-to-fine pyramid mode agrees with the exhaustive search"""
+    
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    
+    # Textured screenshot so the template has a single unambiguous location
+    rng = np.random.default_rng(7)
+    noise = rng.integers(0, 256, size=(150, 200), dtype=np.uint8)
+    screenshot = cv2.cvtColor(cv2.resize(noise, (800, 600), interpolation=cv2.INTER_LINEAR), cv2.COLOR_GRAY2BGR)
+    cv2.imwrite(str(test_dir / "pyramid_template.png"), screenshot[217:265, 333:413])
+    template_path = str(test_dir / "pyramid_template.png")
+    
+    exhaustive_processor = PatternImageProcessor()
+    exhaustive = exhaustive_processor.match_pattern(screenshot, template_path)
+    
+    for levels in (1, 2):
+        pyramid_processor = PatternImageProcessor()
+        pyramid_processor.match_mode = "pyramid"
+        pyramid_processor.pyramid_levels = levels
+        pyramid = pyramid_processor.match_pattern(screenshot, template_path)
+        
+        assert pyramid is not None, f"No pyramid match at {levels} levels"
+        assert pyramid["region"] == exhaustive["region"] == [333, 217, 80, 48]
+        # Confidence is rescored at full resolution, so threshold semantics are unchanged
+        assert abs(pyramid["confidence"] - exhaustive["confidence"]) < 1e-4
+
+async def test_region_prior_matching():
+    """Test that the stored region is searched first and full scans are counted"""
+    
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    
+    rng = np.random.default_rng(11)
+    noise = rng.integers(0, 256, size=(150, 200), dtype=np.uint8)
+    screenshot = cv2.cvtColor(cv2.resize(noise, (800, 600), interpolation=cv2.INTER_LINEAR), cv2.COLOR_GRAY2BGR)
+    cv2.imwrite(str(test_dir / "region_template.png"), screenshot[300:340, 500:560])
+    
+    image_processor = PatternImageProcessor()
+    patterns = [
+        # Stored region a few pixels off: found inside the first window
+        {"id": "nearby", "image_path": str(test_dir / "region_template.png"), "region": [506, 296, 60, 40]},
+        # Stored region far away: local windows miss, full scan finds it
+        {"id": "moved", "image_path": str(test_dir / "region_template.png"), "region": [20, 20, 60, 40]}
+    ]
+    matches = image_processor.match_patterns_batch(screenshot, patterns)
+    by_id = {m["id"]: m for m in matches}
+    
+    assert by_id["nearby"]["region"] == [500, 300, 60, 40]
+    assert by_id["moved"]["region"] == [500, 300, 60, 40]
+    assert by_id["nearby"]["search_window"] != [0, 0, 800, 600]
+    assert by_id["moved"]["search_window"] == [0, 0, 800, 600]
+    
+    stats = image_processor.get_region_stats()
+    assert stats["nearby"]["local_hits"] == 1 and stats["nearby"]["full_scans"] == 0
+    assert stats["nearby"]["local_hit_rate"] == 1.0
+    assert stats["moved"]["local_hits"] == 0 and stats["moved"]["full_hits"] == 1
+
+async def test_brightness_shifted_matching():
+    """An occurrence with different brightness and contrast still matches (TM_CCOEFF_NORMED is invariant to both)"""
+    
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    
+    rng = np.random.default_rng(12)
+    noise = rng.integers(0, 256, size=(150, 200), dtype=np.uint8)
+    screenshot = cv2.cvtColor(cv2.resize(noise, (800, 600), interpolation=cv2.INTER_LINEAR), cv2.COLOR_GRAY2BGR)
+    template = screenshot[120:160, 240:300].copy()
+    cv2.imwrite(str(test_dir / "hover_present.png"), template)
+    # The only occurrence is a hover-state copy: brighter and with less contrast
+    hover = np.clip(template.astype(np.float32) * 0.6 + 90, 0, 255).astype(np.uint8)
+    screenshot[120:160, 240:300] = rng.integers(0, 256, size=(40, 60, 3), dtype=np.uint8)
+    screenshot[400:440, 500:560] = hover
+    
+    image_processor = PatternImageProcessor()
+    image_processor.search_strategy = "full"
+    present = {"id": "present", "image_path": str(test_dir / "hover_present.png")}
+    
+    matches = image_processor.match_patterns_batch(screenshot, [present])
+    assert [m["id"] for m in matches] == ["present"]
+    assert matches[0]["region"] == [500, 400, 60, 40]
+    assert matches[0]["confidence"] > 0.99
+    
+    # Matching does not attach anything to the shared pattern record
+    assert set(present) == {"id", "image_path"}
+
+async def test_multi_instance_matching():
+    """All occurrences of a repeated button are found in one scan, in reading order"""
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    
+    # A list of identical "Delete" rows plus one button in a second column
+    rng = np.random.default_rng(5)
+    screenshot = np.full((600, 800, 3), 235, dtype=np.uint8)
+    button = rng.integers(0, 256, size=(30, 70, 3), dtype=np.uint8)
+    positions = [(600, 100), (600, 180), (600, 260), (600, 340), (100, 260)]
+    for x, y in positions:
+        screenshot[y:y+30, x:x+70] = button
+    cv2.imwrite(str(test_dir / "delete_button.png"), button)
+    pattern = {"id": "delete_button", "image_path": str(test_dir / "delete_button.png")}
+    
+    image_processor = PatternImageProcessor()
+    prepared = image_processor.prepare_screenshot(screenshot)
+    matches = image_processor.match_all_pattern_record(prepared, pattern)
+    assert [m["region"][:2] for m in matches] == [[600, 100], [600, 180], [100, 260], [600, 260], [600, 340]]
+    assert [m["index"] for m in matches] == [0, 1, 2, 3, 4]
+    assert sorted(m["rank"] for m in matches) == [0, 1, 2, 3, 4]
+    assert all(m["confidence"] > 0.99 and m["id"] == "delete_button" for m in matches)
+    
+    # Rows are grouped by the gap between locations, not by fixed bands of the screen
+    screenshot = np.full((600, 800, 3), 235, dtype=np.uint8)
+    screenshot[104:134, 600:670] = button
+    screenshot[106:136, 100:170] = button
+    matches = image_processor.match_all_pattern_record(image_processor.prepare_screenshot(screenshot), pattern)
+    assert [m["region"][:2] for m in matches] == [[100, 106], [600, 104]]
+    
+    # The limit keeps the strongest occurrences
+    assert len(image_processor.match_all_prepared(prepared, pattern["image_path"], max_instances=2)) == 2
+    
+    # Overlapping boxes collapse onto the strongest one
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [20, 0, 10, 10], [21, 0, 10, 10]])
+    scores = np.array([0.9, 0.95, 0.8, 0.7])
+    assert list(non_max_suppression(boxes, scores, 0.3)) == [1, 2]
+
 if __name__ == "__main__":
     asyncio.run(test_pattern_matching())
+    asyncio.run(test_batch_pattern_matching())
+    asyncio.run(test_pyramid_pattern_matching())
+    asyncio.run(test_region_prior_matching())
+    asyncio.run(test_brightness_shifted_matching())
+    asyncio.run(test_multi_instance_matching())
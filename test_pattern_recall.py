@@ -93,11 +93,6 @@ class MockBrowserController:
 async def test_pattern_recall_across_sessions():
     browser = MockBrowserController()
     
-    # Setup: Create a pattern file for testing
-    memory_file = Path(os.path.expanduser("~")) / "EirosShell" / "patterns" / "pattern_memory.json"
-    memory_dir = memory_file.parent
-    memory_dir.mkdir(parents=True, exist_ok=True)
-    
     # Create test patterns
     test_patterns = {
         "input[name=username]:login_form": {
@@ -114,9 +109,8 @@ async def test_pattern_recall_across_sessions():
         }
     }
     
-    # Write test patterns to file
-    with open(memory_file, 'w') as f:
-        json.dump(test_patterns, f, indent=2)
+    # Write test patterns to the pattern storage
+    pattern_memory.storage.save_changes(test_patterns, list(test_patterns))
     
     print("\n=== Testing pattern recall across sessions ===")
     
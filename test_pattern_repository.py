@@ -0,0 +1,122 @@
+"""
+Test script for the shared pattern repository
+"""
+
+import os
+import sys
+import shutil
+import asyncio
+import threading
+import subprocess
+from pathlib import Path
+
+from pattern_storage import PatternStorage
+from pattern_repository import PatternRepository
+from pattern_image_processor import PatternImageProcessor
+from pattern_matcher_engine import PatternMatcherEngine
+
+def _make_repository(name: str) -> PatternRepository:
+    test_dir = Path("./test_patterns") / name
+    shutil.rmtree(test_dir, ignore_errors=True)
+    return PatternRepository(PatternStorage(test_dir))
+
+def test_typed_views_share_one_store():
+    """Templates, elements and annotations live in one store without overwriting each other"""
+    repository = _make_repository("repository_views")
+    repository.storage.save_patterns({
+        "login": {"id": "login", "url": "https://example.com/login", "image_path": "login.png"},
+        "#search:default": {"selector": "#search", "context": "default", "times_seen": 1},
+        "@submit:manual": {"id": "submit", "context": "manual", "location": [1, 2, 3, 4], "manual": True}
+    })
+    repository.load()
+    assert list(repository.templates) == ["login"]
+    assert list(repository.elements) == ["#search:default"]
+    assert list(repository.annotations) == ["@submit:manual"]
+    assert "login" not in repository.elements
+    
+    events = []
+    unsubscribe = repository.subscribe(lambda event, kind, key: events.append((event, kind, key)))
+    repository.elements["#email:login"] = {"selector": "#email", "context": "login"}
+    del repository.annotations["@submit:manual"]
+    unsubscribe()
+    repository.elements["#other:login"] = {"selector": "#other", "context": "login"}
+    assert events == [("set", "element", "#email:login"), ("delete", "annotation", "@submit:manual")]
+    
+    # Saving one record keeps every other kind on disk
+    repository.save(["#email:login"])
+    stored = repository.storage.load_patterns()
+    assert {"login", "#search:default", "#email:login"} <= set(stored)
+    assert "@submit:manual" not in stored
+    assert stored["#email:login"]["kind"] == "element"
+
+def test_engine_follows_repository_changes():
+    """Templates added through the repository are indexed by the engine without a reload"""
+    repository = _make_repository("repository_engine")
+    engine = PatternMatcherEngine(repository.storage, PatternImageProcessor(), repository=repository)
+    
+    repository.templates["cart"] = {"id": "cart", "url": "https://shop.example.com/cart", "image_path": "cart.png"}
+    assert [p["id"] for p in engine._select_candidates("https://shop.example.com/cart")] == ["cart"]
+    
+    # Element memory is not offered to visual matching
+    repository.elements["#cart:default"] = {"selector": "#cart", "context": "default", "url": "https://shop.example.com/cart"}
+    assert [p["id"] for p in engine._select_candidates("https://shop.example.com/cart")] == ["cart"]
+    
+    repository.templates.pop("cart")
+    assert engine._select_candidates("https://shop.example.com/cart") == []
+
+def test_imports_do_not_load_patterns():
+    """Importing the pattern subsystems neither opens nor parses the pattern store"""
+    home = Path("./test_patterns/import_home").resolve()
+    shutil.rmtree(home, ignore_errors=True)
+    home.mkdir(parents=True)
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    code = ("import pattern_matcher, pattern_repository, manual_ui_annotator; "
+            "print(pattern_repository.pattern_repository.loaded, pattern_repository.pattern_repository._storage)")
+    try:
+        import tkinter, PIL  # The annotator needs both
+    except ImportError:
+        code = code.replace(", manual_ui_annotator", "")
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            cwd=str(Path(__file__).resolve().parent))
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.split() == ["False", "None"]
+    assert not (home / "EirosShell").exists()
+
+async def test_warm_up_loads_once():
+    """warm_up loads the store on a worker thread; later accesses reuse it"""
+    repository = _make_repository("repository_warm_up")
+    repository.storage.save_patterns({"#a:default": {"selector": "#a", "context": "default"}})
+    loads = []
+    repository.subscribe(lambda event, kind, key: loads.append(event) if event == "load" else None)
+    
+    await asyncio.gather(repository.warm_up(), repository.warm_up())
+    assert list(repository.elements) == ["#a:default"]
+    assert loads == ["load"]
+
+def test_loaded_is_set_after_subscribers():
+    """Other threads wait for load() to finish preparing records and notifying subscribers"""
+    repository = _make_repository("repository_load_order")
+    repository.storage.save_patterns({"#a:default": {"selector": "#a", "context": "default"}})
+    seen = []
+    
+    def on_load(event, kind, key):
+        if event != "load":
+            return
+        # Subscribers may use the records, but the repository is not published yet
+        seen.append((repository.loaded, list(repository.elements)))
+        reader = threading.Thread(target=repository.counts)
+        reader.start()
+        reader.join(0.1)
+        seen.append(reader.is_alive())
+    repository.subscribe(on_load)
+    
+    repository.ensure_loaded()
+    assert seen == [(False, ["#a:default"]), True]
+    assert repository.loaded
+
+if __name__ == "__main__":
+    test_typed_views_share_one_store()
+    test_engine_follows_repository_changes()
+    test_imports_do_not_load_patterns()
+    asyncio.run(test_warm_up_loads_once())
+    test_loaded_is_set_after_subscribers()
@@ -0,0 +1,102 @@
+"""
+Test script for the pattern retention policy
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import threading
+from pathlib import Path
+
+from pattern_sqlite_storage import SQLitePatternStorage
+from pattern_repository import PatternRepository
+from pattern_retention import RetentionManager, RetentionPolicy
+
+def _make_repository(name: str) -> PatternRepository:
+    test_dir = Path("./test_patterns") / name
+    shutil.rmtree(test_dir, ignore_errors=True)
+    repository = PatternRepository(SQLitePatternStorage(test_dir))
+    repository.load()
+    return repository
+
+async def test_retention_evicts_and_reclaims():
+    """Expired and least valuable patterns are evicted and their space is reported"""
+    repository = _make_repository("retention")
+    now = time.time()
+    day = 24 * 3600
+    
+    # A shared screenshot, freed only with the last pattern that uses it
+    shared = repository.blob_store.put(b"shared screenshot" * 500)
+    for i in range(6):
+        screenshot = repository.blob_store.put(f"element {i}".encode() * 500) if i % 2 else shared
+        repository.elements[f"#e{i}:default"] = {
+            "selector": f"#e{i}", "context": "default", "last_seen": now - i * day,
+            "times_seen": 1, "screenshot_blob": screenshot
+        }
+    # Old but frequently used, so it ages slowly
+    repository.elements["#frequent:default"] = {"selector": "#frequent", "context": "default",
+                                                "last_seen": now - 20 * day, "times_seen": 500}
+    # Expired
+    repository.elements["#stale:default"] = {"selector": "#stale", "context": "default",
+                                             "last_seen": now - 40 * day, "times_seen": 1}
+    # Manual annotations are never evicted
+    repository.annotations["@old:manual"] = {"id": "old", "manual": True, "last_seen": now - 400 * day}
+    repository.save()
+    
+    # Let garbage collection consider the blobs written above
+    for blob in repository.blob_store.blobs_dir.glob("*/*"):
+        os.utime(blob, (now - 2 * 3600, now - 2 * 3600))
+    
+    policy = RetentionPolicy(max_entries=5, max_bytes=None, ttl=30 * day)
+    manager = RetentionManager(repository, policy)
+    # Records are serialized on the loop thread, which is the one changing them
+    flush_threads = []
+    original_flush = repository.flush
+    def recording_flush():
+        flush_threads.append(threading.current_thread())
+        return original_flush()
+    repository.flush = recording_flush
+    report = await manager.run_once_async(now)
+    assert flush_threads == [threading.current_thread()]
+    
+    assert report["reasons"] == {"ttl": 1, "max_entries": 2}
+    assert sorted(repository.elements) == ["#e0:default", "#e1:default", "#e2:default", "#e3:default", "#frequent:default"]
+    assert "@old:manual" in repository.annotations
+    # The screenshot of #e5 is gone, the shared one is still used by #e0 and #e2
+    assert report["blob_bytes"] == len(b"element 5" * 500)
+    assert repository.blob_store.size(shared) > 0
+    assert report["reclaimed_bytes"] >= report["record_bytes"] + report["blob_bytes"] > 0
+    
+    # Evictions are persisted
+    assert sorted(repository.storage.load_patterns()) == sorted(list(repository.elements) + ["@old:manual"])
+    
+    # A byte budget evicts the least recently seen patterns first
+    manager.policy = RetentionPolicy(max_entries=None, max_bytes=10000, ttl=None)
+    report = manager.run_once(now)
+    assert report["reasons"] == {"max_bytes": 4}
+    assert list(repository.elements) == ["#e0:default"]
+
+def test_compaction_only_when_space_is_free():
+    """The database is only rebuilt once deletions left enough free pages"""
+    repository = _make_repository("compaction")
+    storage = repository.storage
+    for i in range(200):
+        repository.elements[f"#big{i}:default"] = {"selector": f"#big{i}", "context": "default", "text": "x" * 2000}
+    repository.save()
+    storage.compact(0.0)  # Start from a compact file
+    
+    # Nothing deleted: no rewrite
+    size = storage._file_size()
+    assert storage.compact() == 0
+    assert storage._file_size() == size
+    
+    for i in range(150):
+        repository.delete(f"#big{i}:default")
+    repository.flush()
+    assert storage.compact() > 0
+    assert storage.compact() == 0
+
+if __name__ == "__main__":
+    asyncio.run(test_retention_evicts_and_reclaims())
+    test_compaction_only_when_space_is_free()
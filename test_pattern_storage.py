@@ -0,0 +1,144 @@
+"""
+Test script for the SQLite pattern storage backend
+"""
+
+import json
+import shutil
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+
+from pattern_storage import PatternStorage, create_pattern_storage
+from pattern_sqlite_storage import SQLitePatternStorage
+from pattern_write_behind import WriteBehindWriter
+
+def _fresh_dir(name: str) -> Path:
+    test_dir = Path("./test_patterns") / name
+    shutil.rmtree(test_dir, ignore_errors=True)
+    test_dir.mkdir(parents=True)
+    return test_dir
+
+def test_sqlite_migration_and_export():
+    """The JSON file is imported once and can be exported back unchanged"""
+    test_dir = _fresh_dir("sqlite_migration")
+    patterns = {
+        "login_button": {"id": "login_button", "url": "https://example.com/login", "image_path": "login.png"},
+        "input[name=q]:search": {"selector": "input[name=q]", "context": "search", "last_seen": 100.0, "times_seen": 2}
+    }
+    PatternStorage(test_dir).save_patterns(patterns)
+
+    storage = SQLitePatternStorage(test_dir)
+    assert storage.load_patterns() == patterns
+
+    # Indexed columns are filled from the pattern data
+    with sqlite3.connect(str(storage.db_file)) as conn:
+        row = conn.execute("SELECT context, url, last_seen FROM patterns WHERE key = ?", ("input[name=q]:search",)).fetchone()
+    assert row == ("search", None, 100.0)
+
+    # The migration does not run again once the table has been filled
+    storage.save_changes({}, [], ["login_button"])
+    storage.close()
+    reopened = SQLitePatternStorage(test_dir)
+    assert list(reopened.load_patterns()) == ["input[name=q]:search"]
+
+    export_path = reopened.export_json(str(test_dir / "export.json"))
+    with open(export_path) as f:
+        assert json.load(f) == {"input[name=q]:search": patterns["input[name=q]:search"]}
+    reopened.close()
+
+    # A table of one kind imports only its records from the mixed file
+    elements = SQLitePatternStorage(test_dir, "element_memory")
+    assert list(elements.load_patterns()) == ["input[name=q]:search"]
+    elements.close()
+
+def test_sqlite_writes_only_changed_rows():
+    """Saving after touching one pattern rewrites only its row"""
+    test_dir = _fresh_dir("sqlite_incremental")
+    storage = create_pattern_storage(test_dir, backend="sqlite", table="element_memory")
+    assert isinstance(storage, SQLitePatternStorage)
+
+    patterns = {f"#item{i}:default": {"selector": f"#item{i}", "context": "default", "times_seen": 1} for i in range(50)}
+    assert storage.save_patterns(patterns)
+
+    patterns["#item7:default"]["times_seen"] = 2
+
+    # Record the rows handed to SQLite
+    written = []
+    original_upsert = storage._upsert
+    def recording_upsert(rows):
+        rows = list(rows)
+        written.extend(rows)
+        original_upsert(rows)
+    storage._upsert = recording_upsert
+    assert storage.save_patterns(patterns)
+    assert [row[0] for row in written] == ["#item7:default"]
+
+    written.clear()
+    del patterns["#item3:default"]
+    patterns["#new:default"] = {"selector": "#new", "context": "default"}
+    assert storage.save_changes(patterns, ["#new:default"], ["#item3:default"])
+    assert [row[0] for row in written] == ["#new:default"]
+    storage.close()
+
+    stored = SQLitePatternStorage(test_dir, "element_memory").load_patterns()
+    assert stored == patterns
+
+async def test_write_behind_batches_updates():
+    """Repeated touches are coalesced and written after the debounce interval or the dirty limit"""
+    test_dir = _fresh_dir("write_behind")
+    storage = SQLitePatternStorage(test_dir, "element_memory")
+    patterns = {f"#item{i}:default": {"selector": f"#item{i}", "times_seen": 0} for i in range(5)}
+    storage.save_patterns(patterns)
+    lock = threading.RLock()
+    writer = WriteBehindWriter(storage, lambda: patterns, flush_interval=0.05, max_dirty=4, lock=lock)
+    
+    # Timer flushes hold the shared lock, so they cannot overlap a save from another thread
+    held_during_save = []
+    original_save_changes = storage.save_changes
+    def recording_save_changes(*args, **kwargs):
+        probe = threading.Thread(target=lambda: held_during_save.append(not lock.acquire(blocking=False)))
+        probe.start()
+        probe.join()
+        return original_save_changes(*args, **kwargs)
+    storage.save_changes = recording_save_changes
+    
+    for _ in range(10):
+        patterns["#item0:default"]["times_seen"] += 1
+        writer.mark_dirty(["#item0:default"])
+    assert writer.pending == 1
+    assert storage.load_patterns()["#item0:default"]["times_seen"] == 0
+    
+    await asyncio.sleep(0.1)
+    assert writer.pending == 0
+    assert storage.load_patterns()["#item0:default"]["times_seen"] == 10
+    assert held_during_save == [True]
+    
+    # Reaching the dirty limit flushes at once
+    writer.mark_dirty(["#item1:default", "#item2:default", "#item3:default"])
+    assert writer.pending == 3
+    writer.mark_dirty(["#item4:default"])
+    assert writer.pending == 0
+    
+    stats = writer.stats()
+    assert stats["flushes"] == 2
+    assert stats["coalesced"] == 9
+    writer.close()
+    storage.close()
+
+def test_json_save_is_atomic():
+    """A failed save leaves the previous JSON file intact"""
+    test_dir = _fresh_dir("atomic_json")
+    storage = PatternStorage(test_dir)
+    assert storage.save_patterns({"a": {"id": "a"}})
+    
+    # Objects that cannot be serialized fail halfway through the dump
+    assert not storage.save_patterns({"a": {"id": "a"}, "b": {"id": object()}})
+    assert storage.load_patterns() == {"a": {"id": "a"}}
+    assert [p.name for p in test_dir.iterdir()] == ["pattern_memory.json"]
+
+if __name__ == "__main__":
+    test_sqlite_migration_and_export()
+    test_sqlite_writes_only_changed_rows()
+    asyncio.run(test_write_behind_batches_updates())
+    test_json_save_is_atomic()
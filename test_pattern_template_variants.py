@@ -0,0 +1,73 @@
+"""
+Test script for precomputed template variants
+"""
+
+import shutil
+import cv2
+import numpy as np
+from pathlib import Path
+
+from pattern_storage import PatternStorage
+from pattern_image_processor import PatternImageProcessor
+from pattern_matcher_engine import PatternMatcherEngine
+from pattern_template_variants import VariantBackfill
+
+def _make_screenshot() -> np.ndarray:
+    rng = np.random.default_rng(11)
+    noise = rng.integers(0, 256, size=(150, 200), dtype=np.uint8)
+    return cv2.cvtColor(cv2.resize(noise, (800, 600), interpolation=cv2.INTER_LINEAR), cv2.COLOR_GRAY2BGR)
+
+def test_backfill_and_match_with_variants():
+    """Backfilled variants give the same matches without touching the template decoder"""
+    test_dir = Path("./test_patterns") / "variants"
+    shutil.rmtree(test_dir, ignore_errors=True)
+    test_dir.mkdir(parents=True)
+
+    screenshot = _make_screenshot()
+    template_path = test_dir / "variant_button.png"
+    cv2.imwrite(str(template_path), screenshot[300:348, 400:480])
+
+    processor = PatternImageProcessor()
+    processor.match_mode = "pyramid"
+    processor.match_scale = 0.5
+    processor.search_strategy = "full"
+    processor.variant_edges = True
+    engine = PatternMatcherEngine(PatternStorage(test_dir / "store"), processor)
+    engine.add_pattern("variant_button", {"id": "variant_button", "url": "https://example.com",
+                                          "image_path": str(template_path)})
+
+    prepared = processor.prepare_screenshot(screenshot)
+    pattern = engine.patterns["variant_button"]
+    baseline = processor.match_pattern_record(prepared, pattern)
+
+    backfill = VariantBackfill(engine)
+    assert backfill.pending() == ["variant_button"]
+    assert backfill.run_once()["built"] == 1
+    assert backfill.pending() == []
+    assert pattern["variants"]["levels"] == processor.pyramid_levels
+
+    variants = processor.get_variants(pattern)
+    assert variants is not None
+    assert variants.get(0.5).shape == (24, 40)
+    assert variants.get(0.5, 1).shape == (12, 20)
+    assert variants.edges is not None
+
+    processor.template_cache.clear()
+    misses = processor.template_cache.misses
+    match = processor.match_pattern_record(prepared, pattern)
+    assert processor.template_cache.misses == misses, "Matching should only read precomputed variants"
+    assert match["region"] == baseline["region"] == [400, 300, 80, 48]
+    assert abs(match["confidence"] - baseline["confidence"]) < 1e-6
+
+    # Changed settings make the variants outdated; a new image makes them unusable
+    processor.pyramid_levels = 2
+    assert backfill.pending() == ["variant_button"]
+    pattern["image_path"] = str(test_dir / "moved.png")
+    assert processor.get_variants(pattern) is None
+
+    # Removing the pattern removes its variants
+    engine.remove_pattern("variant_button")
+    assert not engine.variant_store.path("variant_button").exists()
+
+if __name__ == "__main__":
+    test_backfill_and_match_with_variants()
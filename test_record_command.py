@@ -12,7 +12,7 @@ from command_types import CommandType
 class MockBrowser:
     def __init__(self):
         self.page = AsyncMock()
-        self.page.url = AsyncMock(return_value="https://example.com/login")
+        self.page.url = "https://example.com/login"
         
     async def wait_for_selector(self, selector, timeout=30000):
         element_mock = AsyncMock()
@@ -20,21 +20,14 @@ class MockBrowser:
         element_mock.inner_text = AsyncMock(return_value="Login Button")
         return element_mock
     
-    async def take_screenshot(self, path=None):
-        # Create a dummy screenshot file
+    async def capture_screenshot(self, clip=None, format="raw", quality=None, full_page=False):
+        # Create a simple in-memory test screenshot
         import numpy as np
         import cv2
-        from pathlib import Path
         
-        if not path:
-            path = str(Path.cwd() / "test_screenshot.png")
-            
-        # Create a simple test screenshot
         test_screenshot = np.zeros((600, 800, 3), dtype=np.uint8)
         cv2.rectangle(test_screenshot, (100, 50), (300, 90), (255, 255, 255), -1)
-        cv2.imwrite(path, test_screenshot)
-        
-        return path
+        return test_screenshot
 
 async def test_record_command():
     """Test the record command functionality"""
@@ -0,0 +1,91 @@
+"""
+Test script for the decoded template cache
+"""
+
+import os
+import cv2
+import numpy as np
+from pathlib import Path
+from pattern_template_cache import TemplateCache
+from pattern_image_processor import PatternImageProcessor
+
+def _write_template(path: Path, value: int, size=(40, 60)) -> None:
+    img = np.full((size[0], size[1], 3), value, dtype=np.uint8)
+    cv2.imwrite(str(path), img)
+
+def test_template_cache_hits_and_invalidation():
+    """Templates are decoded once and re-decoded after being overwritten"""
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    template_path = test_dir / "cache_template.png"
+    _write_template(template_path, 100)
+
+    cache = TemplateCache()
+    first = cache.get(template_path)
+    second = cache.get(str(template_path))
+    assert first is not None
+    assert second is first, "Second lookup should be served from the cache"
+    assert cache.hits == 1 and cache.misses == 1
+
+    # Overwrite the template and invalidate, as record_pattern does
+    _write_template(template_path, 200)
+    cache.invalidate(template_path)
+    third = cache.get(template_path)
+    assert third is not first
+    assert int(third[0, 0]) == 200
+    assert cache.misses == 2
+
+    # Missing files are not cached
+    assert cache.get(test_dir / "missing_template.png") is None
+
+def test_template_cache_eviction():
+    """The cache stays under its byte limit by evicting least recently used entries"""
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    paths = []
+    for i in range(3):
+        path = test_dir / f"cache_evict_{i}.png"
+        _write_template(path, 50 + i, size=(10, 10))
+        paths.append(path)
+
+    cache = TemplateCache(max_bytes=250)  # Room for two 10x10 grayscale templates
+    for path in paths:
+        cache.get(path)
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= 250
+    assert stats["evictions"] == 1
+
+    # The oldest entry was evicted, the newest is still cached
+    cache.get(paths[2])
+    assert cache.hits == 1
+    cache.get(paths[0])
+    assert cache.misses == 4
+
+def test_image_processor_uses_cache():
+    """Repeated matching decodes each template only once"""
+    test_dir = Path("./test_patterns")
+    test_dir.mkdir(exist_ok=True)
+    template = np.zeros((50, 100, 3), dtype=np.uint8)
+    cv2.rectangle(template, (10, 10), (60, 30), (255, 255, 255), -1)
+    cv2.imwrite(str(test_dir / "cache_button.png"), template)
+
+    screenshot = np.zeros((400, 600, 3), dtype=np.uint8)
+    screenshot[100:150, 200:300] = template
+
+    image_processor = PatternImageProcessor()
+    for _ in range(3):
+        match = image_processor.match_pattern(screenshot, str(test_dir / "cache_button.png"))
+        assert match is not None
+        assert match["region"] == [200, 100, 100, 50]
+
+    stats = image_processor.template_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+
+if __name__ == "__main__":
+    test_template_cache_hits_and_invalidation()
+    test_template_cache_eviction()
+    test_image_processor_uses_cache()
+    print("Template cache tests passed")